@@ -0,0 +1,223 @@
+"""
+Admission queue for realtime sessions.
+
+Instead of answering "not ready" with an Error and a close (after which
+clients retry, each retry costing a full Hyperstack status pass), sessions
+that can't start right away wait here with their websocket open and get
+
+    {"type": "Queued", "position": 2, "eta_seconds": 40, "status": "now_spinning_up"}
+
+every REALTIME_ADMISSION_PUSH_SECONDS. They're admitted in arrival order as
+soon as a backend has a free slot. Each backend takes at most
+REALTIME_ADMISSION_PER_BACKEND sessions.
+
+Backend status comes from one shared poller: it runs only while someone is
+waiting, and callers that arrive during a pass share its result. A fresh
+result (under REALTIME_ADMISSION_CACHE_SECONDS old) admits new sessions
+without any status call at all. A slot freed by an ending session goes
+straight to the next waiter.
+
+ETA: with backends up, position times the recent interval between freed
+slots; while a VM boots, its historical median boot time (lifecycle.py)
+minus how long we've seen it warming.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+import lifecycle
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+PER_BACKEND = int(os.environ.get("REALTIME_ADMISSION_PER_BACKEND", 32))
+MAX_QUEUE = int(os.environ.get("REALTIME_ADMISSION_MAX_QUEUE", 100))
+MAX_WAIT_SECONDS = float(os.environ.get("REALTIME_ADMISSION_MAX_WAIT_SECONDS", 900))
+POLL_SECONDS = float(os.environ.get("REALTIME_ADMISSION_POLL_SECONDS", 5))
+PUSH_SECONDS = float(os.environ.get("REALTIME_ADMISSION_PUSH_SECONDS", 2))
+CACHE_SECONDS = float(os.environ.get("REALTIME_ADMISSION_CACHE_SECONDS", 10))
+DEFAULT_BOOT_SECONDS = 600
+EWMA_ALPHA = 0.2
+
+class QueueFull(Exception):
+    pass
+
+class Ticket:
+    """A slot on a backend. Follows the session across failovers once attached."""
+    def __init__(self, ip: str):
+        self.reserved_ip = ip
+        self.session = None
+
+    @property
+    def ip(self) -> str:
+        return self.session.ip if self.session is not None else self.reserved_ip
+
+class Waiter:
+    def __init__(self):
+        self.ticket = None
+        self.admitted = asyncio.Event()
+        self.enqueued_at = time.monotonic()
+
+class AdmissionController:
+    def __init__(self, find_ready_backends, get_backend_status, per_backend: int = PER_BACKEND):
+        # find_ready_backends() -> [ip] never spins anything up; get_backend_status() may
+        self.find_ready_backends = find_ready_backends
+        self.get_backend_status = get_backend_status
+        self.per_backend = per_backend
+        self.tickets = set()
+        self.waiters = deque()
+        self.ready = []
+        self.status = {}
+        self.refreshed_at = float("-inf")
+        self.warming_since = None
+        self.release_interval = None  # EWMA of seconds between freed slots
+        self.last_release = None
+        self._refreshing = None
+        self._poller = None
+
+    # --- Backend status ---
+    async def refresh(self, spin_up: bool = True):
+        """
+        One status pass, shared by everyone who asks while it's running. With
+        spin_up=False it only looks at running backends, so it never starts a VM.
+        """
+        if self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._refresh(spin_up))
+            self._refreshing.add_done_callback(lambda _: setattr(self, "_refreshing", None))
+        await asyncio.shield(self._refreshing)
+
+    async def _refresh(self, spin_up: bool):
+        try:
+            ips = await self.find_ready_backends()
+            if ips:
+                status = {"status": "success", "ip_address": ips[0]}
+            elif not spin_up:
+                status = {"status": "no_backend_ready", "message": "No backend is running."}
+            else:
+                # Nothing ready: this reports what's booting, and starts a VM if nothing is
+                status = await self.get_backend_status()
+                ips = [status["ip_address"]] if status.get("status") == "success" else []
+        except Exception as e:
+            logger.error(f"Admission status check failed: {type(e).__name__}: {e}")
+            ips, status = [], {"status": "error", "message": "Could not check backend status."}
+        self.ready, self.status, self.refreshed_at = ips, status, time.monotonic()
+        if ips:
+            self.warming_since = None
+        elif self.warming_since is None:
+            self.warming_since = time.monotonic()
+        self.dispatch()
+
+    def load(self, ip: str) -> int:
+        return sum(1 for t in self.tickets if t.ip == ip)
+
+    def _reserve(self, avoid=()) -> Ticket | None:
+        free = [(ip in avoid, self.load(ip), ip) for ip in self.ready]
+        free = [f for f in free if f[1] < self.per_backend]
+        if not free:
+            return None
+        ticket = Ticket(min(free)[2])
+        self.tickets.add(ticket)
+        return ticket
+
+    def dispatch(self):
+        """Hands free slots to waiters in arrival order."""
+        while self.waiters:
+            ticket = self._reserve()
+            if ticket is None:
+                break
+            waiter = self.waiters.popleft()
+            waiter.ticket = ticket
+            waiter.admitted.set()
+            metrics.REALTIME_ADMISSION_WAIT_SECONDS.observe(time.monotonic() - waiter.enqueued_at)
+        metrics.REALTIME_ADMISSION_QUEUE.set(len(self.waiters))
+
+    # --- Admission ---
+    async def try_admit(self, avoid=(), spin_up: bool = True) -> Ticket | None:
+        """
+        A slot right now (on a backend not in `avoid`, if possible), or None if
+        the session would have to wait (or the backends aren't up). With
+        spin_up=False a stale status is refreshed without ever starting a VM.
+        """
+        if time.monotonic() - self.refreshed_at > CACHE_SECONDS:
+            await self.refresh(spin_up)
+        if self.waiters:
+            return None  # no overtaking the queue
+        ticket = self._reserve(avoid)
+        if ticket is not None:
+            metrics.REALTIME_ADMISSIONS.labels("immediate").inc()
+        return ticket
+
+    async def wait(self, push_status) -> Ticket | None:
+        """
+        Queues until a slot frees up, calling `push_status(message)` with the
+        position and ETA meanwhile. Returns None after MAX_WAIT_SECONDS.
+        Raises QueueFull if MAX_QUEUE sessions are already waiting.
+        """
+        if len(self.waiters) >= MAX_QUEUE:
+            metrics.REALTIME_ADMISSIONS.labels("full").inc()
+            raise QueueFull()
+        waiter = Waiter()
+        self.waiters.append(waiter)
+        metrics.REALTIME_ADMISSION_QUEUE.set(len(self.waiters))
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll())
+        outcome = "left"
+        try:
+            deadline = waiter.enqueued_at + MAX_WAIT_SECONDS
+            while not waiter.admitted.is_set():
+                if time.monotonic() >= deadline:
+                    outcome = "timeout"
+                    return None
+                await push_status(self.queued_message(waiter))
+                try:
+                    await asyncio.wait_for(waiter.admitted.wait(), min(PUSH_SECONDS, deadline - time.monotonic()))
+                except TimeoutError:
+                    pass
+            outcome = "queued"
+            return waiter.ticket
+        finally:
+            metrics.REALTIME_ADMISSIONS.labels(outcome).inc()
+            if not waiter.admitted.is_set():
+                self.waiters.remove(waiter)
+                metrics.REALTIME_ADMISSION_QUEUE.set(len(self.waiters))
+            elif outcome != "queued":
+                # admitted in the same instant we gave up or were cancelled: hand the slot on
+                self.release(waiter.ticket)
+
+    async def _poll(self):
+        while self.waiters:
+            await self.refresh()
+            await asyncio.sleep(POLL_SECONDS)
+
+    def release(self, ticket: Ticket):
+        if ticket not in self.tickets:
+            return
+        self.tickets.discard(ticket)
+        now = time.monotonic()
+        if self.last_release is not None:
+            interval = now - self.last_release
+            self.release_interval = interval if self.release_interval is None else \
+                (1 - EWMA_ALPHA) * self.release_interval + EWMA_ALPHA * interval
+        self.last_release = now
+        self.dispatch()
+
+    def queued_message(self, waiter: Waiter) -> dict:
+        position = self.waiters.index(waiter) + 1
+        if self.ready:
+            eta = position * self.release_interval if self.release_interval is not None else None
+        else:
+            boot = lifecycle.store.expected_boot_seconds("hyperstack", "A4000_16GB", DEFAULT_BOOT_SECONDS)
+            warming_for = time.monotonic() - self.warming_since if self.warming_since is not None else 0.0
+            eta = max(boot - warming_for, POLL_SECONDS)
+        return {"type": "Queued", "position": position, "eta_seconds": round(eta) if eta is not None else None,
+                "status": "backends_busy" if self.ready else self.status.get("status"),
+                "message": self.status.get("message")}
+
+    def to_dict(self) -> dict:
+        return {"per_backend": self.per_backend, "waiting": len(self.waiters),
+                "backends": {ip: self.load(ip) for ip in self.ready},
+                "status": self.status.get("status"),
+                "refreshed_seconds_ago": round(time.monotonic() - self.refreshed_at, 1)
+                if self.refreshed_at > float("-inf") else None}
@@ -0,0 +1,272 @@
+import io
+import math
+import os
+import subprocess
+import wave
+from collections import deque
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import metrics
+
+# --- VAD Configuration ---
+# off: forward everything. drop: suppress silent frames. decimate: forward one in
+# every VAD_FACTOR silent frames, whole, so the backend still hears some silence.
+VAD_MODES = ("off", "drop", "decimate")
+VAD_MODE = os.environ.get("REALTIME_VAD_MODE", "off")
+VAD_THRESHOLD_DB = float(os.environ.get("REALTIME_VAD_THRESHOLD_DB", -45.0))
+VAD_MARGIN_DB = float(os.environ.get("REALTIME_VAD_MARGIN_DB", 10.0))
+VAD_HANGOVER_MS = float(os.environ.get("REALTIME_VAD_HANGOVER_MS", 1000))
+VAD_PREROLL_MS = float(os.environ.get("REALTIME_VAD_PREROLL_MS", 200))
+VAD_FACTOR = int(os.environ.get("REALTIME_VAD_FACTOR", 4))
+
+if VAD_MODE not in VAD_MODES:
+    raise ValueError(f"REALTIME_VAD_MODE must be one of {VAD_MODES}, got {VAD_MODE!r}")
+
+# Process-wide totals are exported as metrics; children are bound once since this runs per frame
+_VAD_FRAMES = {d: metrics.REALTIME_VAD_FRAMES.labels(d) for d in ("forwarded", "suppressed")}
+_VAD_SAMPLES = {d: metrics.REALTIME_VAD_SAMPLES.labels(d) for d in ("forwarded", "suppressed")}
+
+def frame_dbfs(frame: np.ndarray) -> float:
+    """RMS level of a float32 frame in dBFS."""
+    if frame.size == 0:
+        return -120.0
+    rms = np.sqrt(np.dot(frame, frame) / frame.size)
+    return float(20.0 * np.log10(rms + 1e-6))
+
+class EnergyVAD:
+    """
+    Cheap energy-based voice activity gate for a single stream.
+
+    A frame counts as speech if its level is above both the absolute threshold
+    and the running noise floor plus a margin. After speech ends, frames keep
+    flowing for the hangover period so the backend can finish the last word,
+    and a short pre-roll of suppressed frames is released when speech starts
+    again so word onsets are not clipped.
+    """
+    def __init__(self, sample_rate: int, mode: str = VAD_MODE):
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.hangover_samples = int(VAD_HANGOVER_MS * sample_rate / 1000)
+        self.preroll_samples = int(VAD_PREROLL_MS * sample_rate / 1000)
+        self.noise_floor_db = VAD_THRESHOLD_DB
+        self.since_speech = self.hangover_samples
+        self.silent_frames = 0
+        self.preroll = deque()
+        self.preroll_len = 0
+        self.counters = {"frames_forwarded": 0, "frames_suppressed": 0,
+                         "samples_forwarded": 0, "samples_suppressed": 0}
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        level = frame_dbfs(frame)
+        speech = level > max(VAD_THRESHOLD_DB, self.noise_floor_db + VAD_MARGIN_DB)
+        if not speech:
+            # track the floor slowly so a noisy room doesn't read as constant speech
+            self.noise_floor_db += 0.05 * (level - self.noise_floor_db)
+        return speech
+
+    def _count(self, frame: np.ndarray, forwarded: bool):
+        key = "forwarded" if forwarded else "suppressed"
+        self.counters[f"frames_{key}"] += 1
+        self.counters[f"samples_{key}"] += frame.size
+        _VAD_FRAMES[key].inc()
+        _VAD_SAMPLES[key].inc(frame.size)
+
+    def process(self, frame: np.ndarray, client_start: int) -> list:
+        """
+        Gates one frame. Returns a list of (client_start, pcm) pairs to forward
+        to the backend, which may be empty or include pre-roll.
+        """
+        if self.mode == "off":
+            self._count(frame, True)
+            return [(client_start, frame)]
+
+        if self.is_speech(frame):
+            self.since_speech = 0
+            self.silent_frames = 0
+            out = list(self.preroll) + [(client_start, frame)]
+            self.preroll.clear()
+            self.preroll_len = 0
+            self._count(frame, True)
+            return out
+
+        if self.since_speech < self.hangover_samples:
+            self.since_speech += frame.size
+            self._count(frame, True)
+            return [(client_start, frame)]
+
+        self.silent_frames += 1
+        if self.mode == "decimate" and self.silent_frames % VAD_FACTOR == 1:
+            self._count(frame, True)
+            return [(client_start, frame)]
+        self._count(frame, False)
+        if self.mode == "drop":
+            self.preroll.append((client_start, frame))
+            self.preroll_len += frame.size
+            while self.preroll and self.preroll_len - self.preroll[0][1].size >= self.preroll_samples:
+                _, old = self.preroll.popleft()
+                self.preroll_len -= old.size
+        return []
+
+class Timeline:
+    """
+    Maps positions in the audio the backend has received back onto the
+    client's timeline, given that some client audio was never forwarded.
+    Anchors are (backend_sample, client_sample) pairs at every discontinuity.
+    """
+    def __init__(self):
+        self.anchors = deque()
+        self.backend_samples = 0
+        self.expected_client = None
+
+    def reset(self):
+        self.anchors.clear()
+        self.backend_samples = 0
+        self.expected_client = None
+
+    def add(self, client_start: int, length: int):
+        if client_start != self.expected_client:
+            self.anchors.append((self.backend_samples, client_start))
+        self.backend_samples += length
+        self.expected_client = client_start + length
+
+    def to_client(self, backend_sample: float) -> float:
+        if not self.anchors:
+            return backend_sample
+        # lookups arrive roughly in order, so anchors behind the current one can go
+        while len(self.anchors) > 1 and self.anchors[1][0] <= backend_sample:
+            self.anchors.popleft()
+        backend_start, client_start = self.anchors[0]
+        return client_start + (backend_sample - backend_start)
+
+# --- Format normalization and resampling ---
+SAMPLE_FORMATS = {"f32": np.dtype("<f4"), "s16": np.dtype("<i2")}
+MIN_SAMPLE_RATE, MAX_SAMPLE_RATE = 8000, 192000
+MAX_CHANNELS = 8
+# Rate ratios with at most this many phases are filtered phase by phase
+POLYPHASE_LOOP_MAX = 16
+
+class StreamResampler:
+    """
+    Stateful polyphase windowed-sinc resampler for one mono stream.
+
+    Frames can be fed in any size; the filter history carries over between
+    calls so there are no discontinuities at frame boundaries. Each call
+    returns every output sample that can be computed from the input so far.
+    """
+    def __init__(self, in_rate: int, out_rate: int, half_taps: int = 16):
+        g = math.gcd(in_rate, out_rate)
+        self.up, self.down = out_rate // g, in_rate // g
+        self.half_taps = half_taps
+        # When downsampling the cutoff drops to the output Nyquist to avoid aliasing
+        cutoff = min(1.0, out_rate / in_rate)
+        taps = np.arange(-half_taps + 1, half_taps + 1)
+        phases = np.arange(self.up)[:, None] / self.up
+        d = phases - taps[None, :]
+        window = 0.42 + 0.5 * np.cos(np.pi * d / half_taps) + 0.08 * np.cos(2 * np.pi * d / half_taps)
+        bank = cutoff * np.sinc(cutoff * d) * window
+        self.bank = (bank / bank.sum(axis=1, keepdims=True)).astype(np.float32)
+        # Zero history so the first real sample has a full left context
+        self.buf = np.zeros(half_taps - 1, dtype=np.float32)
+        self.t = (half_taps - 1) * self.up
+
+    def process(self, frame: np.ndarray) -> np.ndarray:
+        if self.up == self.down:
+            return frame
+        self.buf = np.concatenate((self.buf, frame))
+        # Output n sits at input position (t + n*down) / up and needs half_taps samples to its right
+        last_t = (self.buf.size - self.half_taps) * self.up - 1
+        if last_t < self.t:
+            return np.zeros(0, dtype=np.float32)
+        n = (last_t - self.t) // self.down + 1
+        # windows[i] holds the 2*half_taps inputs around position i + half_taps - 1
+        windows = sliding_window_view(self.buf, 2 * self.half_taps)
+        if self.up <= POLYPHASE_LOOP_MAX:
+            # Outputs r, r+up, r+2*up, ... share a phase and step through the input by `down`
+            out = np.empty(n, dtype=np.float32)
+            for r in range(min(self.up, n)):
+                idx, phase = divmod(self.t + r * self.down, self.up)
+                count = len(range(r, n, self.up))
+                start = idx - self.half_taps + 1
+                out[r::self.up] = windows[start:start + (count - 1) * self.down + 1:self.down] @ self.bank[phase]
+        else:
+            t = self.t + np.arange(n) * self.down
+            idx, phase = np.divmod(t, self.up)
+            out = np.einsum("ij,ij->i", windows[idx - self.half_taps + 1], self.bank[phase])
+        self.t += n * self.down
+        # Drop input no future output can reach
+        keep_from = self.t // self.up - self.half_taps + 1
+        self.buf = self.buf[keep_from:]
+        self.t -= keep_from * self.up
+        return out.astype(np.float32, copy=False)
+
+class AudioNormalizer:
+    """
+    Converts client PCM in its declared rate, channel count and sample format
+    into mono float32 at the backend's sample rate. Binary payloads may split
+    samples across frames; the leftover bytes are held for the next payload.
+    """
+    def __init__(self, sample_rate: int, out_rate: int, channels: int = 1, sample_format: str = "f32"):
+        if not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+            raise ValueError(f"sample_rate must be between {MIN_SAMPLE_RATE} and {MAX_SAMPLE_RATE}")
+        if not 1 <= channels <= MAX_CHANNELS:
+            raise ValueError(f"channels must be between 1 and {MAX_CHANNELS}")
+        if sample_format not in SAMPLE_FORMATS:
+            raise ValueError(f"format must be one of {tuple(SAMPLE_FORMATS)}")
+        self.channels = channels
+        self.dtype = SAMPLE_FORMATS[sample_format]
+        self.scale = 1.0 / 32768 if sample_format == "s16" else None
+        self.resampler = StreamResampler(sample_rate, out_rate)
+        self.frame_bytes = self.dtype.itemsize * channels
+        self.remainder = b""
+
+    def from_bytes(self, payload: bytes) -> np.ndarray:
+        if self.remainder:
+            payload = self.remainder + payload
+        usable = len(payload) - len(payload) % self.frame_bytes
+        self.remainder = payload[usable:]
+        return self._normalize(np.frombuffer(payload, dtype=self.dtype, count=usable // self.dtype.itemsize))
+
+    def from_list(self, pcm: list) -> np.ndarray:
+        samples = np.asarray(pcm, dtype=np.float32)
+        return self._normalize(samples[:samples.size - samples.size % self.channels])
+
+    def _normalize(self, samples: np.ndarray) -> np.ndarray:
+        samples = samples.astype(np.float32, copy=False)
+        if self.scale is not None:
+            samples = samples * self.scale
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1)
+        return self.resampler.process(samples)
+
+# --- Whole-file decoding ---
+FFMPEG = os.environ.get("FFMPEG_BINARY", "ffmpeg")
+
+def decode_file(data: bytes, out_rate: int) -> np.ndarray:
+    """
+    Decodes a whole audio file to mono float32 at `out_rate`. 16-bit PCM WAV is
+    handled here; anything else (mp3, ogg/opus, webm, m4a, other WAV encodings)
+    goes through ffmpeg. Raises ValueError for audio neither can read.
+    """
+    try:
+        with wave.open(io.BytesIO(data)) as w:
+            if w.getsampwidth() == 2 and MIN_SAMPLE_RATE <= w.getframerate() <= MAX_SAMPLE_RATE \
+                    and 1 <= w.getnchannels() <= MAX_CHANNELS:
+                normalizer = AudioNormalizer(w.getframerate(), out_rate, w.getnchannels(), "s16")
+                pcm = normalizer.from_bytes(w.readframes(w.getnframes()))
+                # push the resampler's lookahead out so the last few ms aren't lost
+                tail = normalizer.resampler.process(np.zeros(normalizer.resampler.half_taps, dtype=np.float32))
+                return np.concatenate((pcm, tail))
+    except (wave.Error, EOFError):
+        pass
+    return _ffmpeg_decode(data, out_rate)
+
+def _ffmpeg_decode(data: bytes, out_rate: int) -> np.ndarray:
+    command = [FFMPEG, "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+               "-f", "f32le", "-acodec", "pcm_f32le", "-ac", "1", "-ar", str(out_rate), "pipe:1"]
+    try:
+        result = subprocess.run(command, input=data, capture_output=True, timeout=300)
+    except FileNotFoundError:
+        raise ValueError("Only 16-bit PCM WAV can be decoded without ffmpeg, which is not installed.")
+    if result.returncode != 0:
+        raise ValueError(f"Could not decode audio: {result.stderr.decode(errors='replace').strip()[:300]}")
+    return np.frombuffer(result.stdout, dtype="<f4").astype(np.float32)
@@ -0,0 +1,60 @@
+"""
+Per-frame cost of the realtime audio path: format decoding, downmixing,
+resampling to 24 kHz and the VAD gate.
+
+Run from ml-service/:
+    python -m benchmarks.audio_bench [--frame-ms 85] [--seconds 30]
+"""
+import argparse
+import time
+import numpy as np
+import audio
+
+CASES = [
+    # (label, sample_rate, channels, format)
+    ("24k f32 mono (passthrough)", 24000, 1, "f32"),
+    ("16k s16 mono", 16000, 1, "s16"),
+    ("44.1k f32 mono", 44100, 1, "f32"),
+    ("48k f32 mono", 48000, 1, "f32"),
+    ("48k s16 stereo", 48000, 2, "s16"),
+]
+
+def make_payloads(sample_rate: int, channels: int, sample_format: str, frame_ms: float, seconds: float) -> list:
+    n = int(sample_rate * seconds)
+    t = np.arange(n) / sample_rate
+    signal = 0.3 * np.sin(2 * np.pi * 220 * t) * (np.sin(2 * np.pi * 0.25 * t) > 0)
+    signal = np.repeat(signal[:, None], channels, axis=1).ravel()
+    if sample_format == "s16":
+        signal = (signal * 32767).astype("<i2")
+    else:
+        signal = signal.astype("<f4")
+    frame_len = int(sample_rate * frame_ms / 1000) * channels
+    return [signal[i:i + frame_len].tobytes() for i in range(0, signal.size, frame_len)]
+
+def bench_case(label, sample_rate, channels, sample_format, frame_ms, seconds, vad_mode):
+    payloads = make_payloads(sample_rate, channels, sample_format, frame_ms, seconds)
+    normalizer = audio.AudioNormalizer(sample_rate, 24000, channels, sample_format)
+    vad = audio.EnergyVAD(24000, mode=vad_mode)
+    client_start = 0
+    started = time.perf_counter()
+    for payload in payloads:
+        frame = normalizer.from_bytes(payload)
+        vad.process(frame, client_start)
+        client_start += frame.size
+    elapsed = time.perf_counter() - started
+    per_frame_us = elapsed / len(payloads) * 1e6
+    print(f"{label:<30} {per_frame_us:9.1f} us/frame   {seconds / elapsed:9.0f}x realtime")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark realtime audio normalization and VAD.")
+    parser.add_argument("--frame-ms", type=float, default=85.0, help="Client frame length (85 ms = 2048 samples at 24 kHz).")
+    parser.add_argument("--seconds", type=float, default=30.0, help="Seconds of audio per case.")
+    parser.add_argument("--vad", choices=audio.VAD_MODES, default="drop", help="VAD mode to include in the timing.")
+    args = parser.parse_args()
+
+    print(f"frame={args.frame_ms} ms, audio={args.seconds} s per case, vad={args.vad}")
+    for case in CASES:
+        bench_case(*case, args.frame_ms, args.seconds, args.vad)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Benchmark suite for /embed.
+
+Drives the embedding pipeline in-process (importing main, so the model loads
+here) and/or over HTTP against a running service, over synthetic images of
+several sizes and optionally a directory of real photos, at several batch
+sizes and concurrency levels. Reports images/s, p50/p95/p99 latency, peak RSS
+and per-stage timings (decode, preprocess, forward, normalize, serialize).
+Over HTTP the stage timings come from the service's Server-Timing header.
+
+Every run is written to benchmarks/results/ as JSON; --compare checks the new
+numbers against an earlier file and exits non-zero on a regression.
+
+Run from ml-service/:
+    python -m benchmarks.embed_bench --mode inprocess --batch-sizes 1,8 --concurrency 1,4
+    python -m benchmarks.embed_bench --mode http --url http://localhost:9052 --images ~/photos
+    python -m benchmarks.embed_bench --compare benchmarks/results/embed-20250901-120000.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import psutil
+import requests
+from PIL import Image
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+STAGES = ("decode", "preprocess", "forward", "normalize", "serialize")
+
+def synthetic_corpus(size: tuple, count: int, seed: int = 0) -> list:
+    """JPEG-encoded images with some low-frequency structure, so they compress like photos."""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    images = []
+    for _ in range(count):
+        coarse = rng.integers(0, 256, (max(1, h // 32), max(1, w // 32), 3), dtype=np.uint8)
+        img = Image.fromarray(coarse).resize((w, h), Image.BILINEAR)
+        noise = rng.integers(-12, 12, (h, w, 3))
+        img = Image.fromarray(np.clip(np.asarray(img, dtype=np.int16) + noise, 0, 255).astype(np.uint8))
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=90)
+        images.append(buf.getvalue())
+    return images
+
+def directory_corpus(path: str, limit: int) -> list:
+    files = sorted(f for f in os.listdir(path) if f.lower().endswith(IMAGE_EXTENSIONS))[:limit]
+    images = []
+    for name in files:
+        with open(os.path.join(path, name), "rb") as f:
+            images.append(f.read())
+    return images
+
+def percentiles(latencies: list) -> dict:
+    arr = np.array(latencies) * 1000
+    return {f"p{p}": round(float(np.percentile(arr, p)), 2) for p in (50, 95, 99)}
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def run_inprocess(corpus: list, batch_size: int, concurrency: int, warmup: int) -> dict:
+    import main
+
+    def run_batch(batch: list, timings: dict) -> float:
+        started = time.perf_counter()
+        t0 = time.perf_counter()
+        pil_imgs = [main.decode_image(b) for b in batch]
+        timings["decode"] = timings.get("decode", 0.0) + time.perf_counter() - t0
+        embeddings = main.embed_images(pil_imgs, timings)
+        t0 = time.perf_counter()
+        json.dumps({"image_embeddings": embeddings.tolist()})
+        timings["serialize"] = timings.get("serialize", 0.0) + time.perf_counter() - t0
+        return time.perf_counter() - started
+
+    batches = [corpus[i:i + batch_size] for i in range(0, len(corpus), batch_size)]
+    for batch in batches[:warmup]:
+        run_batch(batch, {})
+
+    lock = threading.Lock()
+    timings, latencies = {}, []
+    def worker(batch):
+        local = {}
+        latency = run_batch(batch, local)
+        with lock:
+            latencies.append(latency)
+            for stage, seconds in local.items():
+                timings[stage] = timings.get(stage, 0.0) + seconds
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(worker, batches))
+    wall = time.perf_counter() - started
+    return {
+        "images_per_s": round(len(corpus) / wall, 2),
+        "latency_ms": percentiles(latencies),
+        "stages_ms_per_image": {s: round(timings.get(s, 0.0) * 1000 / len(corpus), 3) for s in STAGES},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def parse_server_timing(header: str) -> dict:
+    timings = {}
+    for part in header.split(","):
+        name, _, dur = part.strip().partition(";dur=")
+        if dur:
+            timings[name] = float(dur) / 1000
+    return timings
+
+def run_http(corpus: list, url: str, concurrency: int, warmup: int, server: psutil.Process | None) -> dict:
+    local = threading.local()
+    def post(img_bytes: bytes):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        started = time.perf_counter()
+        response = local.session.post(f"{url}/embed", files={"file": ("bench.jpg", img_bytes, "image/jpeg")})
+        response.raise_for_status()
+        response.json()
+        return time.perf_counter() - started, parse_server_timing(response.headers.get("Server-Timing", ""))
+
+    for img_bytes in corpus[:warmup]:
+        post(img_bytes)
+
+    peak = {"rss": server.memory_info().rss if server else 0}
+    stop = threading.Event()
+    def sample():
+        while not stop.wait(0.25):
+            peak["rss"] = max(peak["rss"], server.memory_info().rss)
+    sampler = threading.Thread(target=sample, daemon=True)
+    if server:
+        sampler.start()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(post, corpus))
+    wall = time.perf_counter() - started
+    stop.set()
+
+    timings = {}
+    for _, server_timings in results:
+        for stage, seconds in server_timings.items():
+            timings[stage] = timings.get(stage, 0.0) + seconds
+    return {
+        "images_per_s": round(len(corpus) / wall, 2),
+        "latency_ms": percentiles([latency for latency, _ in results]),
+        "stages_ms_per_image": {s: round(timings.get(s, 0.0) * 1000 / len(corpus), 3) for s in STAGES},
+        "peak_rss_mb": round(peak["rss"] / 2**20, 1) if server else None,
+    }
+
+def environment() -> dict:
+    env = {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()}
+    try:
+        env["git_commit"] = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                           capture_output=True, text=True).stdout.strip()
+    except OSError:
+        pass
+    try:
+        import torch, transformers
+        env.update(torch=torch.__version__, transformers=transformers.__version__,
+                   cuda=torch.cuda.is_available(), torch_threads=torch.get_num_threads())
+    except ImportError:
+        pass
+    return env
+
+def run_key(run: dict) -> tuple:
+    return (run["mode"], run["corpus"], run["batch_size"], run["concurrency"])
+
+def compare(previous_path: str, runs: list, threshold: float) -> list:
+    """Returns human-readable regressions: throughput down or p95 up by more than threshold %."""
+    with open(previous_path) as f:
+        previous = {run_key(r): r for r in json.load(f)["runs"]}
+    regressions = []
+    for run in runs:
+        old = previous.get(run_key(run))
+        if old is None:
+            continue
+        label = "/".join(str(k) for k in run_key(run))
+        throughput = 100 * (run["images_per_s"] - old["images_per_s"]) / old["images_per_s"]
+        p95 = 100 * (run["latency_ms"]["p95"] - old["latency_ms"]["p95"]) / old["latency_ms"]["p95"]
+        print(f"{label:<45} images/s {throughput:+6.1f}%   p95 {p95:+6.1f}%")
+        if throughput < -threshold:
+            regressions.append(f"{label}: images/s down {-throughput:.1f}%")
+        if p95 > threshold:
+            regressions.append(f"{label}: p95 latency up {p95:.1f}%")
+    return regressions
+
+def parse_ints(value: str) -> list:
+    return [int(v) for v in value.split(",") if v]
+
+def parse_sizes(value: str) -> list:
+    return [tuple(int(x) for x in v.split("x")) for v in value.split(",") if v]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the /embed pipeline.")
+    parser.add_argument("--mode", choices=["inprocess", "http", "both"], default="inprocess")
+    parser.add_argument("--url", default="http://localhost:5000", help="Service base URL for http mode.")
+    parser.add_argument("--server-pid", type=int, help="Service PID, to sample its peak RSS in http mode.")
+    parser.add_argument("--sizes", type=parse_sizes, default=parse_sizes("224x224,640x480,1920x1080,4032x3024"),
+                        help="Synthetic image sizes, WxH comma-separated. Empty string to skip.")
+    parser.add_argument("--count", type=int, default=32, help="Images per synthetic size.")
+    parser.add_argument("--images", help="Directory of real images to include as a corpus.")
+    parser.add_argument("--batch-sizes", type=parse_ints, default=[1, 8], help="In-process batch sizes.")
+    parser.add_argument("--concurrency", type=parse_ints, default=[1, 4])
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--out", help="Result file (default: benchmarks/results/embed-<timestamp>.json).")
+    parser.add_argument("--compare", help="Earlier result file to compare against.")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent.")
+    args = parser.parse_args()
+
+    corpora = {f"synthetic-{w}x{h}": synthetic_corpus((w, h), args.count) for w, h in args.sizes}
+    if args.images:
+        corpora["real"] = directory_corpus(args.images, limit=1000)
+    modes = ["inprocess", "http"] if args.mode == "both" else [args.mode]
+    server = psutil.Process(args.server_pid) if args.server_pid else None
+
+    runs = []
+    for mode in modes:
+        for corpus_name, corpus in corpora.items():
+            for batch_size in (args.batch_sizes if mode == "inprocess" else [1]):
+                for concurrency in args.concurrency:
+                    if mode == "inprocess":
+                        result = run_inprocess(corpus, batch_size, concurrency, args.warmup)
+                    else:
+                        result = run_http(corpus, args.url, concurrency, args.warmup, server)
+                    run = {"mode": mode, "corpus": corpus_name, "images": len(corpus),
+                           "batch_size": batch_size, "concurrency": concurrency, **result}
+                    runs.append(run)
+                    print(f"{mode:<9} {corpus_name:<22} batch={batch_size:<3} conc={concurrency:<3} "
+                          f"{run['images_per_s']:8.2f} img/s  p50={run['latency_ms']['p50']:.1f}ms "
+                          f"p95={run['latency_ms']['p95']:.1f}ms  "
+                          + " ".join(f"{s}={v:.1f}" for s, v in run["stages_ms_per_image"].items()))
+
+    out = args.out or os.path.join(RESULTS_DIR, f"embed-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(),
+                   "args": {k: v for k, v in vars(args).items() if k not in ("compare", "out")}, "runs": runs},
+                  f, indent=2)
+    print(f"wrote {out}")
+
+    if args.compare:
+        regressions = compare(args.compare, runs, args.threshold)
+        if regressions:
+            print("REGRESSIONS:\n  " + "\n  ".join(regressions))
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Stand-in for the Kyutai moshi-server ASR endpoint, for load testing the
+realtime proxy without a GPU.
+
+Speaks the same msgpack protocol: sends Ready on connect, one Step per 80 ms
+frame of audio received, and a Word (followed by EndWord) every --word-every
+seconds of audio. Word start times are the exact position in the received
+stream, so a client can measure how long after sending a frame the
+corresponding word came back. Also serves the batched mux protocol on
+/api/asr-streaming-mux.
+
+Run from ml-service/:
+    python -m benchmarks.fake_kyutai --port 8080
+"""
+import argparse
+import asyncio
+import logging
+import msgpack
+import websockets
+
+SAMPLE_RATE = 24000
+FRAME_SIZE = 1920  # 80 ms, the backend's step size
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+logging.getLogger("websockets").setLevel(logging.WARNING)
+
+class FakeStream:
+    """Per-stream state: turns incoming Audio messages into Step/Word replies."""
+    def __init__(self, word_every: float, delay: float):
+        self.samples = 0
+        self.step_idx = 0
+        self.word_every = int(word_every * SAMPLE_RATE)
+        self.delay = int(delay * SAMPLE_RATE)
+        self.next_word = self.word_every
+        self.words = 0
+
+    def feed(self, msg: bytes) -> list:
+        data = msgpack.unpackb(msg, raw=False)
+        if data.get("type") != "Audio":
+            return []
+        out = []
+        before = self.samples
+        self.samples += len(data["pcm"])
+        for _ in range(self.samples // FRAME_SIZE - before // FRAME_SIZE):
+            out.append({"type": "Step", "step_idx": self.step_idx, "prs": [0.0, 0.0, 0.0, 0.0], "buffered_pcm": 0})
+            self.step_idx += 1
+        # A word is "recognised" once `delay` seconds of audio past its start have arrived
+        while self.samples >= self.next_word + self.delay:
+            start = self.next_word / SAMPLE_RATE
+            out.append({"type": "Word", "text": f"word{self.words}", "start_time": start})
+            out.append({"type": "EndWord", "stop_time": start + 0.2})
+            self.words += 1
+            self.next_word += self.word_every
+        return [msgpack.packb(m, use_bin_type=True, use_single_float=True) for m in out]
+
+async def handle_direct(ws, args):
+    stream = FakeStream(args.word_every, args.delay)
+    await ws.send(msgpack.packb({"type": "Ready"}))
+    async for message in ws:
+        for reply in stream.feed(message):
+            await ws.send(reply)
+
+async def handle_mux(ws, args):
+    streams = {}
+    async for message in ws:
+        batch = msgpack.unpackb(message, raw=False)
+        out = []
+        for item in batch.get("items", []):
+            sid, op = item["sid"], item["op"]
+            if op == "open":
+                streams[sid] = FakeStream(args.word_every, args.delay)
+                out.append({"sid": sid, "op": "data", "msg": msgpack.packb({"type": "Ready"})})
+            elif op == "close":
+                streams.pop(sid, None)
+            elif sid in streams:
+                out.extend({"sid": sid, "op": "data", "msg": reply} for reply in streams[sid].feed(item["msg"]))
+        if out:
+            await ws.send(msgpack.packb({"type": "Batch", "items": out}, use_bin_type=True))
+
+async def serve(host: str, port: int, args):
+    async def handler(ws):
+        try:
+            if ws.request.path.endswith("-mux"):
+                await handle_mux(ws, args)
+            else:
+                await handle_direct(ws, args)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+    async with websockets.serve(handler, host, port, max_size=None):
+        logger.info(f"Fake Kyutai backend listening on ws://{host}:{port}")
+        await asyncio.Future()
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Kyutai ASR websocket backend.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--word-every", type=float, default=0.5, help="Seconds of audio per emitted word.")
+    parser.add_argument("--delay", type=float, default=0.0, help="Simulated model delay in seconds of audio.")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Load generator and latency benchmark for /realtime/ws-kyutai-tts.
+
+Replays WAV files (or a synthetic tone) as N concurrent clients paced at real
+time, using JSON and/or binary framing, and reports throughput, frame-to-word
+latency percentiles and the proxy's CPU and memory cost per session.
+
+By default it starts benchmarks.fake_kyutai and a proxy process that only
+mounts the realtime router (no embedding model), wired together through
+REALTIME_STATIC_BACKENDS. Point --proxy-url/--proxy-pid at an already running
+proxy to measure that instead.
+
+Run from ml-service/:
+    python -m benchmarks.realtime_load --sessions 50 --seconds 20 --framing both
+    python -m benchmarks.realtime_load --sessions 20 --wav sample.wav --mux
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import wave
+import numpy as np
+import psutil
+import websockets
+
+SAMPLE_RATE = 24000
+ML_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_wav(path: str):
+    """Returns (int16 samples interleaved, sample_rate, channels)."""
+    with wave.open(path, "rb") as w:
+        if w.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        frames = w.readframes(w.getnframes())
+        return np.frombuffer(frames, dtype="<i2"), w.getframerate(), w.getnchannels()
+
+def synth_audio(seconds: float):
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    tone = 0.3 * np.sin(2 * np.pi * 220 * t) * (np.sin(2 * np.pi * 0.5 * t) > -0.5)
+    return (tone * 32767).astype("<i2"), SAMPLE_RATE, 1
+
+class ClientStats:
+    def __init__(self):
+        self.frame_ends = []    # end of each sent frame on the 24 kHz client timeline (seconds)
+        self.send_times = []
+        self.latencies = []
+        self.words = 0
+        self.frames = 0
+        self.bytes_sent = 0
+        self.error = None
+
+def encode_clip(clip, framing: str, frame_ms: float) -> dict:
+    """
+    Pre-encodes a clip's frames so client-side JSON encoding doesn't eat the
+    generator's CPU and show up as proxy latency.
+    """
+    samples, rate, channels = clip
+    frame_len = int(rate * frame_ms / 1000)
+    payloads, frame_ends = [], []
+    for i in range(0, samples.size // channels, frame_len):
+        frame = samples[i * channels:(i + frame_len) * channels]
+        if framing == "binary":
+            payloads.append(frame.tobytes())
+        else:
+            payloads.append(json.dumps({"type": "Audio", "pcm": (frame / 32768).tolist()}))
+        frame_ends.append((i + frame.size // channels) / rate)
+    sample_format = "s16" if framing == "binary" else "f32"
+    query = f"?sample_rate={rate}&channels={channels}&format={sample_format}"
+    return {"query": query, "payloads": payloads, "frame_ends": frame_ends}
+
+async def run_client(url: str, encoded: dict, frame_ms: float, drain: float, stats: ClientStats):
+    uri = url + encoded["query"]
+
+    async def receive(ws):
+        async for message in ws:
+            data = json.loads(message)
+            if data.get("type") == "Word":
+                now = time.perf_counter()
+                stats.words += 1
+                i = bisect.bisect_left(stats.frame_ends, data["start_time"])
+                if i < len(stats.send_times):
+                    stats.latencies.append(now - stats.send_times[i])
+            elif data.get("type") == "Error":
+                stats.error = data.get("status")
+
+    try:
+        async with websockets.connect(uri, max_size=None) as ws:
+            receiver = asyncio.create_task(receive(ws))
+            started = time.perf_counter()
+            for n, (payload, frame_end) in enumerate(zip(encoded["payloads"], encoded["frame_ends"])):
+                # absolute schedule so a slow send doesn't drift the whole stream
+                delay = started + n * frame_ms / 1000 - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                stats.frame_ends.append(frame_end)
+                stats.send_times.append(time.perf_counter())
+                await ws.send(payload)
+                stats.frames += 1
+                stats.bytes_sent += len(payload)
+            await asyncio.sleep(drain)
+            receiver.cancel()
+    except Exception as e:
+        stats.error = f"{type(e).__name__}: {e}"
+
+async def sample_process(proc: psutil.Process, stop: asyncio.Event, peak: dict):
+    while not stop.is_set():
+        try:
+            peak["rss"] = max(peak["rss"], proc.memory_info().rss)
+        except psutil.Error:
+            return
+        await asyncio.sleep(0.25)
+
+async def run_round(args, clips, framing: str, proxy: psutil.Process | None) -> dict:
+    url = f"{args.proxy_url}/realtime/ws-kyutai-tts"
+    stats = [ClientStats() for _ in range(args.sessions)]
+    encoded = [encode_clip(clip, framing, args.frame_ms) for clip in clips]
+
+    baseline_rss = proxy.memory_info().rss if proxy else 0
+    cpu_before = sum(proxy.cpu_times()[:2]) if proxy else 0.0
+    peak = {"rss": baseline_rss}
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_process(proxy, stop, peak)) if proxy else None
+
+    async def staggered(i):
+        await asyncio.sleep(i * args.ramp / max(1, args.sessions))
+        await run_client(url, encoded[i % len(encoded)], args.frame_ms, args.drain, stats[i])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(staggered(i) for i in range(args.sessions)))
+    wall = time.perf_counter() - started
+    stop.set()
+    if sampler:
+        await sampler
+
+    latencies = np.array([l for s in stats for l in s.latencies]) * 1000
+    audio_seconds = sum(s.frame_ends[-1] for s in stats if s.frame_ends)
+    errors = [s.error for s in stats if s.error]
+    result = {
+        "framing": framing,
+        "sessions": args.sessions,
+        "wall_seconds": round(wall, 2),
+        "failed_sessions": len(errors),
+        "errors": sorted(set(errors))[:5],
+        "frames_per_second": round(sum(s.frames for s in stats) / wall, 1),
+        "mbit_per_second_in": round(sum(s.bytes_sent for s in stats) * 8 / wall / 1e6, 2),
+        "audio_seconds_per_second": round(audio_seconds / wall, 2),
+        "words": sum(s.words for s in stats),
+        "latency_ms_p50": round(float(np.percentile(latencies, 50)), 2) if latencies.size else None,
+        "latency_ms_p99": round(float(np.percentile(latencies, 99)), 2) if latencies.size else None,
+        "latency_ms_max": round(float(latencies.max()), 2) if latencies.size else None,
+    }
+    if proxy:
+        cpu = sum(proxy.cpu_times()[:2]) - cpu_before
+        result["proxy_cpu_seconds"] = round(cpu, 2)
+        # share of one core each session costs while streaming
+        result["proxy_cpu_pct_per_session"] = round(100 * cpu / max(audio_seconds, 1e-9), 3)
+        result["proxy_rss_mb_baseline"] = round(baseline_rss / 2**20, 1)
+        result["proxy_rss_kb_per_session"] = round((peak["rss"] - baseline_rss) / 1024 / args.sessions, 1)
+    return result
+
+def wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise TimeoutError(f"nothing listening on port {port} after {timeout}s")
+
+def spawn_stack(args) -> list:
+    env = dict(os.environ)
+    env["REALTIME_STATIC_BACKENDS"] = f"127.0.0.1:{args.backend_port}"
+    # hyperstack refuses to import without these; the static backend means they're never used
+    for var in ("HYPERSTACK_API_KEY", "HYPERSTACK_ADMIN_TOKEN", "HYPERSTACK_SPINUP_PERMISSION_TOKEN"):
+        env.setdefault(var, "benchmark")
+    if args.mux:
+        env["REALTIME_MUX_PATH"] = "/api/asr-streaming-mux"
+    backend = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_kyutai", "--port", str(args.backend_port),
+         "--word-every", str(args.word_every)],
+        cwd=ML_SERVICE_DIR, env=env)
+    proxy = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.realtime_proxy_app:app",
+         "--port", str(args.proxy_port), "--log-level", "warning"],
+        cwd=ML_SERVICE_DIR, env=env)
+    wait_for_port(args.backend_port)
+    wait_for_port(args.proxy_port)
+    return [backend, proxy]
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the realtime transcription proxy.")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent client sessions.")
+    parser.add_argument("--wav", action="append", default=[], help="16-bit WAV file(s) to replay; clients cycle through them.")
+    parser.add_argument("--seconds", type=float, default=15.0, help="Length of the synthetic clip when no --wav is given.")
+    parser.add_argument("--framing", choices=["json", "binary", "both"], default="both")
+    parser.add_argument("--frame-ms", type=float, default=80.0)
+    parser.add_argument("--ramp", type=float, default=2.0, help="Seconds over which to stagger session starts.")
+    parser.add_argument("--drain", type=float, default=1.0, help="Seconds to wait for trailing words after the clip.")
+    parser.add_argument("--word-every", type=float, default=0.5, help="Fake backend word spacing in seconds.")
+    parser.add_argument("--mux", action="store_true", help="Enable backend multiplexing in the spawned proxy.")
+    parser.add_argument("--proxy-url", help="Use a running proxy (ws://host:port) instead of spawning one.")
+    parser.add_argument("--proxy-pid", type=int, help="PID of the running proxy, for CPU/memory figures.")
+    parser.add_argument("--proxy-port", type=int, default=18090)
+    parser.add_argument("--backend-port", type=int, default=18080)
+    parser.add_argument("--json-out", help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    clips = [load_wav(p) for p in args.wav] or [synth_audio(args.seconds)]
+    children = []
+    try:
+        if args.proxy_url:
+            proxy = psutil.Process(args.proxy_pid) if args.proxy_pid else None
+        else:
+            children = spawn_stack(args)
+            args.proxy_url = f"ws://127.0.0.1:{args.proxy_port}"
+            proxy = psutil.Process(children[1].pid)
+
+        framings = ["json", "binary"] if args.framing == "both" else [args.framing]
+        results = []
+        for framing in framings:
+            result = asyncio.run(run_round(args, clips, framing, proxy))
+            results.append(result)
+            print(json.dumps(result, indent=2))
+        if args.json_out:
+            with open(args.json_out, "w") as f:
+                json.dump(results, f, indent=2)
+    finally:
+        for child in children:
+            child.terminate()
+            child.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+"""
+Just the realtime router, so the proxy can be load tested without loading
+the embedding model. Used by benchmarks/realtime_load.py.
+"""
+from fastapi import FastAPI, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+import loopwatch
+import realtime
+
+app = FastAPI()
+app.include_router(realtime.router, prefix='/realtime')
+
+@app.on_event('startup')
+async def start_loop_watchdog():
+    loopwatch.start()
+
+@app.get('/metrics')
+def get_metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
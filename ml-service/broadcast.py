@@ -0,0 +1,165 @@
+"""
+Read-only fan-out of a live transcription.
+
+A /realtime/ws-kyutai-tts client that connects with `?publish=1` gets
+
+    {"type": "Published", "channel": "<id>"}
+
+and anyone holding that id can watch the transcript on
+/realtime/ws-kyutai-tts/<id>/subscribe without the audio going to a backend
+twice. The id is random and unguessable; it is the only access check.
+
+Each backend message is JSON-encoded once, for the producer, and the same
+string is offered to every subscriber. Offering never waits: every
+subscriber has its own buffer of REALTIME_BROADCAST_BUFFER messages and its
+own sender task. When a viewer falls that far behind, its oldest messages are
+dropped and it gets {"type": "Lagged", "skipped": n} before the next one. A
+viewer whose socket doesn't take a message within
+REALTIME_BROADCAST_SEND_TIMEOUT_SECONDS is disconnected. Either way the
+producer never slows down.
+
+New subscribers first get the last REALTIME_BROADCAST_BACKLOG words of the
+session so far. When the session ends they get {"type": "Ended"} and are
+closed.
+"""
+import asyncio
+import json
+import logging
+import os
+import secrets
+from collections import deque
+from fastapi import WebSocket
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+BUFFER = int(os.environ.get("REALTIME_BROADCAST_BUFFER", 256))
+SEND_TIMEOUT_SECONDS = float(os.environ.get("REALTIME_BROADCAST_SEND_TIMEOUT_SECONDS", 10))
+MAX_SUBSCRIBERS = int(os.environ.get("REALTIME_BROADCAST_MAX_SUBSCRIBERS", 20))
+BACKLOG = int(os.environ.get("REALTIME_BROADCAST_BACKLOG", 200))
+BACKLOG_TYPES = ("Word", "EndWord")
+
+class Subscriber:
+    def __init__(self, buffer: int = BUFFER):
+        self.buffer = buffer
+        self.queue = deque()
+        self.skipped = 0
+        self.wakeup = asyncio.Event()
+        self.ended = False
+
+    def offer(self, text: str):
+        """Queues an encoded message without waiting; drops the oldest if the buffer is full."""
+        if len(self.queue) >= self.buffer:
+            self.queue.popleft()
+            self.skipped += 1
+            metrics.REALTIME_BROADCAST_SKIPPED.inc()
+        self.queue.append(text)
+        self.wakeup.set()
+
+    def end(self):
+        self.ended = True
+        self.wakeup.set()
+
+    async def _send(self, websocket: WebSocket, text: str):
+        await asyncio.wait_for(websocket.send_text(text), SEND_TIMEOUT_SECONDS)
+
+    async def send_loop(self, websocket: WebSocket):
+        """Drains the buffer to the socket until the channel ends. Raises TimeoutError for a stuck viewer."""
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            while self.queue:
+                if self.skipped:
+                    skipped, self.skipped = self.skipped, 0
+                    await self._send(websocket, json.dumps({"type": "Lagged", "skipped": skipped}))
+                await self._send(websocket, self.queue.popleft())
+            if self.ended:
+                await self._send(websocket, json.dumps({"type": "Ended"}))
+                return
+
+class Channel:
+    """One published session: its subscribers and a backlog of recent words."""
+    def __init__(self):
+        self.id = secrets.token_urlsafe(16)
+        self.subscribers = set()
+        self.backlog = deque(maxlen=BACKLOG)
+
+    def publish(self, msg_type: str, text: str):
+        """Fans an already encoded message out to every subscriber."""
+        if msg_type in BACKLOG_TYPES:
+            self.backlog.append(text)
+        for subscriber in self.subscribers:
+            subscriber.offer(text)
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber()
+        for text in self.backlog:
+            subscriber.offer(text)
+        self.subscribers.add(subscriber)
+        metrics.REALTIME_BROADCAST_SUBSCRIBERS.inc()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.discard(subscriber)
+            metrics.REALTIME_BROADCAST_SUBSCRIBERS.dec()
+
+channels = {}  # id -> Channel
+
+def open_channel() -> Channel:
+    channel = Channel()
+    channels[channel.id] = channel
+    return channel
+
+def close_channel(channel: Channel):
+    channels.pop(channel.id, None)
+    for subscriber in channel.subscribers:
+        subscriber.end()
+
+async def serve(websocket: WebSocket, channel_id: str):
+    """Streams a channel to one read-only viewer."""
+    channel = channels.get(channel_id)
+    if channel is None or len(channel.subscribers) >= MAX_SUBSCRIBERS:
+        status, message = ("unknown_channel", "No live session with that id.") if channel is None else \
+            ("too_many_subscribers", f"At most {MAX_SUBSCRIBERS} viewers per session.")
+        await websocket.send_text(json.dumps({"type": "Error", "status": status, "message": message}))
+        await websocket.close()
+        return
+    subscriber = channel.subscribe()
+    subscribed = json.dumps({"type": "Subscribed", "channel": channel_id, "backlog": len(subscriber.queue)})
+
+    async def send_all():
+        # The greeting gets the same send timeout as everything after it
+        await subscriber._send(websocket, subscribed)
+        await subscriber.send_loop(websocket)
+
+    async def until_disconnect():
+        # Read-only: anything the viewer sends is ignored
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    sending = asyncio.create_task(send_all())
+    watching = asyncio.create_task(until_disconnect())
+    outcome = "left"
+    try:
+        await asyncio.wait({sending, watching}, return_when=asyncio.FIRST_COMPLETED)
+        if sending.done():
+            try:
+                sending.result()
+                outcome = "ended"
+            except TimeoutError:
+                outcome = "slow"
+                logger.info(f"Dropped a viewer of channel {channel_id[:6]} that stopped reading.")
+            except Exception:
+                pass  # socket already gone
+    finally:
+        for task in (sending, watching):
+            task.cancel()
+        channel.unsubscribe(subscriber)
+        metrics.REALTIME_BROADCAST_DISCONNECTS.labels(outcome).inc()
+    if outcome != "left":
+        try:
+            await websocket.close()
+        except Exception:
+            pass
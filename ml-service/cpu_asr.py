@@ -0,0 +1,157 @@
+"""
+In-process CPU speech recognition, for sessions that arrive while no GPU
+backend is ready.
+
+Uses Vosk (Kaldi, small int8-quantized streaming models, ~40 MB for
+vosk-model-small-en-us) when it is installed and CPU_ASR_MODEL points at an
+unpacked model; otherwise available() is False and sessions behave as before.
+
+    uv sync --extra cpu-asr  # the Docker image already has it
+    CPU_ASR_MODEL=data/vosk-model-small-en-us-0.15
+
+CpuStream quacks like the websocket to a Kyutai backend: send() takes the same
+msgpack Audio messages, and iterating it yields msgpack Ready / Step / Word /
+EndWord messages with times on the stream's own timeline, so
+TranscriptionSession treats it like any other backend and can hand off to a
+GPU with the usual replay. Vosk only commits words at the end of an utterance,
+so words come a phrase at a time rather than one by one.
+"""
+import asyncio
+import json
+import logging
+import os
+import msgpack
+import numpy as np
+import websockets
+import audio
+import metrics
+
+try:
+    import vosk
+except ImportError:
+    vosk = None
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+MODEL_PATH = os.environ.get("CPU_ASR_MODEL", "")
+# Each stream keeps roughly one core busy while speech is coming in
+MAX_STREAMS = int(os.environ.get("CPU_ASR_MAX_STREAMS", 2))
+SAMPLE_RATE = 24000  # what the proxy sends, as for the Kyutai backends
+MODEL_RATE = 16000
+STEP_SAMPLES = 1920
+# Unprocessed audio a stream may queue before send() waits for the recognizer
+MAX_QUEUED_MESSAGES = 64
+
+if vosk is not None:
+    vosk.SetLogLevel(-1)
+
+_model = None
+_model_lock = asyncio.Lock()
+_active = 0
+
+def available() -> bool:
+    return vosk is not None and bool(MODEL_PATH) and os.path.isdir(MODEL_PATH)
+
+async def load_model():
+    global _model
+    async with _model_lock:
+        if _model is None:
+            logger.info(f"Loading CPU ASR model from {MODEL_PATH}")
+            _model = await asyncio.to_thread(vosk.Model, MODEL_PATH)
+    return _model
+
+async def open_stream():
+    """A new CpuStream, or None if CPU ASR is unavailable or at MAX_STREAMS."""
+    global _active
+    if not available() or _active >= MAX_STREAMS:
+        return None
+    _active += 1
+    try:
+        model = await load_model()
+    except Exception as e:
+        _active -= 1
+        logger.error(f"Could not load the CPU ASR model: {e}")
+        return None
+    metrics.REALTIME_CPU_STREAMS.inc()
+    return CpuStream(model)
+
+def _release():
+    global _active
+    _active -= 1
+    metrics.REALTIME_CPU_STREAMS.dec()
+
+class CpuStream:
+    def __init__(self, model):
+        self.recognizer = vosk.KaldiRecognizer(model, MODEL_RATE)
+        self.recognizer.SetWords(True)
+        self.resampler = audio.StreamResampler(SAMPLE_RATE, MODEL_RATE)
+        self.inbox = asyncio.Queue(MAX_QUEUED_MESSAGES)
+        self.outbox = asyncio.Queue()
+        self.samples = 0
+        self.step_idx = 0
+        self.closed = False
+        self.outbox.put_nowait(msgpack.packb({"type": "Ready"}))
+        self.worker = asyncio.create_task(self._run())
+
+    async def send(self, msg: bytes):
+        if self.closed:
+            raise websockets.exceptions.ConnectionClosedOK(None, None)
+        await self.inbox.put(msg)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> bytes:
+        msg = await self.outbox.get()
+        if msg is None:
+            raise StopAsyncIteration
+        return msg
+
+    async def close(self):
+        """Stops taking audio; words still in the recognizer are flushed out before iteration ends."""
+        if not self.closed:
+            self.closed = True
+            await self.inbox.put(None)
+
+    async def _run(self):
+        try:
+            while (msg := await self.inbox.get()) is not None:
+                data = msgpack.unpackb(msg, raw=False)
+                if data.get("type") != "Audio":
+                    continue
+                pcm = np.asarray(data["pcm"], dtype=np.float32)
+                for reply in await asyncio.to_thread(self._accept, pcm):
+                    self.outbox.put_nowait(reply)
+            for reply in await asyncio.to_thread(self._words, "FinalResult"):
+                self.outbox.put_nowait(reply)
+        except Exception as e:
+            logger.error(f"CPU ASR stream failed: {type(e).__name__}: {e}")
+        finally:
+            self.closed = True
+            self.outbox.put_nowait(None)
+            _release()
+
+    def _accept(self, pcm: np.ndarray) -> list:
+        """Feeds 24 kHz audio to the recognizer; returns the Step and any Word messages it produced."""
+        out = []
+        before = self.samples
+        self.samples += pcm.size
+        for _ in range(self.samples // STEP_SAMPLES - before // STEP_SAMPLES):
+            out.append(msgpack.packb({"type": "Step", "step_idx": self.step_idx, "prs": [0.0, 0.0, 0.0, 0.0],
+                                      "buffered_pcm": 0}))
+            self.step_idx += 1
+        resampled = self.resampler.process(pcm)
+        pcm16 = (np.clip(resampled, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+        if pcm16 and self.recognizer.AcceptWaveform(pcm16):
+            out.extend(self._words("Result"))
+        return out
+
+    def _words(self, method: str) -> list:
+        result = json.loads(getattr(self.recognizer, method)())
+        out = []
+        for word in result.get("result", []):
+            out.append(msgpack.packb({"type": "Word", "text": word["word"], "start_time": word["start"]},
+                                     use_single_float=True))
+            out.append(msgpack.packb({"type": "EndWord", "stop_time": word["end"]}, use_single_float=True))
+        return out
@@ -0,0 +1,161 @@
+"""
+Registry of the image-embedding models the service can serve.
+
+/embed takes an optional `model` id. Models load on first use (or are warmed
+in the background at startup), and loaded models are kept under a total
+memory budget: loading one that doesn't fit evicts the least recently used
+models that aren't mid-batch. Any transformers checkpoint with
+get_image_features works, e.g. SigLIP and CLIP:
+
+    EMBED_MODELS=nielsr/siglip-base-patch16-224,google/siglip-large-patch16-384,openai/clip-vit-base-patch32
+    EMBED_MODEL_MEMORY_MB=4096
+    EMBED_WARM_MODELS=nielsr/siglip-base-patch16-224
+
+Only ids listed in EMBED_MODELS are served, so callers can't make the service
+download arbitrary checkpoints. The first one is the default.
+"""
+import gc
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+import torch
+from fastapi import APIRouter
+from transformers import AutoModel, AutoProcessor
+import metrics
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# --- Configuration ---
+MODEL_IDS = [m.strip() for m in (os.environ.get("EMBED_MODELS") or "nielsr/siglip-base-patch16-224").split(",") if m.strip()]
+DEFAULT_MODEL = MODEL_IDS[0]
+MEMORY_BUDGET_BYTES = int(float(os.environ.get("EMBED_MODEL_MEMORY_MB") or 4096) * 1024 * 1024)
+# Loaded in the background at startup; defaults to the default model
+# (unset and empty mean the same, so compose can pass these through blank)
+WARM_MODELS = [m.strip() for m in (os.environ.get("EMBED_WARM_MODELS") or DEFAULT_MODEL).split(",") if m.strip()]
+
+device = torch.device('cuda' if torch.cuda.is_available() else "cpu")
+
+class UnknownModel(KeyError):
+    pass
+
+class LoadedModel:
+    def __init__(self, model_id: str, model, processor):
+        self.id = model_id
+        self.model = model
+        self.processor = processor
+        self.bytes = sum(t.numel() * t.element_size() for t in (*model.parameters(), *model.buffers()))
+        self.last_used = time.monotonic()
+        self.in_use = 0  # batches currently running; a model in use is never evicted
+
+class ModelRegistry:
+    def __init__(self, model_ids: list, budget_bytes: int):
+        self.model_ids = model_ids
+        self.budget_bytes = budget_bytes
+        self.loaded = {}
+        self.sizes = {}  # bytes of every model loaded so far, so a reload can make room before loading
+        self.lock = threading.Lock()  # guards `loaded` and the in_use counts
+        self.load_locks = {m: threading.Lock() for m in model_ids}  # one load at a time per model
+
+    def resolve(self, model_id: str | None) -> str:
+        model_id = model_id or self.model_ids[0]
+        if model_id not in self.load_locks:
+            raise UnknownModel(model_id)
+        return model_id
+
+    def loaded_bytes(self) -> int:
+        return sum(m.bytes for m in self.loaded.values())
+
+    def load(self, model_id: str) -> LoadedModel:
+        """Returns the model, loading it (and evicting others to make room) if needed. Blocks while loading."""
+        model_id = self.resolve(model_id)
+        with self.lock:
+            if model_id in self.loaded:
+                return self.loaded[model_id]
+        with self.load_locks[model_id]:
+            with self.lock:
+                if model_id in self.loaded:
+                    return self.loaded[model_id]
+            logger.info(f"Loading embedding model {model_id} on {device}")
+            started = time.monotonic()
+            with self.lock:
+                self.evict_for(self.sizes.get(model_id, 0))
+            model = AutoModel.from_pretrained(model_id).to(device).eval()
+            entry = LoadedModel(model_id, model, AutoProcessor.from_pretrained(model_id))
+            with self.lock:
+                self.sizes[model_id] = entry.bytes
+                self.evict_for(entry.bytes)
+                self.loaded[model_id] = entry
+                metrics.EMBED_MODEL_BYTES.set(self.loaded_bytes())
+            elapsed = time.monotonic() - started
+            metrics.EMBED_MODEL_LOADS.labels(model_id).inc()
+            metrics.EMBED_MODEL_LOAD_SECONDS.observe(elapsed)
+            logger.info(f"Loaded {model_id} ({entry.bytes / 2**20:.0f} MB) in {elapsed:.1f}s; "
+                        f"{self.loaded_bytes() / 2**20:.0f}/{self.budget_bytes / 2**20:.0f} MB in use")
+            return entry
+
+    def evict_for(self, needed: int):
+        """Drops least recently used idle models until `needed` more bytes fit. Caller holds self.lock."""
+        evicted = False
+        for entry in sorted(self.loaded.values(), key=lambda m: m.last_used):
+            if self.loaded_bytes() + needed <= self.budget_bytes:
+                break
+            if entry.in_use:
+                continue
+            logger.info(f"Evicting embedding model {entry.id} ({entry.bytes / 2**20:.0f} MB), "
+                        f"idle for {time.monotonic() - entry.last_used:.0f}s")
+            del self.loaded[entry.id]
+            metrics.EMBED_MODEL_EVICTIONS.labels(entry.id).inc()
+            evicted = True
+        if self.loaded_bytes() + needed > self.budget_bytes:
+            logger.warning(f"Embedding models need {(self.loaded_bytes() + needed) / 2**20:.0f} MB, over the "
+                           f"{self.budget_bytes / 2**20:.0f} MB budget (the rest are busy or it's too big on its own)")
+        if evicted:
+            gc.collect()
+            if device.type == "cuda":
+                torch.cuda.empty_cache()
+
+    @contextmanager
+    def use(self, model_id: str | None = None):
+        """Pins a loaded model for the duration of a batch, loading it first if needed."""
+        while True:
+            entry = self.load(model_id)
+            with self.lock:
+                # it may have been evicted between load() and here
+                if self.loaded.get(entry.id) is entry:
+                    entry.in_use += 1
+                    entry.last_used = time.monotonic()
+                    break
+        try:
+            yield entry
+        finally:
+            with self.lock:
+                entry.in_use -= 1
+
+    def warm_in_background(self, model_ids: list = WARM_MODELS):
+        def warm():
+            for model_id in model_ids:
+                try:
+                    self.load(model_id)
+                except Exception as e:
+                    logger.error(f"Warming embedding model {model_id} failed: {type(e).__name__}: {e}")
+        threading.Thread(target=warm, name="embed-model-warm", daemon=True).start()
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {"default": self.model_ids[0], "device": str(device), "budget_bytes": self.budget_bytes,
+                    "loaded_bytes": self.loaded_bytes(),
+                    "models": [{"id": m, "loaded": m in self.loaded,
+                                "bytes": self.loaded[m].bytes if m in self.loaded else None,
+                                "idle_seconds": round(time.monotonic() - self.loaded[m].last_used, 1)
+                                if m in self.loaded else None}
+                               for m in self.model_ids]}
+
+registry = ModelRegistry(MODEL_IDS, MEMORY_BUDGET_BYTES)
+
+@router.get("")
+async def list_models():
+    return registry.to_dict()
@@ -0,0 +1,233 @@
+"""
+Runs embedding batches on a GPU VM's embedding worker (gpu/embed_worker.py)
+when one is up, and on the local model otherwise.
+
+Workers are discovered every EMBED_OFFLOAD_DISCOVERY_SECONDS: the VMs whose
+Kyutai backend is ready (the same check /realtime uses, which never spins a
+VM up), or EMBED_OFFLOAD_WORKERS (host:port, comma-separated) to pin them,
+e.g. a local stand-in. A worker counts only if its /health answers and it
+serves the batch's model.
+
+Each batch goes to whichever route is expected to be fastest for its size,
+from moving averages of measured latency (a fixed overhead, the worker's
+health-check round trip, plus seconds per image). A route that has never
+run a batch is tried first. Every EMBED_OFFLOAD_EXPLORE_EVERY batches go to
+the runner-up so its estimate stays current. If a worker fails, the batch
+runs locally and the worker is dropped until the next discovery.
+
+Off unless EMBED_OFFLOAD=on, and only with EMBED_WORKER_TOKEN set: workers
+refuse unauthenticated requests, and the token is what keeps photos from
+going to whoever answers on the port.
+
+Images are re-encoded as JPEG (longest side capped at EMBED_OFFLOAD_MAX_SIDE)
+for the trip, so remote embeddings can differ very slightly from local ones.
+"""
+import asyncio
+import io
+import logging
+import os
+import threading
+import time
+import httpx
+import numpy as np
+import torch
+from fastapi import APIRouter
+from PIL import Image
+import metrics
+import realtime
+import tracing
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# --- Configuration ---
+ENABLED = os.environ.get("EMBED_OFFLOAD", "off") == "on"
+STATIC_WORKERS = [w.strip() for w in os.environ.get("EMBED_OFFLOAD_WORKERS", "").split(",") if w.strip()]
+WORKER_PORT = int(os.environ.get("EMBED_WORKER_PORT", 5000))
+WORKER_TOKEN = os.environ.get("EMBED_WORKER_TOKEN", "")
+if ENABLED and not WORKER_TOKEN:
+    logger.warning("EMBED_OFFLOAD=on but EMBED_WORKER_TOKEN is not set; embedding stays local.")
+    ENABLED = False
+DISCOVERY_SECONDS = float(os.environ.get("EMBED_OFFLOAD_DISCOVERY_SECONDS", 60))
+TIMEOUT_SECONDS = float(os.environ.get("EMBED_OFFLOAD_TIMEOUT_SECONDS", 10))
+HEALTH_TIMEOUT_SECONDS = 3
+MAX_SIDE = int(os.environ.get("EMBED_OFFLOAD_MAX_SIDE", 512))
+JPEG_QUALITY = 90
+EXPLORE_EVERY = int(os.environ.get("EMBED_OFFLOAD_EXPLORE_EVERY", 20))
+EWMA_ALPHA = 0.2
+LOCAL = "local"
+
+# Set by main.py: embed(list of PIL images, timings dict, model id) -> (n, dim) tensor
+_local_embed = None
+
+def configure(local_embed):
+    global _local_embed
+    _local_embed = local_embed
+
+def _ewma(old: float | None, sample: float) -> float:
+    return sample if old is None else (1 - EWMA_ALPHA) * old + EWMA_ALPHA * sample
+
+class RouteStats:
+    """Latency model for one route: seconds ~ overhead + per_image * images."""
+    def __init__(self):
+        self.overhead = 0.0
+        self.per_image = None
+        self.batches = 0
+
+    def estimate(self, images: int) -> float | None:
+        return None if self.per_image is None else self.overhead + self.per_image * images
+
+    def observe(self, seconds: float, images: int):
+        self.per_image = _ewma(self.per_image, max(seconds - self.overhead, 0.0) / images)
+        self.batches += 1
+
+    def to_dict(self) -> dict:
+        return {"overhead_ms": round(self.overhead * 1000, 2), "batches": self.batches,
+                "per_image_ms": round(self.per_image * 1000, 2) if self.per_image is not None else None}
+
+class Worker:
+    def __init__(self, address: str, models: list, device: str):
+        self.address = address
+        self.models = models
+        self.device = device
+        self.stats = RouteStats()
+
+class BatchRouter:
+    def __init__(self):
+        self.workers = {}  # address -> Worker
+        self.local = RouteStats()
+        self.batches = 0
+        self.lock = threading.Lock()  # discovery runs on the event loop, batches on the scheduler thread
+        self.client = httpx.Client(timeout=TIMEOUT_SECONDS)
+        self.headers = {"Authorization": f"Bearer {WORKER_TOKEN}"}
+
+    def choose(self, images: int, model_id: str) -> str:
+        with self.lock:
+            routes = {w.address: w.stats for w in self.workers.values() if model_id in w.models}
+            if not routes:
+                return LOCAL
+            routes[LOCAL] = self.local
+            self.batches += 1
+            unmeasured = [r for r, s in routes.items() if s.estimate(images) is None]
+            if unmeasured:
+                return unmeasured[0]
+            ranked = sorted(routes, key=lambda r: routes[r].estimate(images))
+            if EXPLORE_EVERY and self.batches % EXPLORE_EVERY == 0:
+                return ranked[1]
+            return ranked[0]
+
+    def embed(self, images: list, timings: dict, model_id: str):
+        """The scheduler's embed function: same contract as main.embed_images."""
+        route = self.choose(len(images), model_id) if ENABLED else LOCAL
+        if route != LOCAL:
+            started = time.perf_counter()
+            try:
+                vectors = self.embed_remote(route, images, timings, model_id)
+            except (httpx.HTTPError, KeyError, ValueError) as e:
+                logger.warning(f"Embedding on {route} failed, running locally: {type(e).__name__}: {e}")
+                metrics.EMBED_ROUTE_BATCHES.labels("remote", "failed").inc()
+                with self.lock:
+                    self.workers.pop(route, None)
+                    metrics.EMBED_OFFLOAD_WORKERS.set(len(self.workers))
+            else:
+                with self.lock:
+                    if route in self.workers:
+                        self.workers[route].stats.observe(time.perf_counter() - started, len(images))
+                metrics.EMBED_ROUTE_BATCHES.labels("remote", "ok").inc()
+                return vectors
+        started = time.perf_counter()
+        vectors = _local_embed(images, timings, model_id)
+        with self.lock:
+            self.local.observe(time.perf_counter() - started, len(images))
+        metrics.EMBED_ROUTE_BATCHES.labels("local", "ok").inc()
+        return vectors
+
+    def embed_remote(self, address: str, images: list, timings: dict, model_id: str):
+        t0 = time.perf_counter()
+        files = []
+        for i, img in enumerate(images):
+            if max(img.size) > MAX_SIDE:
+                scale = MAX_SIDE / max(img.size)
+                img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))),
+                                 Image.Resampling.BICUBIC, reducing_gap=2.0)
+            buf = io.BytesIO()
+            img.save(buf, "JPEG", quality=JPEG_QUALITY)
+            files.append(("files", (f"{i}.jpg", buf.getvalue(), "image/jpeg")))
+        t1 = time.perf_counter()
+        with tracing.span("embed.offload", kind=tracing.KIND_CLIENT, worker=address, images=len(images)):
+            response = self.client.post(f"http://{address}/embed_batch", params={"model": model_id},
+                                        files=files, headers=self.headers)
+            response.raise_for_status()
+        t2 = time.perf_counter()
+        rows, dim = (int(x) for x in response.headers["X-Embedding-Shape"].split(","))
+        if rows != len(images):
+            raise ValueError(f"{address} returned {rows} embeddings for {len(images)} images")
+        vectors = np.frombuffer(response.content, dtype="<f4").reshape(rows, dim)
+        timings['encode'] = timings.get('encode', 0.0) + t1 - t0
+        timings['offload'] = timings.get('offload', 0.0) + t2 - t1
+        return torch.from_numpy(vectors.copy())
+
+    # --- Discovery ---
+    async def check_worker(self, client: httpx.AsyncClient, address: str) -> Worker | None:
+        started = time.perf_counter()
+        try:
+            response = await client.get(f"http://{address}/health", headers=self.headers)
+            response.raise_for_status()
+            health = response.json()
+        except (httpx.HTTPError, ValueError):
+            return None
+        worker = Worker(address, health.get("models", []), health.get("device", "?"))
+        worker.stats.overhead = time.perf_counter() - started
+        return worker
+
+    async def discover(self):
+        if STATIC_WORKERS:
+            addresses = STATIC_WORKERS
+        else:
+            hosts = [ip.rsplit(":", 1)[0] if ip.count(":") == 1 else ip for ip in await realtime.find_ready_backends()]
+            addresses = [f"{host}:{WORKER_PORT}" for host in hosts if host != realtime.CPU_BACKEND]
+        async with httpx.AsyncClient(timeout=HEALTH_TIMEOUT_SECONDS) as client:
+            found = await asyncio.gather(*(self.check_worker(client, a) for a in addresses))
+        with self.lock:
+            workers = {}
+            for worker in filter(None, found):
+                if worker.address in self.workers:
+                    # keep what we've learned; refresh the round trip
+                    old = self.workers[worker.address].stats
+                    old.overhead = _ewma(old.overhead, worker.stats.overhead)
+                    worker.stats = old
+                else:
+                    logger.info(f"Embedding worker {worker.address} is up ({worker.device}, {', '.join(worker.models)})")
+                workers[worker.address] = worker
+            for address in self.workers.keys() - workers.keys():
+                logger.info(f"Embedding worker {address} is gone")
+            self.workers = workers
+            metrics.EMBED_OFFLOAD_WORKERS.set(len(workers))
+
+    async def run_discovery(self):
+        while True:
+            try:
+                await self.discover()
+            except Exception as e:
+                logger.error(f"Embedding worker discovery failed: {type(e).__name__}: {e}")
+            await asyncio.sleep(DISCOVERY_SECONDS)
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {"enabled": ENABLED, "local": self.local.to_dict(),
+                    "workers": [{"address": w.address, "device": w.device, "models": w.models, **w.stats.to_dict()}
+                                for w in self.workers.values()]}
+
+batch_router = BatchRouter()
+background_tasks = set()  # keeps the discovery task referenced while it runs
+
+def start():
+    if ENABLED:
+        task = asyncio.create_task(batch_router.run_discovery())
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+@router.get("")
+async def get_offload():
+    return batch_router.to_dict()
@@ -0,0 +1,200 @@
+"""
+Scheduler in front of the embedding model.
+
+Every caller (/embed, /analyze, re-embed jobs) submits images tagged with a
+priority class and a tenant, and one worker thread assembles batches for the
+model:
+
+- classes are strict: queued interactive images always go first, then batch,
+  then background
+- within a class, tenants take turns one image at a time, so one tenant's
+  backfill can't crowd out another's
+- batch and background images together fill at most EMBED_BATCH_OCCUPANCY
+  slots of a batch, background alone at most EMBED_BACKGROUND_OCCUPANCY.
+  Capping how long a batch can run caps how long a newly arrived interactive
+  image waits for the model.
+
+Requests are split into single images for scheduling, and their results are
+gathered back in order. A batch only holds images for one model. Per-class
+queue wait and depth are exported as metrics. Each request's trace gets an
+embed.batch span for the batch that ran it; the model's own spans
+(embed.preprocess, embed.forward, ...) go under the first of them.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+PRIORITIES = ("interactive", "batch", "background")
+MAX_BATCH = int(os.environ.get("EMBED_MAX_BATCH", 16))
+# Most slots of a batch a class and the classes below it may take together
+OCCUPANCY = {
+    "interactive": MAX_BATCH,
+    "batch": int(os.environ.get("EMBED_BATCH_OCCUPANCY", MAX_BATCH // 2)),
+    "background": int(os.environ.get("EMBED_BACKGROUND_OCCUPANCY", MAX_BATCH // 4)),
+}
+DEFAULT_TENANT = "default"
+
+# Set by main.py: embed(list of PIL images, timings dict, model id) -> (n, dim) tensor
+_embed = None
+
+def configure(embed):
+    global _embed
+    _embed = embed
+
+class EmbedRequest:
+    def __init__(self, images: list, model_id: str | None, priority: str, tenant: str):
+        self.images = images
+        self.model_id = model_id
+        self.priority = priority
+        self.tenant = tenant
+        self.rows = [None] * len(images)
+        self.remaining = len(images)
+        self.timings = {}
+        self.enqueued_at = time.monotonic()
+        self.future = Future()
+        # The submitter's span; the worker thread doesn't share its context
+        self.span = tracing.current_span()
+
+    def finish_row(self, index: int, row):
+        self.rows[index] = row
+        self.remaining -= 1
+        if self.remaining == 0 and not self.future.done():
+            self.future.set_result(self.rows)
+
+class EmbedScheduler:
+    def __init__(self, max_batch: int = MAX_BATCH, occupancy: dict = OCCUPANCY):
+        self.max_batch = max_batch
+        self.occupancy = occupancy
+        # priority -> tenant -> deque of (request, image index); tenants rotate to the back after each turn
+        self.queues = {p: OrderedDict() for p in PRIORITIES}
+        self.depth = dict.fromkeys(PRIORITIES, 0)
+        self.changed = threading.Condition()
+        self.thread = None
+
+    def submit(self, images: list, model_id: str | None = None, priority: str = "interactive",
+               tenant: str = DEFAULT_TENANT) -> EmbedRequest:
+        """Queues `images`; the request's future resolves to their embedding rows, in order."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"priority must be one of {', '.join(PRIORITIES)}")
+        request = EmbedRequest(images, model_id, priority, tenant or DEFAULT_TENANT)
+        if not images:
+            request.future.set_result([])
+            return request
+        with self.changed:
+            self.queues[priority].setdefault(request.tenant, deque()).extend(
+                (request, i) for i in range(len(images)))
+            self.depth[priority] += len(images)
+            metrics.EMBED_QUEUE_DEPTH.labels(priority).set(self.depth[priority])
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="embed-scheduler", daemon=True)
+                self.thread.start()
+            self.changed.notify()
+        return request
+
+    def _take(self, priority: str, model_id, limit: int) -> list:
+        """Up to `limit` items of one class for `model_id`, one per tenant per turn. Caller holds the lock."""
+        tenants = self.queues[priority]
+        taken = []
+        while len(taken) < limit:
+            progressed = False
+            for tenant in list(tenants):
+                if len(taken) >= limit:
+                    break
+                queue = tenants[tenant]
+                if queue[0][0].model_id != model_id:
+                    continue
+                taken.append(queue.popleft())
+                progressed = True
+                if queue:
+                    tenants.move_to_end(tenant)
+                else:
+                    del tenants[tenant]
+            if not progressed:
+                break
+        self.depth[priority] -= len(taken)
+        metrics.EMBED_QUEUE_DEPTH.labels(priority).set(self.depth[priority])
+        return taken
+
+    def next_batch(self) -> list:
+        """The next batch: items for the model at the head of the most urgent class, most urgent first."""
+        with self.changed:
+            self.changed.wait_for(lambda: any(self.depth.values()))
+            head = next(p for p in PRIORITIES if self.depth[p])
+            model_id = next(iter(self.queues[head].values()))[0][0].model_id
+            batch = []
+            for rank, priority in enumerate(PRIORITIES):
+                # a class may use what's left under its own cap and under the cap of every class above
+                # it; a cap only counts its class and the ones below, never the more urgent ones
+                room = self.max_batch - len(batch)
+                for i, capped in enumerate(PRIORITIES[:rank + 1]):
+                    counted = sum(1 for request, _ in batch if PRIORITIES.index(request.priority) >= i)
+                    room = min(room, self.occupancy[capped] - counted)
+                if priority == head:
+                    room = max(room, 1)  # a class only here because nothing outranks it always progresses
+                if room > 0 and self.depth[priority]:
+                    batch.extend(self._take(priority, model_id, room))
+            return batch
+
+    def run(self):
+        while True:
+            batch = self.next_batch()
+            started = time.monotonic()
+            for request, _ in batch:
+                metrics.EMBED_QUEUE_WAIT_SECONDS.labels(request.priority).observe(started - request.enqueued_at)
+            timings = {}
+            requests = {id(r): r for r, _ in batch}.values()
+            spans = []
+            for request in requests:
+                if request.span is not None:
+                    with tracing.use_span(request.span):
+                        spans.append(tracing.start_span("embed.batch", batch_size=len(batch),
+                                                        images=len(request.images), priority=request.priority,
+                                                        queue_seconds=round(started - request.enqueued_at, 6)))
+            try:
+                with tracing.use_span(spans[0] if spans else None):
+                    vectors = _embed([r.images[i] for r, i in batch], timings, batch[0][0].model_id)
+            except Exception as e:
+                logger.error(f"Embedding batch of {len(batch)} failed: {type(e).__name__}: {e}")
+                for s in spans:
+                    s.set_error(f"{type(e).__name__}: {e}")
+                    s.end()
+                for request in requests:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+            for s in spans:
+                s.end()
+            for request in requests:
+                request.timings.setdefault("queue", started - request.enqueued_at)
+                for stage, seconds in timings.items():
+                    request.timings[stage] = request.timings.get(stage, 0.0) + seconds
+            for row, (request, i) in zip(vectors, batch):
+                request.finish_row(i, row)
+
+scheduler = EmbedScheduler()
+
+def embed_sync(images: list, model_id: str | None = None, priority: str = "interactive",
+               tenant: str = DEFAULT_TENANT, timings: dict | None = None) -> list:
+    """Blocking form, for worker threads. Returns one embedding row per image."""
+    request = scheduler.submit(images, model_id, priority, tenant)
+    rows = request.future.result()
+    if timings is not None:
+        timings.update(request.timings)
+    return rows
+
+async def embed(images: list, model_id: str | None = None, priority: str = "interactive",
+                tenant: str = DEFAULT_TENANT, timings: dict | None = None) -> list:
+    request = scheduler.submit(images, model_id, priority, tenant)
+    rows = await asyncio.wrap_future(request.future)
+    if timings is not None:
+        timings.update(request.timings)
+    return rows
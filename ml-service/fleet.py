@@ -0,0 +1,323 @@
+"""
+Provider-agnostic GPU fleet.
+
+Hyperstack VMs (hyperstack.py) and PrimeIntellect pods (gpu/provision/gpu.py)
+sit behind one Provider interface: offers (availability + hourly price), list,
+create, delete and readiness. Instances and offers are normalized so the
+placement engine can compare them directly.
+
+Placement ranks every available offer by what it would cost us to start a
+transcription backend there:
+
+    score = price_hr * PLACEMENT_EXPECTED_HOURS + PLACEMENT_WAIT_COST_PER_MINUTE * boot_minutes
+
+where boot_minutes is the historical median boot-to-ready time for that
+provider and GPU type, from the lifecycle store (lifecycle.py). Cheap-but-slow and fast-but-pricey offers trade off
+through the two knobs.
+
+This is also how the service itself starts backends: main.py hands
+spin_up_status() to hyperstack.get_service_status() for when no Hyperstack VM
+is usable.
+"""
+import asyncio
+import logging
+import os
+import time
+from fastapi import APIRouter, Depends, HTTPException
+import hyperstack
+import lifecycle
+from gpu.provision.gpu import AsyncPrimeIntellectClient, find_config, pod_payload
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# --- Configuration ---
+GPU_TYPES = [t.strip() for t in os.environ.get("FLEET_GPU_TYPES", "A4000_16GB").split(",") if t.strip()]
+PRIMEINTELLECT_API_KEY = os.environ.get("PRIMEINTELLECT_API_KEY")
+PRIMEINTELLECT_IMAGE = os.environ.get("PRIMEINTELLECT_IMAGE", "template1-cuda-ubuntu-moshi-1")
+PRIMEINTELLECT_MAX_PODS = int(os.environ.get("PRIMEINTELLECT_MAX_PODS", 1))
+# Hyperstack's API has no per-flavor price lookup we use, so the on-demand rate is configured.
+HYPERSTACK_A4000_PRICE_HR = float(os.environ.get("HYPERSTACK_A4000_PRICE_HR", 0.15))
+EXPECTED_HOURS = float(os.environ.get("PLACEMENT_EXPECTED_HOURS", 1.0))
+WAIT_COST_PER_MINUTE = float(os.environ.get("PLACEMENT_WAIT_COST_PER_MINUTE", 0.05))
+# Assumed boot-to-ready time until we've seen a provider/GPU type come up.
+DEFAULT_BOOT_SECONDS = float(os.environ.get("PLACEMENT_DEFAULT_BOOT_SECONDS", 600))
+
+# Normalized instance states
+PROVISIONING, ACTIVE, READY, DELETING, FAILED = "provisioning", "active", "ready", "deleting", "failed"
+
+class Instance:
+    def __init__(self, provider: str, id: str, name: str, state: str, gpu_type: str,
+                 ip: str | None = None, price_hr: float | None = None, raw: dict | None = None):
+        self.provider = provider
+        self.id = id
+        self.name = name
+        self.state = state
+        self.gpu_type = gpu_type
+        self.ip = ip
+        self.price_hr = price_hr
+        self.raw = raw or {}
+
+    def to_dict(self) -> dict:
+        return {"provider": self.provider, "id": self.id, "name": self.name, "state": self.state,
+                "gpu_type": self.gpu_type, "ip": self.ip, "price_hr": self.price_hr}
+
+class Offer:
+    """Something a provider could start right now."""
+    def __init__(self, provider: str, gpu_type: str, price_hr: float, details: dict | None = None):
+        self.provider = provider
+        self.gpu_type = gpu_type
+        self.price_hr = price_hr
+        self.details = details or {}
+
+class Provider:
+    name = "base"
+
+    async def offers(self, gpu_types: list) -> list:
+        raise NotImplementedError
+
+    async def list_instances(self) -> list:
+        raise NotImplementedError
+
+    async def create(self, offer: Offer) -> Instance:
+        """Starts an instance for `offer`; raises ProvisionError if the provider refuses."""
+        raise NotImplementedError
+
+    async def delete(self, instance_id: str) -> bool:
+        raise NotImplementedError
+
+    async def is_ready(self, instance: Instance) -> bool:
+        return instance.state in (ACTIVE, READY) and bool(instance.ip) \
+            and await hyperstack.is_websocket_ready(instance.ip)
+
+class ProvisionError(Exception):
+    pass
+
+# --- Providers ---
+class HyperstackProvider(Provider):
+    name = "hyperstack"
+    gpu_type = "A4000_16GB"  # the only flavor _create_a4000_vm starts
+
+    def _instance(self, vm: dict) -> Instance:
+        status = vm.get("status")
+        if status == "ACTIVE":
+            state = ACTIVE if vm.get("floating_ip") and vm.get("floating_ip_status") == "ATTACHED" else PROVISIONING
+        elif status in ("ERROR", "FAILED"):
+            state = FAILED
+        elif status in ("DELETING", "DELETED"):
+            state = DELETING
+        else:
+            state = PROVISIONING
+        return Instance(self.name, str(vm.get("id")), vm.get("name", ""), state, self.gpu_type,
+                        ip=vm.get("floating_ip"), price_hr=HYPERSTACK_A4000_PRICE_HR, raw=vm)
+
+    async def offers(self, gpu_types: list) -> list:
+        if self.gpu_type not in gpu_types:
+            return []
+        instances = await asyncio.to_thread(hyperstack.get_all_vms)
+        if instances is None or len(instances) >= hyperstack.MAX_SPINNED_UP:
+            return []
+        boot_path = "baked" if hyperstack.baked_image() else "script"
+        return [Offer(self.name, self.gpu_type, HYPERSTACK_A4000_PRICE_HR, {"boot_path": boot_path})]
+
+    async def list_instances(self) -> list:
+        instances = await asyncio.to_thread(hyperstack.get_all_vms)
+        return [self._instance(vm) for vm in instances or []]
+
+    async def create(self, offer: Offer) -> Instance:
+        success, result = await asyncio.to_thread(hyperstack._create_a4000_vm)
+        if not success:
+            raise ProvisionError(f"hyperstack: {result}")
+        vm = (result.get("instances") or [{}])[0]
+        return self._instance(vm)
+
+    async def delete(self, instance_id: str) -> bool:
+        success, _ = await asyncio.to_thread(hyperstack.delete_vm, instance_id, instance_id)
+        return success
+
+class PrimeIntellectProvider(Provider):
+    name = "primeintellect"
+
+    def __init__(self, api_key: str, image: str = PRIMEINTELLECT_IMAGE, max_pods: int = PRIMEINTELLECT_MAX_PODS):
+        self.client = AsyncPrimeIntellectClient(api_key, max_pods=max_pods)
+        self.image = image
+
+    def _instance(self, pod: dict) -> Instance:
+        status = pod.get("status")
+        if status == "ACTIVE":
+            state = ACTIVE if pod.get("ip") else PROVISIONING
+        elif status in ("ERROR", "FAILED"):
+            state = FAILED
+        elif status in ("TERMINATED", "TERMINATING"):
+            state = DELETING
+        else:
+            state = PROVISIONING
+        return Instance(self.name, pod.get("id", ""), pod.get("name", ""), state, pod.get("gpuName", ""),
+                        ip=pod.get("ip"), price_hr=pod.get("priceHr"), raw=pod)
+
+    async def offers(self, gpu_types: list) -> list:
+        pods = await self.client.get_existing_pods()
+        if "error" in pods or pods.get("total_count", 0) >= self.client.max_pods:
+            return []
+        availability = await self.client.get_availability_many(gpu_types)
+        offers = []
+        for gpu_type in gpu_types:
+            for provider in {c.get("provider") for c in availability.get(gpu_type, [])}:
+                config = find_config(availability, gpu_type, 1, self.image, provider)
+                if config is None:
+                    continue
+                price = (config.get("prices") or {}).get("onDemand", config.get("priceHr"))
+                if price is not None:
+                    offers.append(Offer(self.name, gpu_type, float(price), config))
+        return offers
+
+    async def list_instances(self) -> list:
+        pods = await self.client.get_existing_pods()
+        if "error" in pods:
+            raise ProvisionError(f"primeintellect: {pods['error']}")
+        return [self._instance(pod) for pod in pods.get("data", [])]
+
+    async def create(self, offer: Offer) -> Instance:
+        result = await self.client.create_pod(pod_payload(offer.details, self.image))
+        if "id" not in result:
+            raise ProvisionError(f"primeintellect: {result}")
+        return self._instance(result)
+
+    async def delete(self, instance_id: str) -> bool:
+        return "error" not in await self.client.delete_pod(instance_id)
+
+# --- Placement ---
+def score(offer: Offer, boot_seconds: float) -> float:
+    return offer.price_hr * EXPECTED_HOURS + WAIT_COST_PER_MINUTE * boot_seconds / 60
+
+class Fleet:
+    def __init__(self, providers: list, history: lifecycle.LifecycleStore | None = None):
+        self.providers = {p.name: p for p in providers}
+        self.history = history or lifecycle.store
+
+    async def list_instances(self) -> list:
+        results = await asyncio.gather(*(p.list_instances() for p in self.providers.values()),
+                                       return_exceptions=True)
+        instances = []
+        for provider, result in zip(self.providers, results):
+            if isinstance(result, Exception):
+                logger.error(f"Listing {provider} instances failed: {result}")
+                continue
+            instances.extend(result)
+        for instance in instances:
+            if instance.state in (ACTIVE, READY):
+                self.history.record(instance.provider, instance.id, "active", vm_name=instance.name)
+                self.history.record(instance.provider, instance.id, "ip_attached", vm_name=instance.name)
+        return instances
+
+    async def ready_instances(self) -> list:
+        instances = await self.list_instances()
+        ready = await asyncio.gather(*(self.providers[i.provider].is_ready(i) for i in instances))
+        for instance, ok in zip(instances, ready):
+            if ok:
+                instance.state = READY
+                self.history.record(instance.provider, instance.id, "ready", vm_name=instance.name)
+        return [i for i, ok in zip(instances, ready) if ok]
+
+    async def placements(self, gpu_types: list = GPU_TYPES) -> list:
+        """All available offers, best first, as (score, expected_boot_seconds, offer)."""
+        results = await asyncio.gather(*(p.offers(gpu_types) for p in self.providers.values()),
+                                       return_exceptions=True)
+        ranked = []
+        for provider, result in zip(self.providers, results):
+            if isinstance(result, Exception):
+                logger.error(f"Fetching {provider} offers failed: {result}")
+                continue
+            for offer in result:
+                boot = self.history.expected_boot_seconds(offer.provider, offer.gpu_type, DEFAULT_BOOT_SECONDS,
+                                                          offer.details.get("boot_path"))
+                ranked.append((score(offer, boot), boot, offer))
+        ranked.sort(key=lambda r: r[0])
+        return ranked
+
+    async def provision(self, gpu_types: list = GPU_TYPES) -> Instance | None:
+        """Starts an instance on the best offer, falling back down the ranking if a provider refuses."""
+        for _, boot, offer in await self.placements(gpu_types):
+            requested_at = time.time()
+            try:
+                instance = await self.providers[offer.provider].create(offer)
+            except ProvisionError as e:
+                logger.warning(f"Placement on {offer.provider}/{offer.gpu_type} failed: {e}")
+                continue
+            logger.info(f"Placed {offer.gpu_type} on {offer.provider} at ${offer.price_hr}/h "
+                        f"(expected ready in {boot:.0f}s)")
+            self.history.record(instance.provider, instance.id, "create_requested", ts=requested_at,
+                                vm_name=instance.name, gpu_type=offer.gpu_type)
+            self.history.record(instance.provider, instance.id, "created", vm_name=instance.name)
+            return instance
+        return None
+
+    async def delete(self, provider: str, instance_id: str) -> bool:
+        deleted = await self.providers[provider].delete(instance_id)
+        if deleted:
+            self.history.record(provider, instance_id, "delete_requested")
+        return deleted
+
+def default_providers() -> list:
+    providers = [HyperstackProvider()]
+    if PRIMEINTELLECT_API_KEY:
+        providers.append(PrimeIntellectProvider(PRIMEINTELLECT_API_KEY))
+    return providers
+
+fleet = Fleet(default_providers())
+
+async def spin_up_status() -> dict:
+    """
+    hyperstack.get_service_status()'s answer once it has found no usable
+    Hyperstack VM: an instance another provider already has up or starting,
+    or else a new one wherever placement ranks best. Same status shapes.
+    """
+    for name, provider in fleet.providers.items():
+        if name == HyperstackProvider.name:
+            continue  # get_service_status has just looked at those
+        try:
+            instances = await provider.list_instances()
+        except ProvisionError as e:
+            logger.error(f"Listing {name} instances failed: {e}")
+            continue
+        for instance in instances:
+            if instance.state in (FAILED, DELETING):
+                continue
+            if await provider.is_ready(instance):
+                fleet.history.record(instance.provider, instance.id, "ready", vm_name=instance.name)
+                return {"status": "success", "message": f"Found a ready {name} instance.", "ip_address": instance.ip}
+            return {"status": "already_deploying", "message": f"A {name} instance is currently being deployed."}
+    logger.info("Attempting to place a new backend...")
+    instance = await fleet.provision()
+    if instance is None:
+        return {"status": "tried_spinning_up_failed", "message": "Failed to spin up a new VM.",
+                "error_details": "No provider could start an instance."}
+    return {"status": "now_spinning_up", "message": f"A new {instance.provider} {instance.gpu_type} instance is being created.",
+            "details": instance.to_dict()}
+
+# --- Endpoints ---
+@router.get("/instances", dependencies=[Depends(hyperstack.get_spinup_user_or_admin)])
+async def list_instances():
+    instances = await fleet.list_instances()
+    return {"count": len(instances), "instances": [i.to_dict() for i in instances]}
+
+@router.get("/placement", dependencies=[Depends(hyperstack.get_spinup_user_or_admin)])
+async def get_placement():
+    return {"weights": {"expected_hours": EXPECTED_HOURS, "wait_cost_per_minute": WAIT_COST_PER_MINUTE},
+            "offers": [{"provider": o.provider, "gpu_type": o.gpu_type, "price_hr": o.price_hr,
+                        "expected_boot_seconds": round(boot), "score": round(s, 4)}
+                       for s, boot, o in await fleet.placements()]}
+
+@router.post("/provision", dependencies=[Depends(hyperstack.get_admin_user)])
+async def provision():
+    instance = await fleet.provision()
+    if instance is None:
+        raise HTTPException(status_code=409, detail="No provider could start an instance.")
+    return instance.to_dict()
+
+@router.get("/lifecycle", dependencies=[Depends(hyperstack.get_spinup_user_or_admin)])
+async def get_lifecycle(days: float = 30):
+    """Boot-time percentiles (seconds from create request) per provider and GPU type."""
+    since = time.time() - days * 86400
+    return {"since_days": days, "boot": await asyncio.to_thread(lifecycle.store.summary, since)}
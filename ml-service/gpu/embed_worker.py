@@ -0,0 +1,108 @@
+"""
+Embedding worker for the GPU VMs, so /embed batches can run next to the
+Kyutai backend instead of on the home server's CPU (see embed_offload.py).
+
+Standalone on purpose: copy this one file to the VM and run it with
+
+    uv pip install torch transformers fastapi uvicorn pillow python-multipart sentencepiece protobuf
+    EMBED_WORKER_TOKEN=... EMBED_MODELS=nielsr/siglip-base-patch16-224 \
+        uvicorn embed_worker:app --host 0.0.0.0 --port 5000
+
+EMBED_WORKER_TOKEN is required: the worker won't start without one, since it
+takes user photos from anyone who can reach the port. The VMs only open port
+5000 to EMBED_WORKER_ALLOWED_CIDR (the service's egress address); without
+that, reach the worker through a tunnel instead (ssh -N -L 5001:127.0.0.1:5000
+ubuntu@<vm>, EMBED_OFFLOAD_WORKERS=127.0.0.1:5001). Locally, as a stand-in
+for a GPU VM (on CPU):
+
+    cd ml-service && EMBED_WORKER_TOKEN=dev python -m gpu.embed_worker --port 5001
+    EMBED_OFFLOAD=on EMBED_WORKER_TOKEN=dev EMBED_OFFLOAD_WORKERS=127.0.0.1:5001 uv run uvicorn main:app ...
+
+    GET  /health                       {"status": "ok", "device": ..., "models": [...]}
+    POST /embed_batch?model=<id>       multipart `files`; returns little-endian float32
+                                       rows, shape in the X-Embedding-Shape header
+"""
+import argparse
+import io
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+import numpy as np
+import torch
+from fastapi import Depends, FastAPI, File, Header, HTTPException, Response, UploadFile
+from PIL import Image
+from transformers import AutoModel, AutoProcessor
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+MODEL_IDS = [m.strip() for m in (os.environ.get("EMBED_MODELS") or "nielsr/siglip-base-patch16-224").split(",") if m.strip()]
+TOKEN = os.environ.get("EMBED_WORKER_TOKEN", "")
+if not TOKEN:
+    print("FATAL ERROR: EMBED_WORKER_TOKEN is not set; refusing to serve embeddings without auth.", file=sys.stderr)
+    sys.exit(1)
+MAX_BATCH = int(os.environ.get("EMBED_WORKER_MAX_BATCH", 64))
+
+device = torch.device('cuda' if torch.cuda.is_available() else "cpu")
+app = FastAPI()
+
+_models = {}
+_lock = threading.Lock()  # one batch on the GPU at a time; also guards loading
+
+def load(model_id: str):
+    if model_id not in _models:
+        logger.info(f"Loading {model_id} on {device}")
+        _models[model_id] = (AutoModel.from_pretrained(model_id).to(device).eval(),
+                             AutoProcessor.from_pretrained(model_id))
+    return _models[model_id]
+
+def embed(images: list, model_id: str) -> np.ndarray:
+    with _lock:
+        model, processor = load(model_id)
+        with torch.no_grad():
+            features = model.get_image_features(**processor(images=images, return_tensors="pt").to(device))
+        features = features / features.norm(dim=-1, keepdim=True)
+    return features.float().cpu().numpy()
+
+def check_token(authorization: str | None = Header(None)):
+    if not secrets.compare_digest(authorization or "", f"Bearer {TOKEN}"):
+        raise HTTPException(status_code=403, detail="Bad token.")
+
+@app.on_event("startup")
+def warm():
+    # The first model is what the service asks for by default; have it ready before the first batch
+    threading.Thread(target=lambda: embed([Image.new("RGB", (32, 32))], MODEL_IDS[0]), daemon=True).start()
+
+@app.get("/health", dependencies=[Depends(check_token)])
+def health():
+    return {"status": "ok", "device": str(device), "models": MODEL_IDS, "loaded": list(_models)}
+
+@app.post("/embed_batch", dependencies=[Depends(check_token)])
+def embed_batch(files: list[UploadFile] = File(...), model: str | None = None):
+    model_id = model or MODEL_IDS[0]
+    if model_id not in MODEL_IDS:
+        raise HTTPException(status_code=404, detail=f"Unknown model {model_id}.")
+    if len(files) > MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH} images per batch.")
+    try:
+        images = [Image.open(io.BytesIO(f.file.read())).convert("RGB") for f in files]
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Could not decode an image: {e}")
+    started = time.perf_counter()
+    vectors = embed(images, model_id)
+    elapsed = time.perf_counter() - started
+    return Response(vectors.astype("<f4").tobytes(), media_type="application/octet-stream",
+                    headers={"X-Embedding-Shape": f"{vectors.shape[0]},{vectors.shape[1]}",
+                             "Server-Timing": f"forward;dur={elapsed * 1000:.2f}"})
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Run the embedding worker.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,42 @@
+#!/bin/bash
+# Prepares a fresh A4000 VM to be snapshotted into a baked image: the CUDA
+# toolkit, moshi-server binary, Kyutai configs and model weights all in place,
+# and moshi-server enabled as a systemd service so VMs booted from the image
+# start serving without downloading or building anything.
+#
+# Started from cloud-init by POST /hyperstack/bake. Once the ASR websocket
+# answers, register the image with POST /hyperstack/bake/{vm_id}/register.
+set -e
+cd /home/ubuntu
+echo "bake: updating packages" >> /home/ubuntu/setuplog.txt
+sudo DEBIAN_FRONTEND=noninteractive apt update
+echo "bake: installing CUDA toolkit" >> /home/ubuntu/setuplog.txt
+sudo DEBIAN_FRONTEND=noninteractive apt install -y nvidia-cuda-toolkit
+echo "bake: cloning configs and downloading moshi-server" >> /home/ubuntu/setuplog.txt
+sudo -u ubuntu git clone https://github.com/kyutai-labs/delayed-streams-modeling.git
+sudo -u ubuntu wget -q https://github.com/kmrasmussen/delayed-streams-modeling/releases/download/moshi/moshi-server \
+  -O delayed-streams-modeling/moshi-server
+chmod +x delayed-streams-modeling/moshi-server
+
+echo "bake: installing moshi-server service" >> /home/ubuntu/setuplog.txt
+cat <<'UNIT' | sudo tee /etc/systemd/system/moshi-server.service
+[Unit]
+Description=Kyutai moshi-server ASR worker
+After=network-online.target
+Wants=network-online.target
+
+[Service]
+User=ubuntu
+WorkingDirectory=/home/ubuntu/delayed-streams-modeling
+ExecStart=/home/ubuntu/delayed-streams-modeling/moshi-server worker --config configs/config-stt-en_fr-hf.toml
+Restart=on-failure
+
+[Install]
+WantedBy=multi-user.target
+UNIT
+sudo systemctl daemon-reload
+# The first start pulls the model weights into ~/.cache/huggingface, so by the
+# time the websocket answers everything the image needs is on disk.
+echo "bake: starting moshi-server to fetch weights" >> /home/ubuntu/setuplog.txt
+sudo systemctl enable --now moshi-server
+echo "bake: done" >> /home/ubuntu/setuplog.txt
@@ -1,6 +1,10 @@
+import asyncio
+import httpx
 import requests
 import json
 import os
+import sys
+import time
 from typing import Dict, Any, Tuple
 from enum import Enum
 
@@ -20,6 +24,59 @@ class ServiceResult(Enum):
     NO_AVAILABILITY = "no_availability"
     ERROR = "error"
 
+BASE_URL = "https://api.primeintellect.ai/api/v1"
+
+def find_config(availability: Dict[str, Any], gpu_type: str, gpu_count: int, image: str,
+                provider: str = "hyperstack") -> Dict[str, Any] | None:
+    """
+    First in-stock configuration of `gpu_type` from `provider` with the requested GPU count and image
+    """
+    for config in availability.get(gpu_type, []):
+        if (config.get("provider") == provider and
+            config.get("gpuCount") == gpu_count and
+            config.get("stockStatus") == "Available" and
+            image in config.get("images", [])):
+            return config
+    return None
+
+def pod_payload(config: Dict[str, Any], image: str) -> Dict[str, Any]:
+    return {
+        "pod": {
+            "autoRestart": False,
+            "cloudId": config["cloudId"],
+            "gpuType": config["gpuType"],
+            "socket": config["socket"],
+            "gpuCount": config["gpuCount"],
+            "image": image,
+            "security": config["security"],
+            "dataCenterId": config["dataCenter"]
+        },
+        "provider": {
+            "type": config["provider"]
+        }
+    }
+
+def pod_info(pod: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": pod["id"],
+        "name": pod["name"],
+        "status": pod["status"],
+        "ip": pod.get("ip"),
+        "ssh_connection": pod.get("sshConnection"),
+        "port_mapping": pod.get("primePortMapping", []),
+        "gpu_count": pod["gpuCount"],
+        "gpu_name": pod["gpuName"],
+        "price_hr": pod["priceHr"]
+    }
+
+def error_info(e: Exception) -> Dict[str, Any]:
+    response = getattr(e, "response", None)
+    return {
+        "error": str(e),
+        "status_code": getattr(response, "status_code", None),
+        "response_text": getattr(response, "text", None)
+    }
+
 class PrimeIntellectClient:
     def __init__(self, api_key: str, max_pods: int = 1):
         if not api_key:
@@ -27,7 +84,7 @@ class PrimeIntellectClient:
         
         self.api_key = api_key
         self.max_pods = max_pods
-        self.base_url = "https://api.primeintellect.ai/api/v1"
+        self.base_url = BASE_URL
         self.headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
@@ -53,39 +110,13 @@ class PrimeIntellectClient:
         Find available Hyperstack A4000 GPU with specified configuration
         """
         availability = self.get_availability("A4000_16GB")
-        
-        if "A4000_16GB" not in availability:
-            return None
-        
-        for config in availability["A4000_16GB"]:
-            if (config.get("provider") == "hyperstack" and
-                config.get("gpuCount") == gpu_count and
-                config.get("stockStatus") == "Available" and
-                image in config.get("images", [])):
-                
-                return config
-        
-        return None
+        return find_config(availability, "A4000_16GB", gpu_count, image)
     
     def create_pod_payload(self, config: Dict[str, Any], image: str = "ubuntu_22_cuda_12") -> Dict[str, Any]:
         """
         Create the payload for pod creation based on found configuration
         """
-        return {
-            "pod": {
-                "autoRestart": False,
-                "cloudId": config["cloudId"],
-                "gpuType": config["gpuType"],
-                "socket": config["socket"],
-                "gpuCount": config["gpuCount"],
-                "image": image,
-                "security": config["security"],
-                "dataCenterId": config["dataCenter"]
-            },
-            "provider": {
-                "type": config["provider"]
-            }
-        }
+        return pod_payload(config, image)
     
     def create_pod(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -245,20 +276,7 @@ class PrimeIntellectClient:
         
         if check_result == PodCheckResult.HAS_PODS:
             # Extract connection info from active pods
-            ready_pods = []
-            for pod in check_payload['pods']:
-                pod_info = {
-                    "id": pod["id"],
-                    "name": pod["name"],
-                    "status": pod["status"],
-                    "ip": pod.get("ip"),
-                    "ssh_connection": pod.get("sshConnection"),
-                    "port_mapping": pod.get("primePortMapping", []),
-                    "gpu_count": pod["gpuCount"],
-                    "gpu_name": pod["gpuName"],
-                    "price_hr": pod["priceHr"]
-                }
-                ready_pods.append(pod_info)
+            ready_pods = [pod_info(pod) for pod in check_payload['pods']]
             
             return ServiceResult.READY, {
                 "message": f"Found {len(ready_pods)} ready pod(s)",
@@ -304,6 +322,247 @@ class PrimeIntellectClient:
                 "action": "deployment_error"
             }
 
+class TTLCache:
+    """
+    Caches coroutine results per key for `ttl` seconds. Concurrent misses on the
+    same key share one request. Results that fail `keep` are not cached.
+    """
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.entries = {}  # key -> (expires_at, task)
+
+    async def get(self, key, fetch, keep=lambda result: True):
+        entry = self.entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            return await asyncio.shield(entry[1])
+        task = asyncio.ensure_future(fetch())
+        self.entries[key] = (time.monotonic() + self.ttl, task)
+        try:
+            result = await asyncio.shield(task)
+        except BaseException:
+            self._drop(key, task)
+            raise
+        if not keep(result):
+            self._drop(key, task)
+        return result
+
+    def _drop(self, key, task):
+        if self.entries.get(key, (None, None))[1] is task:
+            del self.entries[key]
+
+    def invalidate(self):
+        self.entries.clear()
+
+class AsyncPrimeIntellectClient:
+    """
+    Async counterpart of PrimeIntellectClient, with the same result shapes.
+
+    Keeps one pooled HTTP connection to the API, caches availability and pod
+    lists for a short TTL (dropped whenever this client creates or deletes a
+    pod), and looks up several GPU types at once. Use as `async with`, or call aclose().
+    """
+    def __init__(self, api_key: str, max_pods: int = 1, availability_ttl: float = 30.0, pods_ttl: float = 5.0):
+        if not api_key:
+            raise ValueError("API key is required")
+
+        self.max_pods = max_pods
+        self.http = httpx.AsyncClient(
+            base_url=BASE_URL,
+            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+        )
+        self.availability_cache = TTLCache(availability_ttl)
+        self.pods_cache = TTLCache(pods_ttl)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.http.aclose()
+
+    def invalidate(self):
+        self.availability_cache.invalidate()
+        self.pods_cache.invalidate()
+
+    async def _request(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
+        try:
+            response = await self.http.request(method, url, **kwargs)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            return error_info(e)
+
+    async def get_availability(self, gpu_type: str = "A4000_16GB") -> Dict[str, Any]:
+        """
+        Get GPU availability for specified GPU type
+        """
+        async def fetch():
+            result = await self._request("GET", "/availability/", params={"gpu_type": gpu_type})
+            if "error" in result:
+                print(f"Error fetching availability: {result['error']}")
+                return {}
+            return result
+        return await self.availability_cache.get(gpu_type, fetch, keep=bool)
+
+    async def get_availability_many(self, gpu_types: list) -> Dict[str, Any]:
+        """
+        Availability for several GPU types, queried concurrently and merged into one dict
+        """
+        results = await asyncio.gather(*(self.get_availability(t) for t in gpu_types))
+        merged = {}
+        for result in results:
+            merged.update(result)
+        return merged
+
+    async def find_available(self, gpu_types: list, gpu_count: int = 1, image: str = "ubuntu_22_cuda_12",
+                             provider: str = "hyperstack") -> Dict[str, Any] | None:
+        """
+        First in-stock configuration, in order of preference of `gpu_types`
+        """
+        availability = await self.get_availability_many(gpu_types)
+        for gpu_type in gpu_types:
+            config = find_config(availability, gpu_type, gpu_count, image, provider)
+            if config:
+                return config
+        return None
+
+    async def get_existing_pods(self, limit: int = 100) -> Dict[str, Any]:
+        """
+        Get list of existing pods
+        """
+        return await self.pods_cache.get(
+            limit, lambda: self._request("GET", "/pods/", params={"limit": limit}),
+            keep=lambda result: "error" not in result)
+
+    async def create_pod(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Create a pod with the specified configuration
+        """
+        result = await self._request("POST", "/pods/", json=payload)
+        self.invalidate()
+        return result
+
+    async def delete_pod(self, pod_id: str) -> Dict[str, Any]:
+        result = await self._request("DELETE", f"/pods/{pod_id}")
+        self.invalidate()
+        return result
+
+    async def check_existing_pods(self) -> Tuple[PodCheckResult, Dict[str, Any]]:
+        """
+        Check if user has any existing pods
+        Returns tuple of (result_type, payload)
+        """
+        return self._pod_check(await self.get_existing_pods())
+
+    def _pod_check(self, pods_response: Dict[str, Any]) -> Tuple[PodCheckResult, Dict[str, Any]]:
+        if "error" in pods_response:
+            return PodCheckResult.ERROR, {
+                "message": "Failed to fetch existing pods",
+                "error_details": pods_response
+            }
+        total_count = pods_response.get("total_count", 0)
+        if total_count == 0:
+            return PodCheckResult.NO_PODS, {"message": "No existing pods found", "total_count": 0, "pods": []}
+        return PodCheckResult.HAS_PODS, {
+            "message": f"Found {total_count} existing pod(s)",
+            "total_count": total_count,
+            "pods": pods_response.get("data", [])
+        }
+
+    async def try_deploy_gpu(self, gpu_count: int = 1, image: str = "ubuntu_22_cuda_12",
+                             gpu_types: list = ("A4000_16GB",)) -> Tuple[DeploymentResult, Dict[str, Any]]:
+        """
+        Attempt to deploy a GPU instance of the first available type in `gpu_types`
+        Returns tuple of (result_type, payload)
+        """
+        config = await self.find_available(list(gpu_types), gpu_count, image)
+
+        if not config:
+            return DeploymentResult.NO_AVAILABILITY, {
+                "message": f"No available Hyperstack {'/'.join(gpu_types)} with {gpu_count} GPU(s) and {image} image",
+                "searched_specs": {
+                    "provider": "hyperstack",
+                    "gpu_types": list(gpu_types),
+                    "gpu_count": gpu_count,
+                    "image": image,
+                    "required_status": "Available"
+                }
+            }
+
+        payload = pod_payload(config, image)
+        result = await self.create_pod(payload)
+
+        if "id" in result and "status" in result:
+            return DeploymentResult.SUCCESS, result
+        return DeploymentResult.CREATION_ERROR, {
+            "message": "Failed to create pod",
+            "error_details": result,
+            "attempted_payload": payload
+        }
+
+    async def get_gpu_service_status(self, gpu_count: int = 1, image: str = "ubuntu_22_cuda_12",
+                                     gpu_types: list = ("A4000_16GB",)) -> Tuple[ServiceResult, Dict[str, Any]]:
+        """
+        Same outcomes as PrimeIntellectClient.get_gpu_service_status. The pod list
+        and availability are fetched concurrently (and usually come from cache),
+        so deciding what to do costs at most one round trip before create_pod.
+        """
+        pods_response, _ = await asyncio.gather(self.get_existing_pods(),
+                                                self.get_availability_many(list(gpu_types)))
+        check_result, check_payload = self._pod_check(pods_response)
+
+        if check_result == PodCheckResult.ERROR:
+            return ServiceResult.ERROR, {
+                "message": "Failed to check existing pods",
+                "error_details": check_payload
+            }
+
+        if check_result == PodCheckResult.HAS_PODS:
+            ready_pods = [pod_info(pod) for pod in check_payload['pods']]
+            return ServiceResult.READY, {
+                "message": f"Found {len(ready_pods)} ready pod(s)",
+                "pods": ready_pods,
+                "total_count": len(ready_pods)
+            }
+
+        if check_payload['total_count'] >= self.max_pods:
+            return ServiceResult.ERROR, {
+                "message": f"Maximum pod limit reached ({self.max_pods})",
+                "current_count": check_payload['total_count']
+            }
+
+        deploy_result, deploy_payload = await self.try_deploy_gpu(gpu_count, image, gpu_types)
+
+        if deploy_result == DeploymentResult.SUCCESS:
+            return ServiceResult.DEPLOYING, {
+                "message": "Successfully initiated pod deployment",
+                "action": "deployed_new",
+                "pod": {
+                    "id": deploy_payload.get("id"),
+                    "name": deploy_payload.get("name"),
+                    "status": deploy_payload.get("status"),
+                    "gpu_count": deploy_payload.get("gpuCount"),
+                    "gpu_name": deploy_payload.get("gpuName"),
+                    "price_hr": deploy_payload.get("priceHr")
+                }
+            }
+        elif deploy_result == DeploymentResult.NO_AVAILABILITY:
+            return ServiceResult.NO_AVAILABILITY, {
+                "message": "No GPUs available for deployment",
+                "searched_specs": deploy_payload.get("searched_specs", {}),
+                "action": "no_availability"
+            }
+        else:  # CREATION_ERROR
+            return ServiceResult.ERROR, {
+                "message": "Failed to deploy new pod",
+                "error_details": deploy_payload,
+                "action": "deployment_error"
+            }
+
 # Example usage - showcasing actual service responses
 if __name__ == "__main__":
     api_key = os.getenv("PRIMEINTELLECT_API_KEY")
@@ -312,10 +571,19 @@ if __name__ == "__main__":
         exit(1)
     
     try:
-        client = PrimeIntellectClient(api_key, max_pods=2)
-        
-        print("=== GPU Service Response Test ===")
-        service_result, payload = client.get_gpu_service_status(gpu_count=1, image="template1-cuda-ubuntu-moshi-1")
+        if "--async" in sys.argv:
+            async def run():
+                async with AsyncPrimeIntellectClient(api_key, max_pods=2) as client:
+                    result = await client.get_gpu_service_status(
+                        gpu_count=1, image="template1-cuda-ubuntu-moshi-1", gpu_types=("A4000_16GB", "A5000_24GB"))
+                    return client, result
+            print("=== GPU Service Response Test (async) ===")
+            client, (service_result, payload) = asyncio.run(run())
+        else:
+            client = PrimeIntellectClient(api_key, max_pods=2)
+
+            print("=== GPU Service Response Test ===")
+            service_result, payload = client.get_gpu_service_status(gpu_count=1, image="template1-cuda-ubuntu-moshi-1")
         
         print(f"Service Result: {service_result.value}")
         print("Raw Payload:")
@@ -1,17 +1,24 @@
 import os
 import requests
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # --- Configuration ---
 API_BASE_URL = "https://infrahub-api.nexgencloud.com/v1/core"
 API_KEY = os.environ.get("HYPERSTACK_API_KEY")
+CONCURRENCY = 8
+MAX_ATTEMPTS = 5
+VERIFY_SECONDS = 600
+POLL_SECONDS = 10
 
 # --- Helper Functions ---
 
-def get_all_vms(headers):
+def get_all_vms(headers, quiet=False):
     """Fetches a list of all virtual machines."""
     url = f"{API_BASE_URL}/virtual-machines"
-    print("Fetching list of all virtual machines...")
+    if not quiet:
+        print("Fetching list of all virtual machines...")
     try:
         response = requests.get(url, headers=headers)
         response.raise_for_status()  # Raises an exception for bad status codes (4xx or 5xx)
@@ -30,7 +37,10 @@ def delete_vm(headers, vm_id, vm_name):
     url = f"{API_BASE_URL}/virtual-machines/{vm_id}"
     print(f"Attempting to delete VM: {vm_name} (ID: {vm_id})...")
     try:
-        response = requests.delete(url, headers=headers)
+        response = requests.delete(url, headers=headers, timeout=30)
+        if response.status_code == 404:
+            print(f"VM {vm_name} (ID: {vm_id}) is already gone")
+            return True
         response.raise_for_status()
         data = response.json()
         if data.get("status"):
@@ -43,6 +53,28 @@ def delete_vm(headers, vm_id, vm_name):
         print(f"An error occurred while deleting VM {vm_id}: {e}")
         return False
 
+def delete_with_retries(headers, vm_id, vm_name):
+    """Deleting is idempotent (404 counts as done), so failed attempts are simply repeated."""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        if delete_vm(headers, vm_id, vm_name):
+            return True
+        if attempt < MAX_ATTEMPTS:
+            time.sleep(min(2 ** attempt, 30))
+    return False
+
+def wait_until_gone(headers, vm_ids):
+    """Re-lists VMs until none of `vm_ids` is left; returns the ones still listed at the deadline."""
+    deadline = time.monotonic() + VERIFY_SECONDS
+    remaining = set(vm_ids)
+    while True:
+        instances = get_all_vms(headers, quiet=True)
+        if instances is not None:
+            remaining &= {vm.get("id") for vm in instances}
+            print(f"  {len(vm_ids) - len(remaining)}/{len(vm_ids)} gone")
+        if not remaining or time.monotonic() > deadline:
+            return remaining
+        time.sleep(POLL_SECONDS)
+
 # --- Main Execution ---
 
 def main():
@@ -80,23 +112,24 @@ def main():
         return
 
     print("\nStarting deletion process...")
-    deleted_count = 0
-    failed_count = 0
+    with_id = [vm for vm in instances if vm.get("id")]
     for vm in instances:
-        vm_id = vm.get("id")
-        vm_name = vm.get("name")
-        if vm_id:
-            if delete_vm(headers, vm_id, vm_name):
-                deleted_count += 1
-            else:
-                failed_count += 1
-        else:
-            print(f"Could not find ID for VM: {vm_name}")
-            failed_count += 1
-    
+        if not vm.get("id"):
+            print(f"Could not find ID for VM: {vm.get('name')}")
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        results = list(pool.map(lambda vm: delete_with_retries(headers, vm["id"], vm.get("name")), with_id))
+    requested = [vm["id"] for vm, ok in zip(with_id, results) if ok]
+
+    print(f"\nWaiting for {len(requested)} machine(s) to disappear from the VM list...")
+    still_listed = wait_until_gone(headers, requested)
+    deleted_count = len(requested) - len(still_listed)
+    failed_count = len(instances) - deleted_count
+
     print("\n--- Deletion Summary ---")
     print(f"Successfully deleted: {deleted_count} machine(s).")
     print(f"Failed to delete: {failed_count} machine(s).")
+    if still_listed:
+        print(f"Still listed after {VERIFY_SECONDS}s: {sorted(still_listed)}")
     print("------------------------")
 
 
@@ -1,75 +1,65 @@
-import subprocess
-import json
+"""
+Quick SSH diagnostics for GPU VMs, through ssh.py: one multiplexed
+connection per VM, every check and every VM at once. Needs no service
+configuration beyond the REMOTE_SSH_* variables.
+
+    cd ml-service && python -m gpu.provision.ssh_test 149.36.0.36 [more IPs...]
+"""
+import asyncio
+import sys
 from typing import Tuple
+import ssh
 
 def ssh_execute_command(ip: str, command: str, username: str = "ubuntu", timeout: int = 30) -> Tuple[bool, str]:
     """
     Execute a command via SSH and return success status and output
     """
-    ssh_command = [
-        "ssh", 
-        "-o", "StrictHostKeyChecking=no",
-        "-o", "ConnectTimeout=10",
-        "-o", "UserKnownHostsFile=/dev/null",
-        f"{username}@{ip}",
-        command
-    ]
-    
-    print(f"Executing SSH command: {' '.join(ssh_command)}")
-    
-    try:
-        result = subprocess.run(
-            ssh_command, 
-            capture_output=True, 
-            text=True, 
-            timeout=timeout
-        )
-        
-        success = result.returncode == 0
-        output = result.stdout
-        if result.stderr:
-            output += f"\nSTDERR: {result.stderr}"
-            
-        return success, output
-        
-    except subprocess.TimeoutExpired:
+    result = asyncio.run(ssh.run(f"{username}@{ip}", command, timeout))
+    if result.timed_out:
         return False, f"SSH command timeout after {timeout} seconds"
-    except Exception as e:
-        return False, f"SSH error: {str(e)}"
+    output = result.stdout
+    if result.stderr:
+        output += f"\nSTDERR: {result.stderr}"
+    return result.ok, output
 
-def test_ssh_connection(ip: str):
+TEST_COMMANDS = [
+    ("pwd", "Get current directory"),
+    ("whoami", "Check current user"),
+    ("uname -a", "System information"),
+    ("ls -la", "List files in home directory"),
+    ("df -h", "Check disk usage"),
+    ("nvidia-smi", "Check GPU status"),
+    ("ps aux | grep [m]oshi", "Check if moshi is running")
+]
+
+async def test_ssh_connections(ips: list):
     """
-    Test SSH connection with basic commands
+    Test SSH connections with basic commands, all hosts and commands concurrently
     """
-    print(f"Testing SSH connection to {ip}")
-    print("=" * 50)
-    
-    test_commands = [
-        ("pwd", "Get current directory"),
-        ("whoami", "Check current user"),
-        ("uname -a", "System information"),
-        ("ls -la", "List files in home directory"),
-        ("df -h", "Check disk usage"),
-        ("nvidia-smi", "Check GPU status"),
-        ("ps aux | grep moshi", "Check if moshi is running")
-    ]
-    
-    for command, description in test_commands:
-        print(f"\n--- {description} ---")
-        print(f"Command: {command}")
-        
-        success, output = ssh_execute_command(ip, command)
-        
-        if success:
-            print("Success!")
-            print(f"Output:\n{output}")
-        else:
-            print("Failed!")
-            print(f"Error: {output}")
+    # Open the master connections first so the checks don't race to create them.
+    await ssh.run_many(ips, "true")
+    results = await asyncio.gather(*(ssh.run_many(ips, command) for command, _ in TEST_COMMANDS))
+    for ip in ips:
+        print(f"Testing SSH connection to {ip}")
+        print("=" * 50)
+        for (command, description), by_host in zip(TEST_COMMANDS, results):
+            result = by_host[ip]
+            print(f"\n--- {description} ---")
+            print(f"Command: {command} ({result.duration:.2f}s)")
+            if result.ok:
+                print("Success!")
+                print(f"Output:\n{result.stdout}")
+            else:
+                print("Failed!")
+                print(f"Error: {'timed out' if result.timed_out else result.stderr or result.stdout}")
+        print()
+
+def test_ssh_connection(ip: str):
+    asyncio.run(test_ssh_connections([ip]))
 
 if __name__ == "__main__":
     # Use the IP from your GPU service output
-    test_ip = "149.36.0.36"
-    
-    print(f"SSH Test for IP: {test_ip}")
-    test_ssh_connection(test_ip)
+    test_ips = sys.argv[1:] or ["149.36.0.36"]
+
+    print(f"SSH Test for IP(s): {', '.join(test_ips)}")
+    asyncio.run(test_ssh_connections(test_ips))
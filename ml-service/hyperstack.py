@@ -4,7 +4,11 @@ import websockets
 import os
 import sys
 import requests
+import time
 import uuid
+import lifecycle
+import metrics
+import tracing
 from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
@@ -18,6 +22,8 @@ API_KEY = os.environ.get("HYPERSTACK_API_KEY")
 MAX_SPINNED_UP = int(os.environ.get("MAX_SPINNED_UP", 1))
 HYPERSTACK_ADMIN_TOKEN = os.environ.get("HYPERSTACK_ADMIN_TOKEN")
 HYPERSTACK_SPINUP_TOKEN = os.environ.get("HYPERSTACK_SPINUP_PERMISSION_TOKEN")
+# e.g. the home server's egress address as 203.0.113.7/32; unset keeps the worker port closed
+EMBED_WORKER_ALLOWED_CIDR = os.environ.get("EMBED_WORKER_ALLOWED_CIDR", "")
 bearer_scheme = HTTPBearer()
 
 required_vars = {
@@ -29,6 +35,14 @@ if missing_vars:
     print(f"FATAL ERROR: Server cannot start. Missing env vars: {', '.join(missing_vars)}", file=sys.stderr)
     sys.exit(1)
 
+# Set by main.py to fleet.spin_up_status, so spin-ups go wherever placement ranks best.
+# Unset (e.g. in scripts), get_service_status() starts a Hyperstack A4000 itself.
+_spin_up = None
+
+def configure(spin_up):
+    global _spin_up
+    _spin_up = spin_up
+
 # --- Enhanced WebSocket Health Check Helper ---
 async def is_websocket_ready(ip: str) -> bool:
     """
@@ -36,13 +50,21 @@ async def is_websocket_ready(ip: str) -> bool:
     with the required authentication headers.
     Returns True if successful, False otherwise.
     """
+    started = time.monotonic()
+    with tracing.span("hyperstack.ws_probe", kind=tracing.KIND_CLIENT, ip=ip) as s:
+        ready = await _probe_websocket(ip)
+        s.set_attribute("ready", ready)
+    metrics.HYPERSTACK_WS_PROBE_SECONDS.labels(str(ready).lower()).observe(time.monotonic() - started)
+    return ready
+
+async def _probe_websocket(ip: str) -> bool:
     uri = f"ws://{ip}:8080/api/asr-streaming"
     headers = {
         "kyutai-api-key": "public_token"
     }
     
     logger.info(f"    🔍 WebSocket check starting for {uri}")
-    logger.info(f"    📋 Using headers: {headers}")
+    logger.debug(f"    📋 Using headers: {headers}")
     
     try:
         logger.info("    ⚡ Creating WebSocket connection coroutine...")
@@ -86,48 +108,155 @@ def get_spinup_user_or_admin(credentials: HTTPAuthorizationCredentials = Depends
 def get_hyperstack_headers():
     return {"accept": "application/json", "api_key": API_KEY, "content-type": "application/json"}
 
+def hyperstack_request(operation: str, method: str, url: str, **kwargs):
+    """Makes a Hyperstack API call, timing it and counting failures per operation."""
+    with metrics.HYPERSTACK_API_SECONDS.labels(operation).time(), \
+            tracing.span(f"hyperstack.{operation}", kind=tracing.KIND_CLIENT, **{"http.method": method}) as s:
+        try:
+            response = requests.request(method, url, headers=get_hyperstack_headers(), **kwargs)
+            s.set_attribute("http.status_code", response.status_code)
+            response.raise_for_status()
+            return response
+        except requests.exceptions.RequestException:
+            metrics.HYPERSTACK_API_ERRORS.labels(operation).inc()
+            raise
+
+def record_fleet_state(instances: list):
+    metrics.HYPERSTACK_VMS.clear()
+    for vm in instances:
+        metrics.HYPERSTACK_VMS.labels(vm.get("status") or "UNKNOWN").inc()
+        if vm.get("status") == "ACTIVE":
+            lifecycle.store.record("hyperstack", vm.get("id"), "active", vm_name=vm.get("name"))
+            if vm.get("floating_ip_status") == "ATTACHED":
+                lifecycle.store.record("hyperstack", vm.get("id"), "ip_attached", vm_name=vm.get("name"))
+
+def record_vm_ready(vm: dict):
+    lifecycle.store.record("hyperstack", vm.get("id"), "ready", vm_name=vm.get("name"))
+
 def get_all_vms():
     url = f"{API_BASE_URL}/virtual-machines"
-    logger.info(f"📡 Making API request to: {url}")
+    logger.debug(f"📡 Making API request to: {url}")
     try:
-        response = requests.get(url, headers=get_hyperstack_headers())
-        logger.info(f"📡 API response status: {response.status_code}")
-        response.raise_for_status()
+        response = hyperstack_request("list_vms", "GET", url)
         data = response.json()
         
         api_status = data.get("status")
         instances = data.get("instances", [])
         
-        logger.info(f"📡 API response status field: {api_status}")
-        logger.info(f"📡 Number of instances returned: {len(instances)}")
+        logger.debug(f"📡 API response status field: {api_status}")
+        logger.debug(f"📡 Number of instances returned: {len(instances)}")
         
-        return instances if api_status else None
+        if not api_status:
+            return None
+        record_fleet_state(instances)
+        return instances
     except requests.exceptions.RequestException as e:
         logger.error(f"📡 API request failed: {e}")
         return None
 
+# --- A4000 boot paths ---
+# "script": stock CUDA image; cloud-init downloads and starts the Kyutai server (slow cold start).
+# "baked": an image made from a VM prepared by a4000_bake.sh; cloud-init only starts the service.
+BASE_IMAGE = "Ubuntu Server 22.04 LTS R535 CUDA 12.2"
+PROVISION_SCRIPTS_URL = "https://raw.githubusercontent.com/kmrasmussen/lenovo-server-service-1/refs/heads/gpus/ml-service/gpu/provision"
+SCRIPT_USER_DATA = f"#cloud-config\nruncmd:\n  - wget {PROVISION_SCRIPTS_URL}/a4000_downloadandrun.sh\n  - chmod +x a4000_downloadandrun.sh\n  - ./a4000_downloadandrun.sh"
+BAKE_USER_DATA = f"#cloud-config\nruncmd:\n  - wget {PROVISION_SCRIPTS_URL}/a4000_bake.sh\n  - chmod +x a4000_bake.sh\n  - ./a4000_bake.sh"
+BAKED_USER_DATA = "#cloud-config\nruncmd:\n  - systemctl start moshi-server"
+# Image to boot from; HYPERSTACK_BAKED_IMAGE wins over the one last registered via /bake/{vm_id}/register.
+BAKED_IMAGE = os.environ.get("HYPERSTACK_BAKED_IMAGE")
+BAKED_IMAGE_FILE = os.environ.get("HYPERSTACK_BAKED_IMAGE_FILE", "data/hyperstack_baked_image")
+
+def baked_image() -> str | None:
+    if BAKED_IMAGE:
+        return BAKED_IMAGE
+    try:
+        with open(BAKED_IMAGE_FILE) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def a4000_vm_payload(image_name: str, user_data: str, name_prefix: str = "vm-from-api") -> dict:
+    security_rules = [
+        {"direction": "ingress", "protocol": "tcp", "ethertype": "IPv4", "remote_ip_prefix": "0.0.0.0/0", "port_range_min": 8080, "port_range_max": 8080}
+    ]
+    # The embedding worker (port 5000) takes user photos: only the service may reach it
+    if EMBED_WORKER_ALLOWED_CIDR:
+        security_rules.insert(0, {"direction": "ingress", "protocol": "tcp", "ethertype": "IPv4", "remote_ip_prefix": EMBED_WORKER_ALLOWED_CIDR, "port_range_min": 5000, "port_range_max": 5000})
+    return {
+        "name": f"{name_prefix}-{uuid.uuid4().hex[:6]}",
+        "environment_name": "myenv", "image_name": image_name,
+        "flavor_name": "n3-RTX-A4000x1", "key_name": "mykey", "count": 1, "assign_floating_ip": True,
+        "user_data": user_data,
+        "security_rules": security_rules,
+    }
+
 def _create_a4000_vm():
+    """
+    Boots from the baked image when one is configured, falling back to the
+    setup script if that fails. The boot path is recorded with the VM's
+    lifecycle so cold starts of the two can be compared (GET /fleet/lifecycle).
+    """
     instances = get_all_vms()
     if instances is None or len(instances) >= MAX_SPINNED_UP:
         return False, "Failed to check capacity or max instances reached."
-    vm_payload = {
-        "name": f"vm-from-api-{uuid.uuid4().hex[:6]}",
-        "environment_name": "myenv", "image_name": "Ubuntu Server 22.04 LTS R535 CUDA 12.2",
-        "flavor_name": "n3-RTX-A4000x1", "key_name": "mykey", "count": 1, "assign_floating_ip": True,
-        "user_data": "#cloud-config\nruncmd:\n  - wget https://raw.githubusercontent.com/kmrasmussen/lenovo-server-service-1/refs/heads/gpus/ml-service/gpu/provision/a4000_downloadandrun.sh\n  - chmod +x a4000_downloadandrun.sh\n  - ./a4000_downloadandrun.sh",
-        "security_rules": [
-            {"direction": "ingress", "protocol": "tcp", "ethertype": "IPv4", "remote_ip_prefix": "0.0.0.0/0", "port_range_min": 5000, "port_range_max": 5000},
-            {"direction": "ingress", "protocol": "tcp", "ethertype": "IPv4", "remote_ip_prefix": "0.0.0.0/0", "port_range_min": 8080, "port_range_max": 8080}
-        ]
-    }
+    attempts = [("script", BASE_IMAGE, SCRIPT_USER_DATA)]
+    if baked_image():
+        attempts.insert(0, ("baked", baked_image(), BAKED_USER_DATA))
     url = f"{API_BASE_URL}/virtual-machines"
+    for boot_path, image_name, user_data in attempts:
+        requested_at = time.time()
+        try:
+            response = hyperstack_request("create_vm", "POST", url, json=a4000_vm_payload(image_name, user_data))
+            api_response_data = response.json()
+        except requests.exceptions.RequestException as e:
+            api_response_data = {"error": str(e)}
+        if not api_response_data.get("status"):
+            if boot_path == "baked":
+                logger.warning(f"Creating a VM from baked image {image_name} failed ({api_response_data}); "
+                               f"falling back to the setup script")
+                continue
+            return False, api_response_data
+        for vm in api_response_data.get("instances") or []:
+            lifecycle.store.record("hyperstack", vm.get("id"), "create_requested", ts=requested_at,
+                                   vm_name=vm.get("name"), gpu_type="A4000_16GB", variant=boot_path)
+            lifecycle.store.record("hyperstack", vm.get("id"), "created", vm_name=vm.get("name"))
+        logger.info(f"Creating A4000 VM via the {boot_path} boot path ({image_name})")
+        return True, api_response_data
+
+# --- Baked image ---
+background_tasks = set()  # keeps fire-and-forget tasks referenced until they finish
+
+def register_baked_image(vm_id, timeout: float = 3600, poll: float = 15) -> str | None:
+    """
+    Snapshots a VM prepared by a4000_bake.sh, turns the snapshot into an image
+    and makes it the default boot image. Blocking; run it off the event loop.
+    """
+    stamp = time.strftime("%Y%m%d-%H%M")
     try:
-        response = requests.post(url, headers=get_hyperstack_headers(), json=vm_payload)
-        response.raise_for_status()
-        api_response_data = response.json()
-        return api_response_data.get("status", False), api_response_data
+        snapshot = hyperstack_request("create_snapshot", "POST", f"{API_BASE_URL}/virtual-machines/{vm_id}/snapshots",
+                                      json={"name": f"kyutai-a4000-{stamp}", "description": "baked by a4000_bake.sh"}).json()
+        snapshot_id = (snapshot.get("snapshot") or {}).get("id")
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            current = hyperstack_request("get_snapshot", "GET", f"{API_BASE_URL}/snapshots/{snapshot_id}").json()
+            if (current.get("snapshot") or {}).get("status") == "SUCCESS":
+                break
+            time.sleep(poll)
+        else:
+            logger.error(f"Snapshot {snapshot_id} of VM {vm_id} did not finish within {timeout}s")
+            return None
+        image_name = f"kyutai-a4000-{stamp}"
+        hyperstack_request("create_image", "POST", f"{API_BASE_URL}/snapshots/{snapshot_id}/image",
+                           json={"name": image_name})
     except requests.exceptions.RequestException as e:
-        return False, {"error": str(e)}
+        logger.error(f"Registering a baked image from VM {vm_id} failed: {e}")
+        return None
+    if os.path.dirname(BAKED_IMAGE_FILE):
+        os.makedirs(os.path.dirname(BAKED_IMAGE_FILE), exist_ok=True)
+    with open(BAKED_IMAGE_FILE, "w") as f:
+        f.write(image_name)
+    logger.info(f"Registered baked image {image_name}; new VMs will boot from it")
+    return image_name
 
 # --- Enhanced Reusable Service Status Checker ---
 async def get_service_status() -> dict:
@@ -135,6 +264,13 @@ async def get_service_status() -> dict:
     Checks for a ready VM, reports status, or spins one up.
     Returns a dictionary with the status and relevant details.
     """
+    with tracing.span("hyperstack.get_service_status") as s:
+        result = await _check_service_status()
+        s.set_attribute("status", result["status"])
+    metrics.HYPERSTACK_SERVICE_STATUS.labels(result["status"]).inc()
+    return result
+
+async def _check_service_status() -> dict:
     logger.info("=== Starting service status check ===")
     logger.info("Retrieving VM list from Hyperstack API...")
     instances = get_all_vms()
@@ -147,10 +283,10 @@ async def get_service_status() -> dict:
     
     # Log all VMs for debugging
     for i, vm in enumerate(instances):
-        logger.info(f"VM {i+1}: name='{vm.get('name')}', status='{vm.get('status')}', "
-                   f"floating_ip='{vm.get('floating_ip')}', floating_ip_status='{vm.get('floating_ip_status')}'")
+        logger.debug(f"VM {i+1}: name='{vm.get('name')}', status='{vm.get('status')}', "
+                    f"floating_ip='{vm.get('floating_ip')}', floating_ip_status='{vm.get('floating_ip_status')}'")
 
-    logger.info("--- Checking each VM for readiness ---")
+    logger.debug("--- Checking each VM for readiness ---")
     
     for i, vm in enumerate(instances):
         vm_name = vm.get('name', 'unnamed')
@@ -158,26 +294,27 @@ async def get_service_status() -> dict:
         vm_ip = vm.get("floating_ip")
         ip_status = vm.get("floating_ip_status")
         
-        logger.info(f"Checking VM {i+1} ({vm_name}):")
-        logger.info(f"  - VM Status: {vm_status}")
-        logger.info(f"  - Floating IP: {vm_ip}")
-        logger.info(f"  - IP Status: {ip_status}")
+        logger.debug(f"Checking VM {i+1} ({vm_name}):")
+        logger.debug(f"  - VM Status: {vm_status}")
+        logger.debug(f"  - Floating IP: {vm_ip}")
+        logger.debug(f"  - IP Status: {ip_status}")
         
         is_active = vm_status == "ACTIVE"
         has_ip = vm_ip is not None
         ip_is_attached = ip_status == "ATTACHED"
         
-        logger.info(f"  - is_active: {is_active}")
-        logger.info(f"  - has_ip: {has_ip}")
-        logger.info(f"  - ip_is_attached: {ip_is_attached}")
+        logger.debug(f"  - is_active: {is_active}")
+        logger.debug(f"  - has_ip: {has_ip}")
+        logger.debug(f"  - ip_is_attached: {ip_is_attached}")
 
         if is_active and has_ip and ip_is_attached:
-            logger.info(f"  ✅ VM {vm_name} meets basic criteria (ACTIVE + IP attached)")
-            logger.info(f"  🔍 Testing WebSocket service readiness at {vm_ip}...")
+            logger.debug(f"  ✅ VM {vm_name} meets basic criteria (ACTIVE + IP attached)")
+            logger.debug(f"  🔍 Testing WebSocket service readiness at {vm_ip}...")
             
             service_ready = await is_websocket_ready(vm_ip)
             
             if service_ready:
+                record_vm_ready(vm)
                 logger.info(f"  ✅ SERVICE READY! VM {vm_name} at {vm_ip} is fully operational")
                 return {"status": "success", "message": "Found active VM with ready-to-use public IP.", "ip_address": vm_ip}
             else:
@@ -193,10 +330,12 @@ async def get_service_status() -> dict:
             return {"status": "already_deploying", "message": "A VM is currently being deployed."}
         
         else:
-            logger.info(f"  ❌ VM {vm_name} does not meet criteria - skipping")
+            logger.debug(f"  ❌ VM {vm_name} does not meet criteria - skipping")
     
     logger.info("--- No suitable VM found ---")
     logger.info(f"Checked {len(instances)} VMs, none were ready")
+    if _spin_up is not None:
+        return await _spin_up()
     logger.info("Attempting to spin up a new A4000...")
     
     success, result = _create_a4000_vm()
@@ -210,6 +349,25 @@ async def get_service_status() -> dict:
         logger.error(f"Failure details: {result}")
         return {"status": "tried_spinning_up_failed", "message": "Failed to spin up a new VM.", "error_details": result}
 
+async def find_ready_backends(exclude=()) -> list:
+    """
+    Returns the IPs of all VMs whose ASR WebSocket is accepting connections,
+    skipping any IP in `exclude`. Unlike get_service_status() this never spins up a VM.
+    """
+    instances = await asyncio.to_thread(get_all_vms)
+    if not instances:
+        return []
+    candidates = [
+        vm for vm in instances
+        if vm.get("status") == "ACTIVE" and vm.get("floating_ip")
+        and vm.get("floating_ip_status") == "ATTACHED" and vm.get("floating_ip") not in exclude
+    ]
+    ready = await asyncio.gather(*(is_websocket_ready(vm["floating_ip"]) for vm in candidates))
+    for vm, ok in zip(candidates, ready):
+        if ok:
+            record_vm_ready(vm)
+    return [vm["floating_ip"] for vm, ok in zip(candidates, ready) if ok]
+
 # --- Enhanced API Endpoints ---
 
 @router.get("/get_ip_or_spin_up", dependencies=[Depends(get_spinup_user_or_admin)])
@@ -250,19 +408,131 @@ def delete_vm(vm_id, vm_name):
     url = f"{API_BASE_URL}/virtual-machines/{vm_id}"
     logger.info(f"Attempting to delete VM: {vm_name} (ID: {vm_id})")
     try:
-        response = requests.delete(url, headers=get_hyperstack_headers())
-        response.raise_for_status()
+        response = hyperstack_request("delete_vm", "DELETE", url)
         data = response.json()
         if data.get("status"):
             logger.info(f"Successfully initiated deletion for VM: {vm_name}")
+            lifecycle.store.record("hyperstack", vm_id, "delete_requested", vm_name=vm_name)
             return True, data.get("message")
         else:
             logger.error(f"Failed to delete VM {vm_name}: {data.get('message')}")
             return False, data.get('message')
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            # Already gone (e.g. a retry after a delete that timed out): nothing left to do.
+            logger.info(f"VM {vm_name} (ID: {vm_id}) no longer exists")
+            return True, "VM not found; already deleted."
+        logger.error(f"An HTTP error occurred while deleting VM {vm_id}: {e}")
+        return False, str(e)
     except requests.exceptions.RequestException as e:
         logger.error(f"An HTTP error occurred while deleting VM {vm_id}: {e}")
         return False, str(e)
 
+# --- Bulk teardown ---
+TEARDOWN_CONCURRENCY = int(os.environ.get("HYPERSTACK_TEARDOWN_CONCURRENCY", 8))
+TEARDOWN_MAX_ATTEMPTS = int(os.environ.get("HYPERSTACK_TEARDOWN_MAX_ATTEMPTS", 5))
+TEARDOWN_VERIFY_SECONDS = float(os.environ.get("HYPERSTACK_TEARDOWN_VERIFY_SECONDS", 600))
+TEARDOWN_POLL_SECONDS = 10
+# A VM still listed, and not DELETING, this long after its delete request gets the request again.
+TEARDOWN_RETRY_SECONDS = 60
+TEARDOWN_JOBS_KEPT = 20
+
+class TeardownJob:
+    """
+    Deletes a set of VMs with bounded parallelism, then re-lists until they are
+    gone. VM states: pending -> delete_requested -> deleted, or failed /
+    still_listed when retries or the verify window run out.
+    """
+    def __init__(self, instances: list):
+        self.id = uuid.uuid4().hex[:12]
+        self.status = "running"
+        self.started_at = time.time()
+        self.finished_at = None
+        self.vms = {}
+        for vm in instances:
+            vm_id = vm.get("id")
+            self.vms[str(vm_id)] = {"id": vm_id, "name": vm.get("name", "N/A"), "status": "pending" if vm_id else "skipped",
+                                    "attempts": 0, "requested_at": None, "listed_status": vm.get("status"),
+                                    "detail": None if vm_id else "VM had no ID."}
+
+    def to_dict(self) -> dict:
+        counts = {}
+        for entry in self.vms.values():
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        return {"job_id": self.id, "status": self.status, "started_at": self.started_at,
+                "finished_at": self.finished_at, "total": len(self.vms), "counts": counts,
+                "vms": [{k: v for k, v in entry.items() if k != "requested_at"} for entry in self.vms.values()]}
+
+    async def request_delete(self, entry: dict, semaphore: asyncio.Semaphore):
+        """Sends the delete for one VM, retrying with backoff; safe to repeat."""
+        async with semaphore:
+            while entry["attempts"] < TEARDOWN_MAX_ATTEMPTS:
+                entry["attempts"] += 1
+                success, message = await asyncio.to_thread(delete_vm, entry["id"], entry["name"])
+                entry["detail"] = message
+                if success:
+                    entry["status"], entry["requested_at"] = "delete_requested", time.monotonic()
+                    return
+                await asyncio.sleep(min(2 ** entry["attempts"], 30))
+            entry["status"] = "failed"
+
+    async def run(self):
+        semaphore = asyncio.Semaphore(TEARDOWN_CONCURRENCY)
+        with tracing.span("hyperstack.teardown", job_id=self.id, vms=len(self.vms)):
+            await asyncio.gather(*(self.request_delete(entry, semaphore)
+                                   for entry in self.vms.values() if entry["status"] == "pending"))
+            self.status = "verifying"
+            await self.verify(semaphore)
+        self.finished_at = time.time()
+        left = [e["name"] for e in self.vms.values() if e["status"] not in ("deleted", "skipped")]
+        self.status = "incomplete" if left else "done"
+        log = logger.error if left else logger.info
+        log(f"Teardown {self.id} {self.status} in {self.finished_at - self.started_at:.0f}s; still present: {left}")
+
+    async def verify(self, semaphore: asyncio.Semaphore):
+        """Re-lists VMs until every one in the job is gone, re-sending deletes that didn't take."""
+        deadline = time.monotonic() + TEARDOWN_VERIFY_SECONDS
+        while True:
+            instances = await asyncio.to_thread(get_all_vms)
+            if instances is not None:
+                listed = {str(vm.get("id")): vm for vm in instances}
+                retries = []
+                for vm_id, entry in self.vms.items():
+                    if entry["status"] in ("deleted", "skipped"):
+                        continue
+                    if vm_id not in listed:
+                        entry["status"], entry["listed_status"] = "deleted", None
+                        continue
+                    entry["listed_status"] = listed[vm_id].get("status")
+                    stale = entry["requested_at"] is None or time.monotonic() - entry["requested_at"] > TEARDOWN_RETRY_SECONDS
+                    if entry["listed_status"] != "DELETING" and stale and entry["attempts"] < TEARDOWN_MAX_ATTEMPTS:
+                        retries.append(entry)
+                if all(e["status"] in ("deleted", "skipped") for e in self.vms.values()):
+                    return
+                await asyncio.gather(*(self.request_delete(entry, semaphore) for entry in retries))
+            if time.monotonic() > deadline:
+                break
+            await asyncio.sleep(TEARDOWN_POLL_SECONDS)
+        for entry in self.vms.values():
+            if entry["status"] == "delete_requested":
+                entry["status"] = "still_listed"
+
+teardown_jobs: dict[str, TeardownJob] = {}
+
+def start_teardown(instances: list) -> TeardownJob:
+    """Starts a teardown job in the background, or returns the one already running."""
+    for job in teardown_jobs.values():
+        if job.finished_at is None:
+            return job
+    job = TeardownJob(instances)
+    teardown_jobs[job.id] = job
+    while len(teardown_jobs) > TEARDOWN_JOBS_KEPT:
+        teardown_jobs.pop(next(iter(teardown_jobs)))
+    task = asyncio.create_task(job.run())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return job
+
 
 @router.post("/spin_up_a4000", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(get_spinup_user_or_admin)])
 async def spin_up_a4000():
@@ -273,26 +543,27 @@ async def spin_up_a4000():
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=result)
 
 
-@router.post("/spin_down_all", dependencies=[Depends(get_admin_user)])
+@router.post("/spin_down_all", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(get_admin_user)])
 async def spin_down_all():
+    """Deletes every VM in a background job; poll GET /spin_down_all/{job_id} for progress."""
     logger.warning("Received ADMIN request for /spin_down_all.")
-    instances = get_all_vms()
-    
+    instances = await asyncio.to_thread(get_all_vms)
+
     if instances is None:
         raise HTTPException(status_code=502, detail="Could not retrieve VM list from Hyperstack API.")
     if not instances:
-        return {"message": "No virtual machines found to delete.", "deleted_vms": []}
+        return {"message": "No virtual machines found to delete.", "job_id": None, "vms": []}
+
+    progress = start_teardown(instances).to_dict()
+    return {"message": f"Deleting {progress['total']} virtual machine(s) in the background.", **progress}
 
-    deleted_vms_report = []
-    for vm in instances:
-        vm_id, vm_name = vm.get("id"), vm.get("name", "N/A")
-        if vm_id:
-            success, message = delete_vm(vm_id, vm_name)
-            deleted_vms_report.append({"id": vm_id, "name": vm_name, "status": "SUCCESS" if success else "FAILED", "detail": message})
-        else:
-            deleted_vms_report.append({"id": None, "name": vm_name, "status": "SKIPPED", "detail": "VM had no ID."})
-            
-    return {"message": "VM deletion process completed.", "deleted_vms": deleted_vms_report}
+
+@router.get("/spin_down_all/{job_id}", dependencies=[Depends(get_admin_user)])
+async def spin_down_all_progress(job_id: str):
+    job = teardown_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No teardown job {job_id}.")
+    return job.to_dict()
 
 
 @router.get("/list_vms", dependencies=[Depends(get_spinup_user_or_admin)])
@@ -302,3 +573,32 @@ async def list_vms():
     if instances is None:
         raise HTTPException(status_code=502, detail="Could not retrieve VM list from Hyperstack API.")
     return {"count": len(instances), "instances": instances}
+
+
+@router.post("/bake", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(get_admin_user)])
+async def bake():
+    """Starts a VM that installs everything for a baked image (gpu/provision/a4000_bake.sh)."""
+    logger.warning("Received ADMIN request for /bake.")
+    url = f"{API_BASE_URL}/virtual-machines"
+    try:
+        response = await asyncio.to_thread(hyperstack_request, "create_vm", "POST", url,
+                                           json=a4000_vm_payload(BASE_IMAGE, BAKE_USER_DATA, name_prefix="bake-a4000"))
+    except requests.exceptions.RequestException as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    return response.json()
+
+
+@router.post("/bake/{vm_id}/register", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(get_admin_user)])
+async def register_bake(vm_id: str):
+    """Snapshots a finished bake VM into the default boot image, in the background."""
+    logger.warning(f"Received ADMIN request to register a baked image from VM {vm_id}.")
+    task = asyncio.create_task(asyncio.to_thread(register_baked_image, vm_id))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return {"message": f"Snapshotting VM {vm_id}; new VMs use the image once it is registered.",
+            "current_image": baked_image()}
+
+
+@router.get("/bake/image", dependencies=[Depends(get_spinup_user_or_admin)])
+async def get_baked_image():
+    return {"image": baked_image(), "boot_path": "baked" if baked_image() else "script"}
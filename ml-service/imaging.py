@@ -0,0 +1,88 @@
+import io
+import numpy as np
+from PIL import Image
+
+# --- Configuration ---
+HASH_SIZE = 8  # 64-bit perceptual hash
+HASH_HIGHFREQ = 4  # the DCT runs on a (HASH_SIZE * HASH_HIGHFREQ)^2 grayscale thumbnail
+
+# EXIF tag ids (PIL.ExifTags.Base / GPS)
+EXIF_IFD = 0x8769
+GPS_IFD = 0x8825
+MAKE, MODEL, ORIENTATION, DATETIME = 0x010F, 0x0110, 0x0112, 0x0132
+DATETIME_ORIGINAL = 0x9003
+GPS_LAT_REF, GPS_LAT, GPS_LON_REF, GPS_LON, GPS_ALT_REF, GPS_ALT = 1, 2, 3, 4, 5, 6
+# What makes an image with this EXIF orientation upright
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT, 3: Image.Transpose.ROTATE_180, 4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE, 6: Image.Transpose.ROTATE_270, 7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+def decode(data: bytes) -> tuple:
+    """
+    Decodes once: returns (RGB image, Image.Exif). The EXIF block is read from the
+    header before the pixel data, so it costs nothing extra.
+    """
+    img = Image.open(io.BytesIO(data))
+    exif = img.getexif()
+    return img.convert("RGB"), exif
+
+def thumbnail_webp(img: Image.Image, exif: Image.Exif, max_side: int = 256, quality: int = 80) -> tuple:
+    """Upright (EXIF orientation applied) WebP thumbnail of an already decoded image: (bytes, width, height)."""
+    scale = min(1.0, max_side / max(img.size))
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    thumb = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+    # Rotating the thumbnail is cheaper than rotating the full image first
+    if (transpose := ORIENTATION_TRANSPOSE.get(exif.get(ORIENTATION))) is not None:
+        thumb = thumb.transpose(transpose)
+    buf = io.BytesIO()
+    thumb.save(buf, "WEBP", quality=quality, method=4)
+    return buf.getvalue(), thumb.width, thumb.height
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    return np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n))
+
+_DCT = _dct_matrix(HASH_SIZE * HASH_HIGHFREQ)
+
+def perceptual_hash(img: Image.Image) -> str:
+    """
+    DCT pHash as 16 hex digits: low frequencies of a 32x32 grayscale version,
+    thresholded at their median. Hamming distance <= ~10 means near-duplicate.
+    """
+    side = HASH_SIZE * HASH_HIGHFREQ
+    small = img.resize((side, side), Image.Resampling.LANCZOS, reducing_gap=2.0)
+    pixels = np.asarray(small.convert("L"), dtype=np.float64)
+    low = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE]
+    bits = (low > np.median(low.flatten()[1:])).flatten()  # median without the DC term
+    return f"{int(''.join('1' if b else '0' for b in bits), 2):0{HASH_SIZE * HASH_SIZE // 4}x}"
+
+def dimensions(img: Image.Image, exif: Image.Exif) -> dict:
+    """Stored and displayed (after EXIF orientation) size."""
+    rotated = exif.get(ORIENTATION, 1) in (5, 6, 7, 8)
+    return {"width": img.width, "height": img.height,
+            "display_width": img.height if rotated else img.width,
+            "display_height": img.width if rotated else img.height}
+
+def _degrees(dms, ref) -> float | None:
+    try:
+        degrees = float(dms[0]) + float(dms[1]) / 60 + float(dms[2]) / 3600
+    except (TypeError, ValueError, ZeroDivisionError, IndexError):
+        return None
+    return -degrees if ref in ("S", "W") else degrees
+
+def exif_info(exif: Image.Exif) -> dict:
+    """Camera, capture time, orientation and GPS position, where present."""
+    sub = exif.get_ifd(EXIF_IFD)
+    info = {"make": exif.get(MAKE), "model": exif.get(MODEL), "orientation": exif.get(ORIENTATION),
+            "taken_at": sub.get(DATETIME_ORIGINAL) or exif.get(DATETIME), "gps": None}
+    gps = exif.get_ifd(GPS_IFD)
+    if GPS_LAT in gps and GPS_LON in gps:
+        lat, lon = _degrees(gps[GPS_LAT], gps.get(GPS_LAT_REF)), _degrees(gps[GPS_LON], gps.get(GPS_LON_REF))
+        if lat is not None and lon is not None:
+            info["gps"] = {"lat": round(lat, 7), "lon": round(lon, 7)}
+            if GPS_ALT in gps:
+                altitude = float(gps[GPS_ALT])
+                info["gps"]["altitude"] = round(-altitude if gps.get(GPS_ALT_REF) == b"\x01" else altitude, 2)
+    return {k: v.strip("\x00 ") if isinstance(v, str) else v for k, v in info.items()}
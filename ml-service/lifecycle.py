@@ -0,0 +1,135 @@
+"""
+VM lifecycle telemetry.
+
+Every GPU instance we start gets its transitions recorded once, with
+timestamps, in a small SQLite file:
+
+    create_requested -> created -> active -> ip_attached -> ready -> delete_requested
+
+create_requested is when we called the provider's create API, created when
+it answered, active/ip_attached when a listing first showed the VM running
+with its public IP, and ready when the ASR websocket first accepted a
+connection. Recording is idempotent per (provider, vm, event), so callers can
+report what they see on every poll. A VM's variant (e.g. the "baked" or
+"script" boot path) is set on create_requested and splits the percentiles.
+
+summary() turns this into boot percentiles per provider and GPU type, and
+expected_boot_seconds() is what the placement engine (and any warm-pool
+policy) should use as its estimate.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+DB_PATH = os.environ.get("VM_LIFECYCLE_DB",
+                         os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "vm_lifecycle.sqlite3"))
+EVENTS = ("create_requested", "created", "active", "ip_attached", "ready", "delete_requested")
+# Boot estimates use this many of the most recent VMs that reached `ready`.
+ESTIMATE_WINDOW = 20
+
+class LifecycleStore:
+    """Opens its database on open() (main.py does this at startup) or on first use."""
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self.lock = threading.RLock()
+        self._db = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.open()
+        return self._db
+
+    def open(self):
+        with self.lock:
+            if self._db is None:
+                self._db = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS vm_events (
+                provider TEXT NOT NULL,
+                vm_id TEXT NOT NULL,
+                event TEXT NOT NULL,
+                ts REAL NOT NULL,
+                vm_name TEXT,
+                gpu_type TEXT,
+                variant TEXT,
+                PRIMARY KEY (provider, vm_id, event)
+            )""")
+        db.execute("CREATE INDEX IF NOT EXISTS vm_events_ts ON vm_events (ts)")
+        return db
+
+    def record(self, provider: str, vm_id, event: str, ts: float | None = None,
+               vm_name: str | None = None, gpu_type: str | None = None, variant: str | None = None):
+        """Records `event` for a VM unless it was already recorded."""
+        if vm_id is None:
+            return
+        with self.lock:
+            cursor = self.db.execute(
+                "INSERT OR IGNORE INTO vm_events (provider, vm_id, event, ts, vm_name, gpu_type, variant) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (provider, str(vm_id), event, ts or time.time(), vm_name, gpu_type, variant))
+        if cursor.rowcount:
+            logger.info(f"VM lifecycle: {provider}/{vm_name or vm_id} {event}")
+
+    def events(self, since: float = 0) -> dict:
+        """{(provider, vm_id): {"vm_name", "gpu_type", "variant", event: ts, ...}} for VMs created since `since`."""
+        with self.lock:
+            rows = self.db.execute("""
+                SELECT e.provider, e.vm_id, e.event, e.ts, e.vm_name, e.gpu_type, e.variant FROM vm_events e
+                JOIN vm_events c ON c.provider = e.provider AND c.vm_id = e.vm_id AND c.event = 'create_requested'
+                WHERE c.ts >= ? ORDER BY c.ts""", (since,)).fetchall()
+        vms = {}
+        for provider, vm_id, event, ts, vm_name, gpu_type, variant in rows:
+            vm = vms.setdefault((provider, vm_id), {"vm_name": None, "gpu_type": None, "variant": None})
+            vm[event] = ts
+            vm["vm_name"] = vm["vm_name"] or vm_name
+            vm["gpu_type"] = vm["gpu_type"] or gpu_type
+            vm["variant"] = vm["variant"] or variant
+        return vms
+
+    def boot_durations(self, since: float = 0) -> dict:
+        """{(provider, gpu_type, variant): {"create_to_<event>": [seconds, ...]}}, oldest VM first."""
+        durations = {}
+        for (provider, _), vm in self.events(since).items():
+            group = durations.setdefault((provider, vm["gpu_type"], vm["variant"]), {})
+            for event in EVENTS[1:5]:
+                if event in vm:
+                    group.setdefault(f"create_to_{event}", []).append(vm[event] - vm["create_requested"])
+        return durations
+
+    def summary(self, since: float = 0) -> list:
+        out = []
+        for (provider, gpu_type, variant), group in sorted(self.boot_durations(since).items(), key=str):
+            stats = {}
+            for name, seconds in group.items():
+                p50, p90, p99 = (round(float(p), 1) for p in np.percentile(seconds, [50, 90, 99]))
+                stats[name] = {"count": len(seconds), "p50": p50, "p90": p90, "p99": p99,
+                               "max": round(max(seconds), 1)}
+            out.append({"provider": provider, "gpu_type": gpu_type, "variant": variant, **stats})
+        return out
+
+    def expected_boot_seconds(self, provider: str, gpu_type: str, default: float, variant: str | None = None) -> float:
+        """
+        Median create-to-ready time of the ESTIMATE_WINDOW VMs (of `variant`, if
+        given) that most recently became ready, or `default` with no history.
+        """
+        ready = sorted((vm["ready"], vm["ready"] - vm["create_requested"])
+                       for (p, _), vm in self.events().items()
+                       if p == provider and vm["gpu_type"] == gpu_type and "ready" in vm
+                       and (variant is None or vm["variant"] == variant))
+        return float(np.median([seconds for _, seconds in ready[-ESTIMATE_WINDOW:]])) if ready else default
+
+store = LifecycleStore()
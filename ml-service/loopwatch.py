@@ -0,0 +1,141 @@
+"""
+Event-loop watchdog.
+
+A heartbeat task sleeps for INTERVAL and records how late it wakes up; that
+lag is exported as a histogram and as rolling percentiles. A monitor thread
+watches the heartbeat, and when the loop has been blocked for longer than
+STALL_THRESHOLD it grabs the loop thread's stack while the blocking code is
+still running, so the log (and /debug/loop/stalls) says which handler or
+callback held the loop, not just that something did.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+import numpy as np
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+INTERVAL = float(os.environ.get("LOOP_WATCHDOG_INTERVAL_MS", 50)) / 1000  # 0 disables the watchdog
+STALL_THRESHOLD = float(os.environ.get("LOOP_STALL_THRESHOLD_MS", 100)) / 1000
+WINDOW_SECONDS = 60
+QUANTILES = (0.5, 0.9, 0.99, 1.0)
+MAX_STALLS_KEPT = 50
+
+class Stall:
+    def __init__(self, detected_at: float, task: str, stack: str):
+        self.detected_at = detected_at
+        self.task = task
+        self.stack = stack
+        self.duration = None  # filled in when the loop comes back
+
+    def format(self) -> str:
+        duration = f"{self.duration * 1000:.0f} ms" if self.duration is not None else "still blocked"
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.detected_at))
+        return f"{when} loop blocked {duration} in task {self.task}\n{self.stack}"
+
+class LoopWatchdog:
+    def __init__(self, interval: float = INTERVAL, threshold: float = STALL_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.lags = deque(maxlen=max(1, int(WINDOW_SECONDS / interval)))
+        self.stalls = deque(maxlen=MAX_STALLS_KEPT)
+        self.loop = None
+        self.loop_thread = None
+        self.last_tick = time.monotonic()
+        self.pending_stall = None
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+
+    def start(self):
+        """Starts watching the running loop. Call from inside it."""
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self.last_tick = time.monotonic()
+        self.heartbeat_task = self.loop.create_task(self._heartbeat(), name="loop-watchdog")
+        threading.Thread(target=self._monitor, name="loop-watchdog", daemon=True).start()
+        logger.info(f"Event loop watchdog started (interval {self.interval * 1000:.0f} ms, "
+                    f"stall threshold {self.threshold * 1000:.0f} ms)")
+
+    def close(self):
+        self.stop.set()
+        self.heartbeat_task.cancel()
+
+    async def _heartbeat(self):
+        ticks = 0
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self.last_tick = now
+            self.lags.append(lag)
+            metrics.EVENT_LOOP_LAG_SECONDS.observe(lag)
+            if lag > self.threshold:
+                self._finish_stall(lag)
+            ticks += 1
+            if ticks * self.interval >= 1.0:
+                ticks = 0
+                for q, value in zip(QUANTILES, np.quantile(self.lags, QUANTILES)):
+                    metrics.EVENT_LOOP_LAG_RECENT.labels(str(q)).set(value)
+
+    def _finish_stall(self, lag: float):
+        with self.lock:
+            stall, self.pending_stall = self.pending_stall, None
+        if stall is None:
+            # blocked for less than a monitor check period past the threshold
+            stall = Stall(time.time() - lag, "unknown", "  (loop resumed before its stack was captured)\n")
+        stall.duration = lag
+        self.stalls.append(stall)
+        metrics.EVENT_LOOP_STALLS.inc()
+        logger.warning("Event loop stall: " + stall.format())
+
+    def _monitor(self):
+        check_every = max(0.005, self.threshold / 4)
+        while not self.stop.wait(check_every):
+            blocked = time.monotonic() - self.last_tick - self.interval
+            if blocked <= self.threshold or self.pending_stall is not None:
+                continue
+            frame = sys._current_frames().get(self.loop_thread)
+            if frame is None:
+                continue
+            frames = traceback.extract_stack(frame)
+            # drop the loop's own frames above the callback that is blocking it
+            for i in range(len(frames) - 1, -1, -1):
+                if frames[i].filename == asyncio.events.__file__:
+                    frames = frames[i + 1:]
+                    break
+            stack = "".join(traceback.format_list(frames))
+            try:
+                task = asyncio.current_task(self.loop)
+                task_name = f"{task.get_name()} {task.get_coro()!r}" if task else "none (plain callback)"
+            except RuntimeError:
+                task_name = "unknown"
+            with self.lock:
+                # the heartbeat may have caught up while we were capturing
+                if time.monotonic() - self.last_tick - self.interval > self.threshold:
+                    self.pending_stall = Stall(time.time() - blocked, task_name, stack)
+
+    def summary(self) -> str:
+        if not self.lags:
+            return "no event loop lag samples yet\n"
+        values = np.quantile(self.lags, QUANTILES) * 1000
+        parts = ", ".join(f"p{q * 100:g} {v:.2f} ms" for q, v in zip(QUANTILES, values))
+        return (f"event loop lag over the last {len(self.lags) * self.interval:.0f}s: {parts}; "
+                f"{len(self.stalls)} recent stalls over {self.threshold * 1000:.0f} ms\n")
+
+watchdog = None
+
+def start():
+    """Starts the process-wide watchdog on the running loop, unless disabled."""
+    global watchdog
+    if INTERVAL <= 0 or watchdog is not None:
+        return
+    watchdog = LoopWatchdog()
+    watchdog.start()
@@ -1,17 +1,56 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request, Response
+import asyncio
+import base64
 import io
-from PIL import Image
+import time
+from PIL import Image, UnidentifiedImageError
 import torch
-from transformers import AutoProcessor, AutoTokenizer, SiglipModel
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 import realtime
+import embed_models
+import embed_offload
+import embed_scheduler
 import hyperstack
+import imaging
+import lifecycle
+import fleet
+import loopwatch
+import metrics
+import profiling
+import reembed
+import remote
+import tracing
+import transcribe
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 app = FastAPI()
 
 app.include_router(realtime.router, prefix='/realtime')
+app.include_router(embed_models.router, prefix='/models')
+app.include_router(embed_offload.router, prefix='/embed/offload')
 app.include_router(hyperstack.router, prefix='/hyperstack')
+app.include_router(fleet.router, prefix='/fleet')
+app.include_router(profiling.router, prefix='/debug')
+app.include_router(remote.router, prefix='/remote')
+app.include_router(reembed.router, prefix='/reembed')
+app.include_router(transcribe.router, prefix='/transcribe')
+
+# Backends get started wherever placement ranks best, not always as a Hyperstack A4000
+hyperstack.configure(fleet.spin_up_status)
+
+@app.on_event('startup')
+async def open_lifecycle_store():
+    await asyncio.to_thread(lifecycle.store.open)
+
+@app.on_event('startup')
+async def start_loop_watchdog():
+    loopwatch.start()
+
+@app.on_event('startup')
+async def warm_embed_models():
+    embed_models.registry.warm_in_background()
+    embed_offload.start()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -23,6 +62,17 @@ app.add_middleware(
     allow_headers=['*'],
 )
 
+@app.middleware('http')
+async def trace_requests(request: Request, call_next):
+    # Joins the caller's trace when it sends a W3C traceparent header (the Next.js app does).
+    if request.url.path == '/metrics':
+        return await call_next(request)
+    with tracing.span(f'{request.method} {request.url.path}', traceparent=request.headers.get('traceparent'),
+                      kind=tracing.KIND_SERVER, **{'http.method': request.method, 'http.target': request.url.path}) as s:
+        response = await call_next(request)
+        s.set_attribute('http.status_code', response.status_code)
+        return response
+
 def l2_norms(vecs):
   norms = (vecs ** 2).sum(axis=-1).sqrt()
   return norms
@@ -31,25 +81,157 @@ def l2_normalize(vecs):
   normalized = vecs.T / norms
   return normalized.T
 
-device = torch.device('cuda' if torch.cuda.is_available() else "cpu")
+device = embed_models.device
+
+# --- Embedding stages ---
+# Split out so the benchmarks (and anything batching) can drive and time each step.
+def decode_image(img_bytes: bytes) -> Image.Image:
+    return Image.open(io.BytesIO(img_bytes)).convert('RGB')
+
+def preprocess(pil_imgs: list, loaded: embed_models.LoadedModel):
+    return loaded.processor(images=pil_imgs, return_tensors="pt").to(device)
+
+def forward(img_processed, loaded: embed_models.LoadedModel):
+    with torch.no_grad():
+        return loaded.model.get_image_features(**img_processed)
+
+def embed_images(pil_imgs: list, timings: dict = None, model_id: str = None):
+    """
+    Returns L2-normalized embeddings for a batch of decoded images, from `model_id`
+    (default: the registry's default model), loading it first if needed.
+    If `timings` is given, per-stage durations in seconds are added to it.
+    """
+    timings = {} if timings is None else timings
+    metrics.EMBED_BATCH_SIZE.observe(len(pil_imgs))
+    with embed_models.registry.use(model_id) as loaded, profiling.embed_batch():
+        t0 = time.perf_counter()
+        with tracing.span('embed.preprocess', images=len(pil_imgs)):
+            img_processed = preprocess(pil_imgs, loaded)
+        t1 = time.perf_counter()
+        with tracing.span('embed.forward', images=len(pil_imgs), device=str(device), model=loaded.id):
+            img_features = forward(img_processed, loaded)
+        t2 = time.perf_counter()
+        with tracing.span('embed.normalize'):
+            img_features_normed = l2_normalize(img_features)
+        t3 = time.perf_counter()
+    timings['preprocess'] = timings.get('preprocess', 0.0) + t1 - t0
+    timings['forward'] = timings.get('forward', 0.0) + t2 - t1
+    timings['normalize'] = timings.get('normalize', 0.0) + t3 - t2
+    return img_features_normed
+
+def embed_backfill(pil_imgs: list):
+    # Re-embed jobs queue as batch work, so interactive uploads go first
+    return torch.stack(embed_scheduler.embed_sync(pil_imgs, embed_models.DEFAULT_MODEL, 'batch', 'reembed'))
 
-logger.info('loading models on start')
-model = SiglipModel.from_pretrained("nielsr/siglip-base-patch16-224").to(device)
-processor = AutoProcessor.from_pretrained("nielsr/siglip-base-patch16-224")
-tokenizer = AutoTokenizer.from_pretrained("nielsr/siglip-base-patch16-224")
-logger.info('loaded models')
+embed_offload.configure(embed_images)
+embed_scheduler.configure(embed_offload.batch_router.embed)
+reembed.configure(embed_backfill, embed_models.DEFAULT_MODEL)
+
+def server_timing(timings: dict) -> str:
+    return ', '.join(f'{stage};dur={seconds * 1000:.2f}' for stage, seconds in timings.items())
+
+def resolve_model(model: str | None) -> str:
+    try:
+        return embed_models.registry.resolve(model)
+    except embed_models.UnknownModel:
+        raise HTTPException(status_code=404, detail={'message': f'Unknown model {model}.',
+                                                     'models': embed_models.MODEL_IDS})
+
+def check_priority(priority: str):
+    if priority not in embed_scheduler.PRIORITIES:
+        raise HTTPException(status_code=422, detail=f'priority must be one of {", ".join(embed_scheduler.PRIORITIES)}.')
 
 @app.post('/embed')
-async def embed(file: UploadFile = File(...)):
+async def embed(response: Response, file: UploadFile = File(...), model: str | None = None,
+                priority: str = 'interactive', tenant: str | None = None):
+    """`priority` is interactive (default), batch or background; backfills should say batch and name a tenant."""
     logger.info('/embed received request')
-    img_bytes = await file.read()
-    pil_img = Image.open(io.BytesIO(img_bytes)).convert('RGB')
-    
-    with torch.no_grad():
-        img_processed = processor(images=[pil_img], return_tensors="pt").to(device)
-        img_features = model.get_image_features(**img_processed)
+    model_id = resolve_model(model)
+    check_priority(priority)
+    request_span = tracing.current_span()
+    if request_span:
+        # FastAPI has already read and parsed the multipart body by the time we get here
+        tracing.start_span('embed.receive_multipart', start_ns=request_span.start_ns).end()
+    with tracing.span('embed.read_upload') as s:
+        img_bytes = await file.read()
+        s.set_attribute('bytes', len(img_bytes))
+    t0 = time.perf_counter()
+    with tracing.span('embed.decode') as s:
+        pil_img = await asyncio.to_thread(decode_image, img_bytes)
+        s.set_attribute('width', pil_img.width)
+        s.set_attribute('height', pil_img.height)
+    timings = {'decode': time.perf_counter() - t0}
 
-    img_features_normed = l2_normalize(img_features)
-    img_features_normed_list = img_features_normed[0].tolist()
+    # Queued behind more urgent work; the model runs (and loads on first use) on the scheduler's thread
+    rows = await embed_scheduler.embed([pil_img], model_id, priority, tenant, timings)
+    t0 = time.perf_counter()
+    with tracing.span('embed.serialize'):
+        img_features_normed_list = rows[0].tolist()
+    timings['serialize'] = time.perf_counter() - t0
+    response.headers['Server-Timing'] = server_timing(timings)
+    for stage, seconds in timings.items():
+        metrics.EMBED_STAGE_SECONDS.labels(stage).observe(seconds)
     logger.info('/embed sucessfully created embedding')
-    return {'message': 'this is the embed endpoint', 'image_embedding': img_features_normed_list }
+    return {'message': 'this is the embed endpoint', 'model': model_id, 'image_embedding': img_features_normed_list }
+
+# --- Analysis ---
+ANALYZE_OUTPUTS = ('embedding', 'thumbnail', 'phash', 'dims', 'exif')
+
+def analyze_image(img_bytes: bytes, outputs: set, model_id: str, thumbnail_size: int, timings: dict,
+                  priority: str = 'interactive', tenant: str | None = None) -> dict:
+    """Every requested output from one decode of `img_bytes`."""
+    result = {}
+    def stage(name: str, fn):
+        t0 = time.perf_counter()
+        with tracing.span(f'analyze.{name}'):
+            value = fn()
+        timings[name] = time.perf_counter() - t0
+        return value
+
+    pil_img, exif = stage('decode', lambda: imaging.decode(img_bytes))
+    if 'dims' in outputs:
+        result['dims'] = imaging.dimensions(pil_img, exif)
+    if 'exif' in outputs:
+        result['exif'] = stage('exif', lambda: imaging.exif_info(exif))
+    if 'phash' in outputs:
+        result['phash'] = stage('phash', lambda: imaging.perceptual_hash(pil_img))
+    if 'thumbnail' in outputs:
+        data, width, height = stage('thumbnail', lambda: imaging.thumbnail_webp(pil_img, exif, thumbnail_size))
+        result['thumbnail'] = {'format': 'webp', 'width': width, 'height': height,
+                               'data': base64.b64encode(data).decode()}
+    if 'embedding' in outputs:
+        result['model'] = model_id
+        rows = embed_scheduler.embed_sync([pil_img], model_id, priority, tenant, timings)
+        result['image_embedding'] = rows[0].tolist()
+    return result
+
+@app.post('/analyze')
+async def analyze(response: Response, file: UploadFile = File(...),
+                  outputs: str = ','.join(ANALYZE_OUTPUTS), model: str | None = None,
+                  thumbnail_size: int = Query(256, ge=16, le=2048), priority: str = 'interactive',
+                  tenant: str | None = None):
+    """
+    Decodes the upload once and returns the requested outputs (comma-separated:
+    embedding, thumbnail, phash, dims, exif) computed from the same pixels.
+    """
+    wanted = {o.strip() for o in outputs.split(',') if o.strip()}
+    if not wanted or wanted - set(ANALYZE_OUTPUTS):
+        raise HTTPException(status_code=422, detail=f'outputs must be some of {", ".join(ANALYZE_OUTPUTS)}.')
+    model_id = resolve_model(model) if 'embedding' in wanted else None
+    check_priority(priority)
+    img_bytes = await file.read()
+    timings = {}
+    try:
+        # Decode, hashing and encoding are all CPU-bound; keep them off the event loop
+        result = await asyncio.to_thread(analyze_image, img_bytes, wanted, model_id, thumbnail_size, timings,
+                                         priority, tenant)
+    except UnidentifiedImageError:
+        raise HTTPException(status_code=422, detail='Not a readable image.')
+    response.headers['Server-Timing'] = server_timing(timings)
+    for stage, seconds in timings.items():
+        metrics.ANALYZE_STAGE_SECONDS.labels(stage).observe(seconds)
+    return result
+
+@app.get('/metrics')
+def get_metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,92 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# --- Embedding ---
+EMBED_STAGE_SECONDS = Histogram(
+    "embed_stage_seconds", "Time spent in each /embed stage.", ["stage"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+EMBED_BATCH_SIZE = Histogram(
+    "embed_batch_size", "Images per forward pass.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+EMBED_QUEUE_WAIT_SECONDS = Histogram(
+    "embed_queue_wait_seconds", "Time images waited for the embedding model, by priority class.", ["priority"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+EMBED_QUEUE_DEPTH = Gauge("embed_queue_depth", "Images waiting for the embedding model.", ["priority"])
+EMBED_ROUTE_BATCHES = Counter("embed_route_batches_total", "Embedding batches by where they ran.", ["route", "outcome"])
+EMBED_OFFLOAD_WORKERS = Gauge("embed_offload_workers", "Healthy GPU embedding workers.")
+ANALYZE_STAGE_SECONDS = Histogram(
+    "analyze_stage_seconds", "Time spent in each /analyze stage.", ["stage"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+EMBED_MODEL_LOADS = Counter("embed_model_loads_total", "Embedding model loads.", ["model"])
+EMBED_MODEL_EVICTIONS = Counter("embed_model_evictions_total", "Embedding models evicted to stay in budget.", ["model"])
+EMBED_MODEL_BYTES = Gauge("embed_model_bytes", "Parameter and buffer bytes of the loaded embedding models.")
+EMBED_MODEL_LOAD_SECONDS = Histogram(
+    "embed_model_load_seconds", "Time to load an embedding model.",
+    buckets=(0.5, 1, 2.5, 5, 10, 25, 50, 100),
+)
+
+# --- Realtime proxy ---
+REALTIME_ACTIVE_SESSIONS = Gauge("realtime_active_sessions", "Open /realtime/ws-kyutai-tts sessions.")
+# direction is one of client_in, backend_out, backend_in, client_out
+REALTIME_FRAMES = Counter("realtime_frames_total", "Websocket messages proxied.", ["direction"])
+REALTIME_BYTES = Counter("realtime_bytes_total", "Websocket payload bytes proxied.", ["direction"])
+REALTIME_BACKEND_CONNECT_SECONDS = Histogram(
+    "realtime_backend_connect_seconds", "Time to open a stream to a Kyutai backend.",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+REALTIME_FAILOVER_SECONDS = Histogram(
+    "realtime_failover_seconds", "Time from losing a backend to resuming on another.",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+REALTIME_FAILOVERS = Counter("realtime_failovers_total", "Backend failovers by outcome.", ["outcome"])
+REALTIME_CPU_STREAMS = Gauge("realtime_cpu_streams", "Sessions currently transcribed by in-process CPU ASR.")
+REALTIME_CPU_HANDOFFS = Counter("realtime_cpu_handoffs_total", "Sessions handed from CPU ASR to a GPU backend.")
+REALTIME_BROADCAST_SUBSCRIBERS = Gauge("realtime_broadcast_subscribers", "Read-only viewers of published sessions.")
+REALTIME_BROADCAST_SKIPPED = Counter("realtime_broadcast_skipped_total", "Messages dropped for viewers that fell behind.")
+# outcome: ended (the session did), left, slow (stopped reading)
+REALTIME_BROADCAST_DISCONNECTS = Counter("realtime_broadcast_disconnects_total", "Viewer disconnects by outcome.", ["outcome"])
+REALTIME_ADMISSION_QUEUE = Gauge("realtime_admission_queue", "Sessions waiting for a backend slot.")
+REALTIME_ADMISSION_WAIT_SECONDS = Histogram(
+    "realtime_admission_wait_seconds", "Time queued sessions waited for a backend slot.",
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 900),
+)
+# outcome: immediate, queued (admitted after waiting), left, timeout, full
+REALTIME_ADMISSIONS = Counter("realtime_admissions_total", "Session admission attempts by outcome.", ["outcome"])
+REALTIME_VAD_FRAMES = Counter("realtime_vad_frames_total", "Frames seen by the VAD gate.", ["decision"])
+REALTIME_VAD_SAMPLES = Counter("realtime_vad_samples_total", "Samples seen by the VAD gate.", ["decision"])
+
+# --- Batch transcription ---
+TRANSCRIBE_FILES = Counter("transcribe_files_total", "Files through /transcribe by outcome.", ["outcome"])
+TRANSCRIBE_AUDIO_SECONDS = Counter("transcribe_audio_seconds_total", "Seconds of audio transcribed by /transcribe.")
+TRANSCRIBE_REALTIME_FACTOR = Histogram(
+    "transcribe_realtime_factor", "Audio duration divided by time spent streaming it to the backend, per file.",
+    buckets=(0.5, 1, 2, 4, 8, 16, 32, 64, 128),
+)
+
+# --- Hyperstack ---
+HYPERSTACK_API_SECONDS = Histogram(
+    "hyperstack_api_seconds", "Hyperstack API call latency.", ["operation"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+HYPERSTACK_API_ERRORS = Counter("hyperstack_api_errors_total", "Failed Hyperstack API calls.", ["operation"])
+HYPERSTACK_VMS = Gauge("hyperstack_vms", "VMs in the fleet by status, as of the last listing.", ["status"])
+HYPERSTACK_SERVICE_STATUS = Counter(
+    "hyperstack_service_status_total", "Outcomes of get_service_status().", ["status"]
+)
+HYPERSTACK_WS_PROBE_SECONDS = Histogram(
+    "hyperstack_ws_probe_seconds", "ASR websocket readiness probe duration.", ["ready"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+# --- Event loop ---
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "event_loop_lag_seconds", "How late the event loop ran the watchdog's heartbeat.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+EVENT_LOOP_LAG_RECENT = Gauge(
+    "event_loop_lag_recent_seconds", "Event loop lag percentiles over the watchdog's recent window.", ["quantile"]
+)
+EVENT_LOOP_STALLS = Counter("event_loop_stalls_total", "Times the event loop was blocked past the stall threshold.")
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import os
+import msgpack
+import websockets
+
+logger = logging.getLogger(__name__)
+
+# --- Multiplexing Configuration ---
+# Path of the backend's multiplexed endpoint. Unset means every session gets its own
+# websocket to the backend, which is what a stock moshi-server expects.
+MUX_PATH = os.environ.get("REALTIME_MUX_PATH")
+MUX_STREAMS_PER_CONNECTION = int(os.environ.get("REALTIME_MUX_STREAMS_PER_CONNECTION", 16))
+MUX_FLUSH_MS = float(os.environ.get("REALTIME_MUX_FLUSH_MS", 10))
+# Flush without waiting out the window once this many items are queued
+MUX_MAX_BATCH = int(os.environ.get("REALTIME_MUX_MAX_BATCH", 64))
+
+# Wire format, msgpack both ways over one websocket:
+#   {"type": "Batch", "items": [{"sid": int, "op": "open" | "data" | "close", "msg": bytes}, ...]}
+# "msg" is the stream's own msgpack message, passed through untouched, so the per-stream
+# protocol (Audio in, Word/Step/... out) is exactly the one the direct endpoint speaks.
+
+class MuxStream:
+    """
+    One client session's stream on a shared backend connection. Quacks like the
+    websockets connection it replaces: send(), async iteration over raw messages,
+    close(), and ConnectionClosed when the shared connection dies.
+    """
+    def __init__(self, conn: "MuxConnection", sid: int):
+        self.conn = conn
+        self.sid = sid
+        self.queue = asyncio.Queue()
+        self.closed = False
+
+    async def send(self, msg: bytes):
+        if self.closed or self.conn.closed:
+            raise websockets.exceptions.ConnectionClosedError(None, None)
+        self.conn.enqueue(self.sid, "data", msg)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> bytes:
+        msg = await self.queue.get()
+        if msg is None:
+            raise StopAsyncIteration
+        return msg
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put_nowait(None)
+        self.conn.release(self.sid)
+
+class MuxConnection:
+    """
+    A single websocket to a backend's multiplexed endpoint carrying many streams.
+    Outgoing frames are collected for up to MUX_FLUSH_MS and sent as one batch;
+    incoming batches are split back out to the owning stream's queue.
+    """
+    def __init__(self, uri: str, ws):
+        self.uri = uri
+        self.ws = ws
+        self.streams = {}
+        self.next_sid = 0
+        self.outbox = []
+        self.has_output = asyncio.Event()
+        self.batch_full = asyncio.Event()
+        self.closed = False
+        self.writer = asyncio.create_task(self._write_loop())
+        self.reader = asyncio.create_task(self._read_loop())
+
+    def open_stream(self) -> MuxStream:
+        self.next_sid += 1
+        stream = MuxStream(self, self.next_sid)
+        self.streams[stream.sid] = stream
+        self.enqueue(stream.sid, "open")
+        return stream
+
+    def release(self, sid: int):
+        if self.streams.pop(sid, None) is not None and not self.closed:
+            self.enqueue(sid, "close")
+
+    def enqueue(self, sid: int, op: str, msg: bytes = None):
+        item = {"sid": sid, "op": op}
+        if msg is not None:
+            item["msg"] = msg
+        self.outbox.append(item)
+        self.has_output.set()
+        if len(self.outbox) >= MUX_MAX_BATCH:
+            self.batch_full.set()
+
+    async def _write_loop(self):
+        try:
+            while not self.closed:
+                await self.has_output.wait()
+                try:
+                    await asyncio.wait_for(self.batch_full.wait(), MUX_FLUSH_MS / 1000)
+                except TimeoutError:
+                    pass
+                items, self.outbox = self.outbox, []
+                self.has_output.clear()
+                self.batch_full.clear()
+                await self.ws.send(msgpack.packb({"type": "Batch", "items": items}, use_bin_type=True))
+        except websockets.exceptions.ConnectionClosed as e:
+            logger.error(f"Mux connection to {self.uri} closed while sending: {e}")
+        finally:
+            await self._shutdown()
+
+    async def _read_loop(self):
+        try:
+            async for message in self.ws:
+                batch = msgpack.unpackb(message, raw=False)
+                for item in batch.get("items", []):
+                    if item.get("op") == "close":
+                        # Forget the stream first so release() doesn't echo the close back
+                        stream = self.streams.pop(item.get("sid"), None)
+                        if stream is not None:
+                            await stream.close()
+                        continue
+                    stream = self.streams.get(item.get("sid"))
+                    if stream is not None and "msg" in item:
+                        stream.queue.put_nowait(item["msg"])
+        except websockets.exceptions.ConnectionClosed as e:
+            logger.error(f"Mux connection to {self.uri} lost: {e}")
+        finally:
+            await self._shutdown()
+
+    async def _shutdown(self):
+        if self.closed:
+            return
+        self.closed = True
+        # Ending every stream's iteration sends its session into failover
+        for stream in list(self.streams.values()):
+            stream.closed = True
+            stream.queue.put_nowait(None)
+        self.streams.clear()
+        # Runs from the writer or reader's finally; cancelling that task would abort the close
+        for task in (self.writer, self.reader):
+            if task is not asyncio.current_task():
+                task.cancel()
+        await self.ws.close()
+
+class MuxPool:
+    """
+    Hands out streams on shared connections, opening a new connection per backend
+    only when the existing ones are full. Backends that don't have the mux endpoint
+    (404, 426) are remembered so sessions go straight to a direct connection next
+    time; any other refusal only sends this session direct.
+    """
+    def __init__(self):
+        self.connections = {}
+        self.unsupported = set()
+        self.locks = {}
+
+    async def open_stream(self, uri: str, headers: dict) -> MuxStream | None:
+        if uri in self.unsupported:
+            return None
+        async with self.locks.setdefault(uri, asyncio.Lock()):
+            conns = [c for c in self.connections.get(uri, []) if not c.closed]
+            self.connections[uri] = conns
+            for conn in conns:
+                if len(conn.streams) < MUX_STREAMS_PER_CONNECTION:
+                    return conn.open_stream()
+            try:
+                ws = await websockets.connect(uri, additional_headers=headers)
+            except websockets.exceptions.InvalidStatus as e:
+                if e.response.status_code not in (404, 426):
+                    logger.warning(f"Mux connection to {uri} refused ({e}); using a direct connection")
+                    return None
+                logger.warning(f"Backend {uri} does not support multiplexing ({e}); using direct connections")
+                self.unsupported.add(uri)
+                return None
+            conn = MuxConnection(uri, ws)
+            conns.append(conn)
+            logger.info(f"Opened mux connection #{len(conns)} to {uri}")
+            return conn.open_stream()
+
+pool = MuxPool()
@@ -0,0 +1,243 @@
+"""
+Admin-only profiling endpoints for the running service.
+
+    GET  /debug/profile/cpu?seconds=10    wall-clock stack samples of every thread, in
+                                          folded format (flamegraph.pl, speedscope)
+    POST /debug/profile/torch?batches=5   torch profiler trace of the next K embed
+                                          batches, as a Chrome trace (chrome://tracing, Perfetto)
+    GET  /debug/asyncio/tasks             every asyncio task with its stack, plus event-loop lag
+    GET  /debug/loop/stalls               recent event-loop stalls caught by the watchdog, with stacks
+    GET  /debug/heap?seconds=30           tracemalloc snapshot: top allocation sites, or the
+                                          raw dump (?raw=true) for tracemalloc.Snapshot.load()
+
+All of them take the admin bearer token and answer with a file download.
+"""
+import asyncio
+import io
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from hyperstack import get_admin_user
+import loopwatch
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(dependencies=[Depends(get_admin_user)])
+
+# --- Configuration ---
+# Start tracemalloc at import so heap snapshots cover allocations since startup.
+# Costs noticeable CPU and memory, so it's off unless asked for.
+TRACEMALLOC_FRAMES = int(os.environ.get("PROFILING_TRACEMALLOC_FRAMES", 0))
+MAX_CPU_PROFILE_SECONDS = 120
+MAX_TORCH_WAIT_SECONDS = 300
+
+if TRACEMALLOC_FRAMES:
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+
+_cpu_profile_lock = asyncio.Lock()
+_heap_lock = asyncio.Lock()
+
+def attachment(content, filename: str, media_type: str = "text/plain") -> Response:
+    return Response(content, media_type=media_type,
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+def timestamp() -> str:
+    return time.strftime("%Y%m%d-%H%M%S")
+
+# --- CPU sampling ---
+def sample_stacks(seconds: float, interval: float) -> Counter:
+    """
+    Samples the stack of every other thread every `interval` seconds. Wall-clock,
+    not CPU time: an idle event loop shows up under its selector call.
+    """
+    me = threading.get_ident()
+    counts = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return counts
+
+@router.get("/profile/cpu")
+async def profile_cpu(seconds: float = Query(10, gt=0, le=MAX_CPU_PROFILE_SECONDS),
+                      interval_ms: float = Query(5, ge=1, le=1000)):
+    if _cpu_profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A CPU profile is already running.")
+    async with _cpu_profile_lock:
+        logger.warning(f"Admin CPU profile: sampling all threads for {seconds}s every {interval_ms}ms")
+        counts = await asyncio.to_thread(sample_stacks, seconds, interval_ms / 1000)
+    folded = "".join(f"{stack} {n}\n" for stack, n in counts.most_common())
+    return attachment(folded, f"cpu-{timestamp()}.folded")
+
+# --- Torch profiler ---
+class TorchCapture:
+    """Profiles the next `batches` embed batches, then writes a Chrome trace."""
+    def __init__(self, batches: int):
+        self.profiler = None
+        self.remaining = batches
+        self.done = threading.Event()
+        self.trace_path = None
+        self.lock = threading.Lock()
+
+    def begin_batch(self):
+        # Created here rather than in __init__: kineto wants the profiler set up on
+        # the thread that runs the batches (the embed-scheduler worker), not the one
+        # that armed it.
+        with self.lock:
+            if self.profiler is None:
+                import torch
+                activities = [torch.profiler.ProfilerActivity.CPU]
+                if torch.cuda.is_available():
+                    activities.append(torch.profiler.ProfilerActivity.CUDA)
+                self.profiler = torch.profiler.profile(activities=activities, record_shapes=True, profile_memory=True)
+                self.profiler.start()
+
+    def end_batch(self):
+        with self.lock:
+            self.remaining -= 1
+            if self.remaining > 0 or self.done.is_set():
+                return
+            self.profiler.stop()
+            fd, self.trace_path = tempfile.mkstemp(prefix="torch-trace-", suffix=".json")
+            os.close(fd)
+            self.profiler.export_chrome_trace(self.trace_path)
+            self.done.set()
+
+    def cancel(self):
+        with self.lock:
+            if self.profiler is not None and not self.done.is_set():
+                self.profiler.stop()
+            self.done.set()
+
+_torch_capture: TorchCapture | None = None
+
+@contextmanager
+def embed_batch():
+    """Wraps one embed batch; a no-op unless a torch capture is armed."""
+    capture = _torch_capture
+    if capture is None or capture.done.is_set():
+        yield
+        return
+    capture.begin_batch()
+    try:
+        yield
+    finally:
+        capture.end_batch()
+
+@router.post("/profile/torch")
+async def profile_torch(batches: int = Query(5, ge=1, le=100),
+                        timeout: float = Query(60, gt=0, le=MAX_TORCH_WAIT_SECONDS)):
+    global _torch_capture
+    if _torch_capture is not None and not _torch_capture.done.is_set():
+        raise HTTPException(status_code=409, detail="A torch profile is already armed.")
+    capture = _torch_capture = TorchCapture(batches)
+    logger.warning(f"Admin torch profile: armed for the next {batches} embed batches")
+    if not await asyncio.to_thread(capture.done.wait, timeout):
+        capture.cancel()
+        raise HTTPException(status_code=408, detail=f"Fewer than {batches} embed batches arrived within {timeout}s.")
+    try:
+        with open(capture.trace_path, "rb") as f:
+            trace = f.read()
+    finally:
+        os.remove(capture.trace_path)
+    return attachment(trace, f"torch-{timestamp()}.json", media_type="application/json")
+
+# --- asyncio ---
+async def measure_loop_lag(seconds: float, interval: float = 0.01) -> dict:
+    """How late the loop runs a sleep(interval) callback, sampled for `seconds`."""
+    loop = asyncio.get_running_loop()
+    lags = []
+    deadline = loop.time() + seconds
+    while loop.time() < deadline:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(loop.time() - started - interval)
+    lags_ms = np.maximum(np.array(lags), 0) * 1000
+    return {"samples": len(lags), "p50_ms": np.percentile(lags_ms, 50), "p99_ms": np.percentile(lags_ms, 99),
+            "max_ms": lags_ms.max()}
+
+def format_tasks() -> str:
+    out = io.StringIO()
+    tasks = sorted(asyncio.all_tasks(), key=lambda t: t.get_name())
+    out.write(f"{len(tasks)} tasks\n")
+    for task in tasks:
+        out.write(f"\n--- {task.get_name()} ({'done' if task.done() else 'pending'}) {task.get_coro()!r}\n")
+        task.print_stack(limit=20, file=out)
+    return out.getvalue()
+
+@router.get("/asyncio/tasks")
+async def asyncio_tasks(lag_seconds: float = Query(1.0, ge=0, le=30)):
+    dump = format_tasks()
+    header = loopwatch.watchdog.summary() if loopwatch.watchdog else ""
+    if lag_seconds:
+        lag = await measure_loop_lag(lag_seconds)
+        header += (f"event loop lag over {lag_seconds}s ({lag['samples']} samples): p50 {lag['p50_ms']:.2f} ms, "
+                  f"p99 {lag['p99_ms']:.2f} ms, max {lag['max_ms']:.2f} ms\n")
+    return attachment(header + dump, f"asyncio-tasks-{timestamp()}.txt")
+
+@router.get("/loop/stalls")
+async def loop_stalls():
+    if loopwatch.watchdog is None:
+        raise HTTPException(status_code=404, detail="The event loop watchdog is disabled.")
+    stalls = list(loopwatch.watchdog.stalls)
+    body = loopwatch.watchdog.summary() + "".join(f"\n{stall.format()}" for stall in reversed(stalls))
+    return attachment(body, f"loop-stalls-{timestamp()}.txt")
+
+# --- Heap ---
+@router.get("/heap")
+async def heap_snapshot(seconds: float = Query(30, ge=0, le=600), top: int = Query(50, ge=1, le=1000),
+                        raw: bool = False):
+    """
+    With PROFILING_TRACEMALLOC_FRAMES set, snapshots immediately. Otherwise traces
+    allocations for `seconds` and snapshots what is still alive at the end.
+    """
+    if _heap_lock.locked():
+        raise HTTPException(status_code=409, detail="A heap snapshot is already running.")
+    async with _heap_lock:
+        started_here = not tracemalloc.is_tracing()
+        if started_here:
+            logger.warning(f"Admin heap snapshot: tracing allocations for {seconds}s")
+            tracemalloc.start(10)
+            await asyncio.sleep(seconds)
+        try:
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            if started_here:
+                tracemalloc.stop()
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+    if raw:
+        fd, path = tempfile.mkstemp(prefix="heap-", suffix=".tracemalloc")
+        os.close(fd)
+        try:
+            snapshot.dump(path)
+            with open(path, "rb") as f:
+                return attachment(f.read(), f"heap-{timestamp()}.tracemalloc", "application/octet-stream")
+        finally:
+            os.remove(path)
+
+    stats = snapshot.statistics("traceback")
+    out = io.StringIO()
+    out.write(f"{sum(s.size for s in stats) / 2**20:.1f} MiB in {sum(s.count for s in stats)} blocks traced\n")
+    for stat in stats[:top]:
+        out.write(f"\n{stat.size / 1024:.1f} KiB in {stat.count} blocks\n")
+        out.write("\n".join(stat.traceback.format(limit=10)) + "\n")
+    return attachment(out.getvalue(), f"heap-{timestamp()}.txt")
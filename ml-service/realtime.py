@@ -3,7 +3,20 @@ import logging
 import asyncio
 import msgpack
 import websockets
+import itertools
 import json
+import os
+import time
+from collections import deque
+import numpy as np
+from fastapi import Depends
+import admission
+import audio
+import broadcast
+import cpu_asr
+import metrics
+import mux
+import tracing
 import hyperstack # <-- Import the hyperstack module
 
 logging.basicConfig(level=logging.INFO)
@@ -22,38 +35,415 @@ async def websocket_helloworld(websocket: WebSocket):
     except Exception as e:
         print(f'connection close ws-helloworld, error {e}')
         
+# --- Backend connection and failover configuration ---
+KYUTAI_PORT = 8080
+KYUTAI_PATH = "/api/asr-streaming"
+KYUTAI_HEADERS = {"kyutai-api-key": "public_token"}
+SAMPLE_RATE = 24000
+FAILOVER_BUFFER_SECONDS = float(os.environ.get("REALTIME_FAILOVER_BUFFER_SECONDS", 2.0))
+FAILOVER_MAX_ATTEMPTS = int(os.environ.get("REALTIME_FAILOVER_MAX_ATTEMPTS", 3))
+FAILOVER_RETRY_DELAY = float(os.environ.get("REALTIME_FAILOVER_RETRY_DELAY", 0.5))
+# Comma-separated host:port list that bypasses Hyperstack entirely, e.g. for a
+# local fake backend when load testing. Sessions are spread over it round-robin.
+STATIC_BACKENDS = [b.strip() for b in os.environ.get("REALTIME_STATIC_BACKENDS", "").split(",") if b.strip()]
+# While the GPU is cold, sessions run on in-process CPU ASR (cpu_asr.py) under this
+# pseudo-backend name and are handed to a GPU backend once one is ready.
+CPU_BACKEND = "cpu"
+WARMING_STATUSES = ("now_spinning_up", "already_deploying", "ip_assigned_service_not_ready")
+CPU_HANDOFF_POLL_SECONDS = float(os.environ.get("REALTIME_CPU_HANDOFF_POLL_SECONDS", 5.0))
+# Words from replayed audio that start this close to (or before) the last word
+# already sent to the client are treated as duplicates and dropped.
+REPLAY_DEDUP_MARGIN = 0.1
+
+_static_rotation = itertools.count()
+
+async def get_backend_status() -> dict:
+    with tracing.span("realtime.get_backend_status", static=bool(STATIC_BACKENDS)) as s:
+        if STATIC_BACKENDS:
+            ip = STATIC_BACKENDS[next(_static_rotation) % len(STATIC_BACKENDS)]
+            result = {"status": "success", "message": "Using a static backend.", "ip_address": ip}
+        else:
+            result = await hyperstack.get_service_status()
+        s.set_attribute("status", result.get("status"))
+        return result
+
+async def find_ready_backends(exclude=()) -> list:
+    if STATIC_BACKENDS:
+        return [b for b in STATIC_BACKENDS if b not in exclude]
+    return await hyperstack.find_ready_backends(exclude=exclude)
+
+# Per-backend session caps, and the queue for sessions waiting on one
+admission_control = admission.AdmissionController(find_ready_backends, get_backend_status)
+
+async def connect_backend(ip: str):
+    """
+    Opens a stream to the backend: a tagged stream on a shared connection when
+    multiplexing is enabled and the backend supports it, otherwise a dedicated websocket.
+    """
+    host = ip if ":" in ip or ip == CPU_BACKEND else f"{ip}:{KYUTAI_PORT}"
+    with metrics.REALTIME_BACKEND_CONNECT_SECONDS.time(), \
+            tracing.span("realtime.connect_backend", kind=tracing.KIND_CLIENT, backend=host) as s:
+        if ip == CPU_BACKEND:
+            stream = await cpu_asr.open_stream()
+            if stream is None:
+                raise ConnectionRefusedError("CPU ASR is unavailable or at capacity")
+            return stream
+        if mux.MUX_PATH:
+            stream = await mux.pool.open_stream(f"ws://{host}{mux.MUX_PATH}", KYUTAI_HEADERS)
+            if stream is not None:
+                s.set_attribute("mux", True)
+                return stream
+        return await websockets.connect(
+            f"ws://{host}{KYUTAI_PATH}",
+            additional_headers=KYUTAI_HEADERS
+        )
+
+_FRAMES = {d: metrics.REALTIME_FRAMES.labels(d) for d in ("client_in", "backend_out", "backend_in", "client_out")}
+_BYTES = {d: metrics.REALTIME_BYTES.labels(d) for d in _FRAMES}
+
+def count_frame(direction: str, size: int):
+    _FRAMES[direction].inc()
+    _BYTES[direction].inc(size)
+
+class TranscriptionSession:
+    """
+    Proxies one client websocket to a Kyutai backend.
+
+    Incoming audio is gated by an optional VAD so silence doesn't occupy the GPU.
+    A rolling buffer of the most recently forwarded PCM is kept so that if the
+    backend dies mid-session the stream can be replayed onto another healthy
+    backend. Timestamps coming back from the backend are mapped onto the
+    client's timeline, and words already emitted from replayed audio are dropped.
+    """
+    def __init__(self, websocket: WebSocket, ip: str, rust_ws, normalizer: audio.AudioNormalizer):
+        self.websocket = websocket
+        self.normalizer = normalizer
+        self.ip = ip
+        self.rust_ws = rust_ws
+        self.backend_ready = asyncio.Event()
+        self.backend_ready.set()
+        self.client_closed = False
+
+        self.vad = audio.EnergyVAD(SAMPLE_RATE)
+        self.timeline = audio.Timeline()
+
+        # (client_start_sample, pcm) pairs of audio forwarded to the backend
+        self.pcm_buffer = deque()
+        self.buffered_samples = 0
+        self.samples_total = 0
+
+        # End of the replayed audio on the current backend's own timeline (seconds)
+        self.replay_until = 0.0
+        self.last_word_start = float("-inf")
+        self.seen_ready = False
+        self.failovers = []
+        # (ip, connection) of a GPU backend waiting to take over from CPU ASR
+        self.handoff_to = None
+        # This session's admission slot; none while on CPU ASR
+        self.ticket = None
+        # Read-only viewers of this session's transcript, if it publishes one
+        self.channel = None
+
+    def _buffer_pcm(self, client_start: int, pcm: np.ndarray):
+        self.pcm_buffer.append((client_start, pcm))
+        self.buffered_samples += pcm.size
+        max_samples = int(FAILOVER_BUFFER_SECONDS * SAMPLE_RATE)
+        while self.pcm_buffer and self.buffered_samples - self.pcm_buffer[0][1].size >= max_samples:
+            _, dropped = self.pcm_buffer.popleft()
+            self.buffered_samples -= dropped.size
+
+    async def _send_pcm(self, client_start: int, pcm: np.ndarray):
+        self.timeline.add(client_start, pcm.size)
+        chunk = { 'type': 'Audio', 'pcm': pcm.tolist() }
+        msg = msgpack.packb(chunk, use_bin_type=True, use_single_float=True)
+        await self.rust_ws.send(msg)
+        count_frame("backend_out", len(msg))
+
+    def _rebase(self, data: dict) -> bool:
+        """
+        Shifts backend timestamps onto the client timeline. Returns False for
+        messages that should not be forwarded to the client.
+        """
+        msg_type = data.get("type")
+        if msg_type == "Ready":
+            if self.seen_ready:
+                return False
+            self.seen_ready = True
+        elif msg_type == "Word":
+            backend_start = data.get("start_time", 0.0)
+            start = self._to_client_time(backend_start)
+            if backend_start < self.replay_until and start <= self.last_word_start + REPLAY_DEDUP_MARGIN:
+                return False
+            data["start_time"] = start
+            self.last_word_start = start
+        elif msg_type == "EndWord":
+            data["stop_time"] = self._to_client_time(data.get("stop_time", 0.0))
+        return True
+
+    def _to_client_time(self, backend_time: float) -> float:
+        return self.timeline.to_client(backend_time * SAMPLE_RATE) / SAMPLE_RATE
+
+    async def client_to_rust(self):
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+
+                # Binary frames are raw PCM in the session's declared format
+                if message.get("bytes") is not None:
+                    count_frame("client_in", len(message["bytes"]))
+                    frame = self.normalizer.from_bytes(message["bytes"])
+                else:
+                    count_frame("client_in", len(message["text"]))
+                    client_msg = json.loads(message["text"])
+                    # logger.info(f'received data from client: {client_msg.keys()}') # Optional: can be noisy
+                    if client_msg['type'] != 'Audio':
+                        continue
+                    frame = self.normalizer.from_list(client_msg['pcm'])
+                if frame.size:
+                    await self._forward(frame)
+        except WebSocketDisconnect:
+            logger.info('Client disconnected from our server.')
+        except Exception as e:
+            logger.error(f'client->rust error: {e}')
+        finally:
+            self.client_closed = True
+            await self.rust_ws.close()
+
+    async def _forward(self, frame: np.ndarray):
+        client_start = self.samples_total
+        self.samples_total += frame.size
+        for start, pcm in self.vad.process(frame, client_start):
+            self._buffer_pcm(start, pcm)
+            # While failing over, frames are only buffered; the replay picks them up.
+            if self.backend_ready.is_set():
+                try:
+                    await self._send_pcm(start, pcm)
+                except websockets.exceptions.ConnectionClosed:
+                    # rust_to_client notices the dead backend and fails over
+                    self.backend_ready.clear()
+
+    async def rust_to_client(self):
+        while True:
+            try:
+                async for message in self.rust_ws:
+                    count_frame("backend_in", len(message))
+                    data = msgpack.unpackb(message, raw=False)
+                    if self._rebase(data):
+                        text = json.dumps(data)
+                        if self.channel is not None:
+                            self.channel.publish(data.get("type"), text)
+                        await self.websocket.send_text(text)
+                        count_frame("client_out", len(text))
+            except websockets.exceptions.ConnectionClosed as e:
+                if not self.client_closed:
+                    logger.error(f'Backend {self.ip} connection lost: {e}')
+            except Exception as e:
+                logger.error(f'Rust->client error: {e}')
+                return
+            if self.client_closed:
+                if self.handoff_to is not None:
+                    await self.handoff_to[1].close()
+                return
+            if self.handoff_to is not None:
+                # The CPU stream has flushed its last words; carry on from the GPU.
+                await self._take_over()
+                continue
+            with tracing.span("realtime.failover", failed_backend=self.ip) as s:
+                recovered = await self.failover()
+                s.set_attribute("backend", self.ip)
+                s.set_attribute("recovered", recovered)
+            if not recovered:
+                await self.websocket.send_text(json.dumps({
+                    "type": "Error",
+                    "status": "backend_failover_failed",
+                    "message": "Lost the transcription backend and could not reconnect."
+                }))
+                await self.websocket.close()
+                return
+
+    async def failover(self) -> bool:
+        """
+        Reconnects to a healthy backend (preferring one other than the failed
+        one) and replays the buffered audio. A new backend is only tried with
+        an admission slot on it, which replaces the session's old one. Returns
+        False if no backend could be reached.
+        """
+        self.backend_ready.clear()
+        started = time.monotonic()
+        failed_ip = self.ip
+        for attempt in range(1, FAILOVER_MAX_ATTEMPTS + 1):
+            # Moving to another GPU takes an admission slot like any new session
+            ticket = await admission_control.try_admit(avoid={failed_ip})
+            candidates = [ticket.ip] if ticket is not None else []
+            # the old backend may only have dropped this one connection
+            if failed_ip not in candidates:
+                candidates.append(failed_ip)
+            for ip in candidates:
+                try:
+                    rust_ws = await connect_backend(ip)
+                except Exception as e:
+                    logger.warning(f'Failover attempt {attempt}: could not connect to {ip}: {e}')
+                    continue
+                if ticket is not None and ip != ticket.ip:
+                    admission_control.release(ticket)  # the new backend didn't answer; back where we were
+                    ticket = None
+                if self.client_closed:
+                    if ticket is not None:
+                        admission_control.release(ticket)
+                    await rust_ws.close()
+                    return True
+                self.ip, self.rust_ws = ip, rust_ws
+                if ticket is not None:
+                    if self.ticket is not None:
+                        admission_control.release(self.ticket)
+                    self.ticket, ticket.session = ticket, self
+                await self._replay()
+                elapsed = time.monotonic() - started
+                self.failovers.append(elapsed)
+                metrics.REALTIME_FAILOVER_SECONDS.observe(elapsed)
+                metrics.REALTIME_FAILOVERS.labels("success").inc()
+                logger.info(f'Failed over from {failed_ip} to {ip} in {elapsed * 1000:.0f} ms '
+                            f'(replayed {self.replay_until:.2f}s of audio)')
+                return True
+            if ticket is not None:
+                admission_control.release(ticket)
+            await asyncio.sleep(FAILOVER_RETRY_DELAY)
+        logger.error(f'Failover from {failed_ip} gave up after {FAILOVER_MAX_ATTEMPTS} attempts')
+        metrics.REALTIME_FAILOVERS.labels("failed").inc()
+        return False
+
+    async def watch_for_gpu(self):
+        """
+        While on CPU ASR, waits for a free slot on a GPU backend and hands the
+        session to it. Stops once the session is off CPU some other way (a failover).
+        """
+        while not self.client_closed and self.ip == CPU_BACKEND:
+            await asyncio.sleep(CPU_HANDOFF_POLL_SECONDS)
+            if not self.backend_ready.is_set():
+                continue  # failing over; that may take the session off CPU itself
+            ticket = await admission_control.try_admit()
+            if ticket is None:
+                continue
+            ip = ticket.ip
+            try:
+                rust_ws = await connect_backend(ip)
+            except Exception as e:
+                admission_control.release(ticket)
+                logger.warning(f"GPU backend {ip} is ready but connecting failed, staying on CPU: {e}")
+                continue
+            if self.client_closed or self.ip != CPU_BACKEND or not self.backend_ready.is_set():
+                admission_control.release(ticket)
+                await rust_ws.close()
+                return
+            self.ticket = ticket
+            self.handoff_to = (ip, rust_ws)
+            # Buffer new audio from here on, and let the CPU stream flush and end.
+            self.backend_ready.clear()
+            await self.rust_ws.close()
+            return
+
+    async def _take_over(self):
+        ip, rust_ws = self.handoff_to
+        self.handoff_to = None
+        self.ip, self.rust_ws = ip, rust_ws
+        self.ticket.session = self
+        await self._replay()
+        metrics.REALTIME_CPU_HANDOFFS.inc()
+        logger.info(f"Handed session off from CPU ASR to {ip} after {self.samples_total / SAMPLE_RATE:.1f}s "
+                    f"(replayed {self.replay_until:.2f}s of audio)")
+
+    async def _replay(self):
+        self.timeline.reset()
+        sent_upto = -1
+        # Keep going until we've caught up with frames that arrived during the replay itself.
+        while True:
+            pending = [(s, pcm) for s, pcm in self.pcm_buffer if s > sent_upto]
+            if not pending:
+                break
+            for s, pcm in pending:
+                await self._send_pcm(s, pcm)
+                sent_upto = s
+        self.replay_until = self.timeline.backend_samples / SAMPLE_RATE
+        self.backend_ready.set()
+
+    async def run(self):
+        watcher = asyncio.create_task(self.watch_for_gpu()) if self.ip == CPU_BACKEND else None
+        try:
+            await asyncio.gather(self.client_to_rust(), self.rust_to_client())
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            if self.vad.mode != "off":
+                logger.info(f"VAD ({self.vad.mode}) forwarded {self.vad.counters['frames_forwarded']} "
+                            f"and suppressed {self.vad.counters['frames_suppressed']} frames this session")
+
 @router.websocket("/ws-kyutai-tts")
 async def websocket_kyutai_tts(websocket: WebSocket):
+    # Browsers can't set headers on a websocket, so trace context may also come as a query parameter.
+    traceparent = websocket.headers.get("traceparent") or websocket.query_params.get("traceparent")
+    with tracing.span("realtime.session", traceparent=traceparent, kind=tracing.KIND_SERVER):
+        await serve_client(websocket)
+
+async def serve_client(websocket: WebSocket):
+    session_span = tracing.current_span()
     await websocket.accept()
     logger.info("New TTS client connected. Checking for available service...")
 
-    # --- NEW: Use hyperstack to get service status ---
-    status_result = await hyperstack.get_service_status()
-    
-    # If the status is not 'success', inform the client and close the connection.
-    if status_result.get("status") != "success":
-        logger.warning(f"Service not ready. Status: {status_result.get('status')}. Informing client.")
+    # Clients declare what they capture; we resample/downmix to what the backend expects.
+    params = websocket.query_params
+    try:
+        normalizer = audio.AudioNormalizer(
+            sample_rate=int(params.get("sample_rate", SAMPLE_RATE)),
+            out_rate=SAMPLE_RATE,
+            channels=int(params.get("channels", 1)),
+            sample_format=params.get("format", "f32"),
+        )
+    except ValueError as e:
         await websocket.send_text(json.dumps({
             "type": "Error",
-            "status": status_result.get("status"),
-            "message": status_result.get("message")
+            "status": "invalid_audio_format",
+            "message": str(e)
         }))
         await websocket.close()
         return
 
-    # If we get here, the service is ready.
-    ip = status_result["ip_address"]
+    # A free slot on a ready backend, from the shared (cached) status
+    ticket = await admission_control.try_admit()
+    status_result = admission_control.status
+    session_span.set_attribute("backend_status", status_result.get("status"))
+    ip = ticket.ip if ticket is not None else None
+
+    # While a GPU is still coming up, start on CPU ASR if we can.
+    if ticket is None and status_result.get("status") in WARMING_STATUSES and cpu_asr.available():
+        try:
+            rust_ws = await connect_backend(CPU_BACKEND)
+            ip = CPU_BACKEND
+            logger.info("No GPU backend ready yet; starting the session on CPU ASR.")
+        except ConnectionRefusedError as e:
+            logger.warning(f"Could not start on CPU ASR: {e}")
+
+    # Otherwise hold the connection open in the admission queue until a backend has room.
+    if ip is None:
+        logger.info(f"No backend slot free (status {status_result.get('status')}); queueing the session.")
+        with tracing.span("realtime.admission_wait") as s:
+            ticket = await wait_for_admission(websocket)
+            s.set_attribute("admitted", ticket is not None)
+        if ticket is None:
+            return
+        ip = ticket.ip
+
     logger.info(f"Service is ready at {ip}. Attempting to connect...")
     
     try:
-        headers = { "kyutai-api-key": "public_token" }
-        rust_ws = await websockets.connect(
-                    f"ws://{ip}:8080/api/asr-streaming",
-                    additional_headers=headers
-                )
+        if ip != CPU_BACKEND:
+            rust_ws = await connect_backend(ip)
         logger.info(f"Successfully connected to backend Kyutai service at {ip}")
     except Exception as e:
         logger.error(f'Failed to connect to kyutai: error: {e}')
+        if ticket is not None:
+            admission_control.release(ticket)
         # Inform the client about the connection failure
         await websocket.send_text(json.dumps({
             "type": "Error",
@@ -63,36 +453,74 @@ async def websocket_kyutai_tts(websocket: WebSocket):
         await websocket.close()
         return
 
-    # --- The rest of the logic remains the same ---
-    async def client_to_rust():
-        try:
-            while True:
-                data = await websocket.receive_text()
-                client_msg = json.loads(data)
-                # logger.info(f'received data from client: {client_msg.keys()}') # Optional: can be noisy
-
-                if client_msg['type'] == 'Audio':
-                    chunk = { 'type': 'Audio', 'pcm': client_msg['pcm'] }
-                    msg = msgpack.packb(chunk, use_bin_type=True, use_single_float=True)
-                    await rust_ws.send(msg)
-        except WebSocketDisconnect:
-            logger.info('Client disconnected from our server.')
-        except Exception as e:
-            logger.error(f'client->rust error: {e}')
-
-    async def rust_to_client():
-        try:
-            async for message in rust_ws:
-                data = msgpack.unpackb(message, raw=False)
-                await websocket.send_text(json.dumps(data))
-        except Exception as e:
-            logger.error(f'Rust->client error: {e}')
-
+    session = TranscriptionSession(websocket, ip, rust_ws, normalizer)
+    if ticket is not None:
+        ticket.session = session
+        session.ticket = ticket
+    session_span.set_attribute("backend", ip)
+    if params.get("publish") in ("1", "true"):
+        session.channel = broadcast.open_channel()
+        await websocket.send_text(json.dumps({"type": "Published", "channel": session.channel.id}))
+    metrics.REALTIME_ACTIVE_SESSIONS.inc()
     try:
-        await asyncio.gather(client_to_rust(), rust_to_client())
+        with tracing.span("realtime.stream"):
+            await session.run()
     finally:
+        session_span.set_attribute("failovers", len(session.failovers))
+        metrics.REALTIME_ACTIVE_SESSIONS.dec()
+        if session.channel is not None:
+            broadcast.close_channel(session.channel)
+        if session.ticket is not None:
+            admission_control.release(session.ticket)
         logger.info("Closing connection to backend Kyutai service.")
-        await rust_ws.close()
+        await session.rust_ws.close()
+
+@router.websocket("/ws-kyutai-tts/{channel_id}/subscribe")
+async def websocket_kyutai_tts_subscribe(websocket: WebSocket, channel_id: str):
+    await websocket.accept()
+    await broadcast.serve(websocket, channel_id)
+
+async def wait_for_admission(websocket: WebSocket) -> admission.Ticket | None:
+    """
+    Queues the session, pushing Queued messages to the client, until it gets a
+    backend slot. Returns None (having told the client and closed) if the
+    queue is full or the wait times out, or if the client leaves.
+    """
+    async def push(message: dict):
+        await websocket.send_text(json.dumps(message))
+
+    async def until_disconnect():
+        # Audio sent while queued is dropped: clients should start streaming on Ready
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    waiting = asyncio.create_task(admission_control.wait(push))
+    watching = asyncio.create_task(until_disconnect())
+    await asyncio.wait({waiting, watching}, return_when=asyncio.FIRST_COMPLETED)
+    watching.cancel()
+    if not waiting.done():
+        logger.info("Client left the admission queue.")
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        return None
+    try:
+        ticket = waiting.result()
+    except admission.QueueFull:
+        error = {"status": "queue_full", "message": "Too many sessions are waiting for a backend; try again later."}
+    except Exception as e:
+        logger.info(f"Client went away while queued: {type(e).__name__}")
+        return None
+    else:
+        if ticket is not None:
+            return ticket
+        error = {"status": "queue_timeout", "message": "No transcription backend became available in time."}
+    await websocket.send_text(json.dumps({"type": "Error", **error}))
+    await websocket.close()
+    return None
+
+@router.get("/admission", dependencies=[Depends(hyperstack.get_admin_user)])
+async def get_admission():
+    return admission_control.to_dict()
 
 from fastapi.responses import HTMLResponse
 
@@ -221,9 +649,14 @@ async def get_frontend():
                             }
                         });
                         
+                        // Browsers may ignore the requested rate, so declare the real one
+                        this.audioContext = new AudioContext({ sampleRate: 24000 });
+                        const sampleRate = this.audioContext.sampleRate;
+
                         // Set up WebSocket
                         const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-                        this.ws = new WebSocket(`${protocol}//${window.location.host}/realtime/ws-kyutai-tts`);
+                        this.ws = new WebSocket(`${protocol}//${window.location.host}/realtime/ws-kyutai-tts?sample_rate=${sampleRate}`);
+                        this.ws.binaryType = 'arraybuffer';
                         
                         this.ws.onopen = () => {
                             this.updateStatus('Connected', true);
@@ -246,7 +679,6 @@ async def get_frontend():
                         };
                         
                         // Set up audio processing
-                        this.audioContext = new AudioContext({ sampleRate: 24000 });
                         const source = this.audioContext.createMediaStreamSource(stream);
                         
                         // Use ScriptProcessorNode for audio processing
@@ -255,12 +687,8 @@ async def get_frontend():
                         processor.onaudioprocess = (event) => {
                             if (this.ws && this.ws.readyState === WebSocket.OPEN) {
                                 const inputBuffer = event.inputBuffer.getChannelData(0);
-                                const audioData = Array.from(inputBuffer);
-                                
-                                this.ws.send(JSON.stringify({
-                                    type: 'Audio',
-                                    pcm: audioData
-                                }));
+                                // Raw float32 frames; much smaller than a JSON number array
+                                this.ws.send(new Float32Array(inputBuffer).buffer);
                             }
                         };
                         
@@ -312,6 +740,11 @@ async def get_frontend():
                     if (data.type === 'Word') {
                         this.transcript.textContent += data.text + ' ';
                         this.transcript.scrollTop = this.transcript.scrollHeight;
+                    } else if (data.type === 'Queued') {
+                        const eta = data.eta_seconds != null ? `, about ${data.eta_seconds}s` : '';
+                        this.updateStatus(`Waiting for a transcription slot: #${data.position} in line${eta}`, false);
+                    } else if (data.type === 'Ready') {
+                        this.updateStatus('Connected', true);
                     } else if (data.type === 'Step') {
                         // Handle VAD predictions if needed
                         const pausePrediction = data.prs[2]; // Index 2 for 2.0 second predictions
@@ -0,0 +1,360 @@
+"""
+Bulk re-embedding of stored pictures, for model or preprocessing changes.
+
+Streams images from a directory or an S3-compatible bucket (MinIO works as a
+local stand-in), fetches and decodes them in a worker pool with a bounded
+prefetch window, embeds them in batches with the service's model and writes
+the vectors in chunks:
+
+    <out>/chunk-00000.npy        (n, dim) float16 or float32, L2-normalized
+    <out>/chunk-00000.keys.txt   the n image keys, one per line, same order
+    <out>/checkpoint.json        progress; a rerun resumes after the last full chunk
+
+Keys are processed in sorted order and the checkpoint records the last key
+behind the last committed chunk; a resumed run re-lists the source and
+continues after that key, so uploads or deletions in the meantime don't shift
+it. New keys sorting before that point are left for a fresh output. Chunk files are written to a temp name and
+renamed, so a crash never leaves a half-written chunk behind.
+
+As a service job (admin):
+    POST /reembed/jobs {"source": "/data/pictures", "output": "data/reembed/siglip-base"}
+    POST /reembed/jobs {"source": "s3://pictures/uploads/", "endpoint_url": "http://minio:9000", "output": ...}
+    GET  /reembed/jobs/{job_id}
+    POST /reembed/jobs/{job_id}/cancel
+
+Or from ml-service/, loading the model in-process:
+    python -m reembed --source ~/photos --output data/reembed/test
+"""
+import argparse
+import bisect
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException
+from PIL import Image
+from pydantic import BaseModel
+from hyperstack import get_admin_user
+
+try:
+    import boto3
+except ImportError:
+    boto3 = None
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(dependencies=[Depends(get_admin_user)])
+
+# --- Configuration ---
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tif", ".tiff")
+BATCH_SIZE = int(os.environ.get("REEMBED_BATCH_SIZE", 32))
+CHUNK_SIZE = int(os.environ.get("REEMBED_CHUNK_SIZE", 4096))
+DECODE_WORKERS = int(os.environ.get("REEMBED_DECODE_WORKERS", min(8, os.cpu_count() or 1)))
+# Images fetched/decoded ahead of the model; bounds memory to roughly this many decoded images
+PREFETCH = int(os.environ.get("REEMBED_PREFETCH", 4 * BATCH_SIZE))
+THROUGHPUT_WINDOW_SECONDS = 30
+
+# Set by main.py: embed(list of PIL images) -> (n, dim) tensor, and the model's name
+_embed = None
+_model_name = None
+
+def configure(embed, model_name: str):
+    global _embed, _model_name
+    _embed, _model_name = embed, model_name
+
+# --- Sources ---
+class DirectorySource:
+    def __init__(self, path: str):
+        if not os.path.isdir(path):
+            raise ValueError(f"{path} is not a directory")
+        self.path = path
+
+    def describe(self) -> str:
+        return os.path.abspath(self.path)
+
+    def keys(self) -> list:
+        keys = []
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    keys.append(os.path.relpath(os.path.join(root, name), self.path))
+        return sorted(keys)
+
+    def read(self, key: str) -> bytes:
+        with open(os.path.join(self.path, key), "rb") as f:
+            return f.read()
+
+class S3Source:
+    """Any S3-compatible store; credentials come from the usual AWS_* environment variables."""
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: str | None = None):
+        if boto3 is None:
+            raise ValueError("S3 sources need boto3 (uv pip install boto3)")
+        self.bucket, self.prefix, self.endpoint_url = bucket, prefix, endpoint_url
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+
+    def describe(self) -> str:
+        return f"s3://{self.bucket}/{self.prefix}" + (f" at {self.endpoint_url}" if self.endpoint_url else "")
+
+    def keys(self) -> list:
+        keys = []
+        for page in self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=self.prefix):
+            keys.extend(o["Key"] for o in page.get("Contents", []) if o["Key"].lower().endswith(IMAGE_EXTENSIONS))
+        return sorted(keys)
+
+    def read(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+def open_source(source: str, endpoint_url: str | None = None):
+    if source.startswith("s3://"):
+        bucket, _, prefix = source[len("s3://"):].partition("/")
+        return S3Source(bucket, prefix, endpoint_url)
+    return DirectorySource(os.path.expanduser(source))
+
+# --- Output ---
+def write_atomic(path: str, write):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+class ChunkWriter:
+    def __init__(self, out_dir: str, dtype: str):
+        self.out_dir = out_dir
+        self.dtype = np.dtype(dtype)
+
+    def write(self, index: int, vectors: np.ndarray, keys: list):
+        base = os.path.join(self.out_dir, f"chunk-{index:05d}")
+        write_atomic(f"{base}.keys.txt", lambda f: f.write("".join(k + "\n" for k in keys).encode()))
+        # the .npy last: a chunk only counts once its vectors are in place
+        write_atomic(f"{base}.npy", lambda f: np.save(f, vectors.astype(self.dtype)))
+
+# --- Job ---
+class ReembedJob:
+    """
+    One pass over a source. Resumable: progress is committed per chunk to
+    checkpoint.json, and a new job on the same output continues from it.
+    """
+    def __init__(self, source, out_dir: str, batch_size: int = BATCH_SIZE, chunk_size: int = CHUNK_SIZE,
+                 dtype: str = "float16", workers: int = DECODE_WORKERS, prefetch: int = PREFETCH):
+        if _embed is None:
+            raise RuntimeError("reembed.configure() has not been called")
+        self.id = uuid.uuid4().hex[:12]
+        self.source = source
+        self.out_dir = out_dir
+        self.batch_size, self.chunk_size, self.dtype = batch_size, chunk_size, dtype
+        self.workers, self.prefetch = workers, max(prefetch, batch_size)
+        self.status = "pending"
+        self.error = None
+        self.total = 0
+        self.done = 0  # images committed, including earlier runs
+        self.embedded = 0  # images through the model in this run
+        self.failed = []  # (key, reason) for images that could not be read or decoded
+        self.started_at = None
+        self.finished_at = None
+        self.resumed_from = 0
+        self.cancelled = threading.Event()
+        self.recent = deque()  # (time, self.embedded) after each batch, for the windowed rate
+        self.thread = None
+
+    @property
+    def checkpoint_path(self) -> str:
+        return os.path.join(self.out_dir, "checkpoint.json")
+
+    def load_checkpoint(self) -> dict:
+        if not os.path.exists(self.checkpoint_path):
+            return {"chunks": 0, "last_key": None, "images": 0, "failed": []}
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("model") != _model_name:
+            raise ValueError(f"{self.out_dir} holds {checkpoint.get('model')} embeddings, not {_model_name}")
+        if checkpoint.get("source") != self.source.describe():
+            raise ValueError(f"{self.out_dir} was made from {checkpoint.get('source')}")
+        return checkpoint
+
+    def save_checkpoint(self, checkpoint: dict):
+        checkpoint.update({"model": _model_name, "source": self.source.describe(), "total": self.total,
+                           "chunk_size": self.chunk_size, "dtype": self.dtype, "updated_at": time.time()})
+        write_atomic(self.checkpoint_path, lambda f: f.write(json.dumps(checkpoint, indent=1).encode()))
+
+    def fetch_and_decode(self, key: str):
+        """Runs in the worker pool: returns (key, RGB image) or (key, error string)."""
+        try:
+            return key, Image.open(io.BytesIO(self.source.read(key))).convert("RGB")
+        except Exception as e:
+            return key, f"{type(e).__name__}: {e}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name=f"reembed-{self.id}", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        self.status, self.started_at = "running", time.time()
+        try:
+            self._run()
+            self.status = "cancelled" if self.cancelled.is_set() else "done"
+        except Exception as e:
+            logger.exception(f"Re-embed job {self.id} failed")
+            self.status, self.error = "failed", f"{type(e).__name__}: {e}"
+        self.finished_at = time.time()
+        logger.info(f"Re-embed job {self.id} {self.status}: {self.done}/{self.total} images, "
+                    f"{len(self.failed)} failed, {self.images_per_second():.1f} images/s")
+
+    def _run(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        checkpoint = self.load_checkpoint()
+        keys = self.source.keys()
+        self.total = len(keys)
+        last_key = checkpoint.get("last_key")
+        self.done = checkpoint["images"]
+        self.resumed_from = bisect.bisect_right(keys, last_key) if last_key is not None else 0
+        self.failed = [tuple(f) for f in checkpoint["failed"]]
+        writer = ChunkWriter(self.out_dir, self.dtype)
+        logger.info(f"Re-embed job {self.id}: {self.total} images in {self.source.describe()}, "
+                    f"starting at {self.resumed_from}")
+
+        chunk_vectors, chunk_keys, batch = [], [], []
+        pending = deque()
+        todo = iter(keys[self.resumed_from:])
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="reembed-decode") as pool:
+            # Keep `prefetch` fetch+decode tasks in flight; results are consumed in key order.
+            for key in todo:
+                pending.append(pool.submit(self.fetch_and_decode, key))
+                if len(pending) >= self.prefetch:
+                    break
+            while pending and not self.cancelled.is_set():
+                key, image = pending.popleft().result()
+                next_key = next(todo, None)
+                if next_key is not None:
+                    pending.append(pool.submit(self.fetch_and_decode, next_key))
+                last_key = key
+                if isinstance(image, str):
+                    self.failed.append((key, image))
+                else:
+                    batch.append((key, image))
+                last = not pending
+                if len(batch) >= self.batch_size or (last and batch):
+                    vectors = _embed([image for _, image in batch])
+                    chunk_vectors.append(vectors.float().cpu().numpy())
+                    chunk_keys.extend(k for k, _ in batch)
+                    self.embedded += len(batch)
+                    self.recent.append((time.monotonic(), self.embedded))
+                    batch = []
+                if len(chunk_keys) >= self.chunk_size or (last and chunk_keys):
+                    writer.write(checkpoint["chunks"], np.concatenate(chunk_vectors), chunk_keys)
+                    self.done += len(chunk_keys)
+                    checkpoint.update({"chunks": checkpoint["chunks"] + 1, "last_key": last_key,
+                                       "images": self.done, "failed": self.failed})
+                    self.save_checkpoint(checkpoint)
+                    chunk_vectors, chunk_keys = [], []
+            if self.cancelled.is_set():
+                for future in pending:
+                    future.cancel()
+        if not self.cancelled.is_set():
+            # Images that all failed after the last chunk still move the checkpoint to the end
+            checkpoint.update({"last_key": last_key, "failed": self.failed, "complete": True})
+            self.save_checkpoint(checkpoint)
+
+    def images_per_second(self, window: float | None = None) -> float:
+        """Images embedded per second in this run, overall or over the last `window` seconds."""
+        if not self.started_at:
+            return 0.0
+        if window:
+            now = time.monotonic()
+            while len(self.recent) > 2 and now - self.recent[1][0] > window:
+                self.recent.popleft()
+            if len(self.recent) < 2 or now - self.recent[-1][0] > window:
+                return 0.0
+            (t0, n0), (t1, n1) = self.recent[0], self.recent[-1]
+            return (n1 - n0) / (t1 - t0) if t1 > t0 else 0.0
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return self.embedded / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {"job_id": self.id, "status": self.status, "error": self.error, "source": self.source.describe(),
+                "output": self.out_dir, "model": _model_name, "total": self.total, "done": self.done,
+                "failed": len(self.failed), "resumed_from": self.resumed_from,
+                "images_per_second": round(self.images_per_second(), 1),
+                "recent_images_per_second": round(self.images_per_second(THROUGHPUT_WINDOW_SECONDS), 1),
+                "started_at": self.started_at, "finished_at": self.finished_at}
+
+jobs: dict[str, ReembedJob] = {}
+
+# --- Endpoints ---
+class JobRequest(BaseModel):
+    source: str  # directory, or s3://bucket/prefix
+    output: str
+    endpoint_url: str | None = None  # for S3-compatible stores other than AWS
+    batch_size: int = BATCH_SIZE
+    chunk_size: int = CHUNK_SIZE
+    dtype: str = "float16"
+
+@router.post("/jobs", status_code=202)
+async def start_job(request: JobRequest):
+    if request.dtype not in ("float16", "float32"):
+        raise HTTPException(status_code=422, detail="dtype must be float16 or float32.")
+    for job in jobs.values():
+        if job.status in ("pending", "running") and os.path.abspath(job.out_dir) == os.path.abspath(request.output):
+            raise HTTPException(status_code=409, detail=f"Job {job.id} is already writing to {request.output}.")
+    try:
+        source = open_source(request.source, request.endpoint_url)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    job = ReembedJob(source, request.output, request.batch_size, request.chunk_size, request.dtype)
+    jobs[job.id] = job
+    logger.warning(f"Admin started re-embed job {job.id}: {source.describe()} -> {request.output}")
+    job.start()
+    return job.to_dict()
+
+@router.get("/jobs")
+async def list_jobs():
+    return {"jobs": [job.to_dict() for job in jobs.values()]}
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail=f"No re-embed job {job_id}.")
+    return jobs[job_id].to_dict()
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Stops after the current image; a new job on the same output resumes from the last chunk."""
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail=f"No re-embed job {job_id}.")
+    jobs[job_id].cancelled.set()
+    return jobs[job_id].to_dict()
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed every image in a directory or S3 prefix.")
+    parser.add_argument("--source", required=True, help="Directory, or s3://bucket/prefix.")
+    parser.add_argument("--output", required=True, help="Directory for chunks and the checkpoint.")
+    parser.add_argument("--endpoint-url", help="S3-compatible endpoint, e.g. http://localhost:9000 for MinIO.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--dtype", default="float16", choices=("float16", "float32"))
+    parser.add_argument("--workers", type=int, default=DECODE_WORKERS)
+    args = parser.parse_args()
+
+    import main as service  # loads the model
+    # run as a script this module is __main__, so take over what main.py configured on `reembed`
+    configure(service.reembed._embed, service.reembed._model_name)
+    job = ReembedJob(open_source(args.source, args.endpoint_url), args.output, args.batch_size,
+                     args.chunk_size, args.dtype, args.workers)
+    job.start()
+    try:
+        while job.thread.is_alive():
+            job.thread.join(5)
+            print(f"{job.done}/{job.total} done, {len(job.failed)} failed, "
+                  f"{job.images_per_second(THROUGHPUT_WINDOW_SECONDS):.1f} images/s", flush=True)
+    except KeyboardInterrupt:
+        job.cancelled.set()
+        job.thread.join()
+    print(json.dumps(job.to_dict(), indent=1))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Operations on the GPU VMs over SSH, exposed to admins under /remote.
+
+The SSH layer itself (one multiplexed connection per host, concurrent
+commands with timeouts and streamed output) is ssh.py; this adds health()
+(moshi-server, GPU and disk state of one VM) and hot_update() (swap the
+moshi-server binary and/or pull configs, restart, wait for the websocket),
+and targets the running fleet instances by default.
+"""
+import asyncio
+import json
+import logging
+import shlex
+import time
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+import fleet
+import hyperstack
+from ssh import DEFAULT_TIMEOUT_SECONDS, RemoteResult, run, run_many
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(dependencies=[Depends(hyperstack.get_admin_user)])
+
+# --- Configuration ---
+KYUTAI_DIR = "/home/ubuntu/delayed-streams-modeling"
+KYUTAI_CONFIG = "configs/config-stt-en_fr-hf.toml"
+
+# --- Operations ---
+HEALTH_COMMAND = (
+    # -x matches the process name only, never the shell running this very command
+    "if systemctl is-active --quiet moshi-server || pgrep -x moshi-server >/dev/null; "
+    "then echo running; else echo stopped; fi; "
+    "nvidia-smi --query-gpu=name,utilization.gpu,memory.used,memory.total,temperature.gpu --format=csv,noheader,nounits; "
+    "df -P / | tail -1; "
+    "cat /proc/loadavg"
+)
+
+def parse_health(result: RemoteResult) -> dict:
+    health = {"host": result.host, "reachable": result.exit_status not in (None, 255), "duration": round(result.duration, 3)}
+    lines = result.stdout.splitlines()
+    if len(lines) < 3:
+        health["error"] = "timed out" if result.timed_out else (result.stderr.strip() or "unexpected output")
+        return health
+    server, gpus, disk, load = lines[0], lines[1:-2], lines[-2], lines[-1]
+    health["moshi_server"] = server.strip()
+    fields = [f.strip() for f in gpus[0].split(",")] if gpus else []
+    if len(fields) == 5:
+        health["gpu"] = {"name": fields[0], "utilization_pct": float(fields[1]), "memory_used_mib": float(fields[2]),
+                         "memory_total_mib": float(fields[3]), "temperature_c": float(fields[4])}
+    disk_fields = disk.split()
+    if len(disk_fields) >= 5:
+        health["disk_used_pct"] = float(disk_fields[4].rstrip("%"))
+    health["load_1m"] = float(load.split()[0])
+    return health
+
+async def health(hosts: list, timeout: float = 15) -> list:
+    results = await run_many(hosts, HEALTH_COMMAND, timeout)
+    return [parse_health(r) for r in results.values()]
+
+def update_command(binary_url: str | None = None, pull_configs: bool = True) -> str:
+    """
+    Shell for swapping in a new moshi-server and restarting it. Works on baked VMs
+    (systemd unit, running as ubuntu) and script-booted ones (checkout and server
+    owned by root, since cloud-init runs the boot script). File steps run as the
+    checkout's owner; any step failing fails the update.
+    """
+    steps = ["set -e", f"cd {KYUTAI_DIR}", 'owner=$(stat -c %U .)']
+    if binary_url:
+        steps += [f'sudo -u "$owner" wget -q {shlex.quote(binary_url)} -O moshi-server.new',
+                  'sudo -u "$owner" chmod +x moshi-server.new', 'sudo -u "$owner" mv moshi-server.new moshi-server']
+    if pull_configs:
+        steps.append('sudo -u "$owner" git pull --ff-only')
+    steps.append(
+        "if systemctl cat moshi-server >/dev/null 2>&1; then sudo systemctl restart moshi-server; else "
+        # pkill exits 1 when nothing matched, which is fine; anything else is not
+        "sudo pkill -x moshi-server || [ $? -eq 1 ]; "
+        "for i in $(seq 30); do pgrep -x moshi-server >/dev/null || break; sleep 1; done; "
+        "if pgrep -x moshi-server >/dev/null; then echo 'old moshi-server did not exit' >&2; exit 1; fi; "
+        f'sudo -u "$owner" nohup ./moshi-server worker --config {KYUTAI_CONFIG} '
+        ">> /home/ubuntu/moshi-server.log 2>&1 < /dev/null & "
+        "sleep 2; if ! pgrep -x moshi-server >/dev/null; then echo 'moshi-server exited on start' >&2; "
+        "tail -20 /home/ubuntu/moshi-server.log >&2; exit 1; fi; fi")
+    return "; ".join(steps)
+
+async def hot_update(host: str, binary_url: str | None = None, pull_configs: bool = True,
+                     ready_timeout: float = 300, on_line=None) -> dict:
+    """Updates and restarts the Kyutai server on one VM, then waits for its websocket."""
+    address = host.rpartition("@")[2].partition(":")[0]
+    started = time.monotonic()
+    result = await run(host, update_command(binary_url, pull_configs), timeout=600, on_line=on_line)
+    report = {"host": host, "update": result.to_dict(), "ready": False}
+    if not result.ok:
+        return report
+    deadline = time.monotonic() + ready_timeout
+    while time.monotonic() < deadline:
+        if await hyperstack.is_websocket_ready(address):
+            report["ready"] = True
+            break
+        await asyncio.sleep(5)
+    report["ready_after"] = round(time.monotonic() - started, 1)
+    logger.info(f"Hot update of {host}: {'ready' if report['ready'] else 'NOT ready'} after {report['ready_after']}s")
+    return report
+
+async def fleet_hosts() -> list:
+    """SSH targets for every running fleet instance with a public IP."""
+    instances = await fleet.fleet.list_instances()
+    return [i.ip for i in instances if i.ip and i.state in (fleet.ACTIVE, fleet.READY)]
+
+# --- Endpoints ---
+class ExecRequest(BaseModel):
+    command: str
+    hosts: list[str] | None = None  # default: every running instance
+    timeout: float = DEFAULT_TIMEOUT_SECONDS
+
+class UpdateRequest(BaseModel):
+    hosts: list[str] | None = None
+    binary_url: str | None = None
+    pull_configs: bool = True
+    # Hosts restarted at once; the rest keep serving meanwhile.
+    max_unavailable: int = 1
+
+def ndjson_stream(run_job):
+    """
+    A StreamingResponse of JSON lines: {"host", "stream", "line"} as output
+    arrives, then whatever `run_job(on_line)` returns, one object per line.
+    """
+    async def body():
+        queue = asyncio.Queue()
+
+        async def on_line(host, name, line):
+            await queue.put({"host": host, "stream": name, "line": line.rstrip("\n")})
+
+        task = asyncio.create_task(run_job(on_line))
+        task.add_done_callback(lambda t: queue.put_nowait(None))
+        try:
+            while (item := await queue.get()) is not None:
+                yield json.dumps(item) + "\n"
+            for summary in task.result():
+                yield json.dumps(summary) + "\n"
+        finally:
+            task.cancel()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+async def resolve_hosts(hosts: list | None) -> list:
+    hosts = hosts or await fleet_hosts()
+    if not hosts:
+        raise HTTPException(status_code=404, detail="No running instances to target.")
+    return hosts
+
+@router.post("/exec")
+async def exec_command(request: ExecRequest):
+    hosts = await resolve_hosts(request.hosts)
+    logger.warning(f"Admin remote exec on {len(hosts)} host(s): {request.command}")
+
+    async def job(on_line):
+        results = await run_many(hosts, request.command, request.timeout, on_line)
+        return [{k: v for k, v in r.to_dict().items() if k not in ("stdout", "stderr")} for r in results.values()]
+
+    return ndjson_stream(job)
+
+@router.get("/health")
+async def get_health(timeout: float = 15):
+    hosts = await resolve_hosts(None)
+    return {"hosts": await health(hosts, timeout)}
+
+@router.post("/update")
+async def update_kyutai(request: UpdateRequest):
+    """Rolling hot update of the Kyutai server, `max_unavailable` hosts at a time."""
+    hosts = await resolve_hosts(request.hosts)
+    logger.warning(f"Admin hot update of {len(hosts)} host(s), binary_url={request.binary_url}")
+    semaphore = asyncio.Semaphore(max(request.max_unavailable, 1))
+
+    async def job(on_line):
+        async def one(host):
+            async with semaphore:
+                return await hot_update(host, request.binary_url, request.pull_configs,
+                                        on_line=lambda name, line: on_line(host, name, line))
+        return await asyncio.gather(*(one(h) for h in hosts))
+
+    return ndjson_stream(job)
@@ -0,0 +1,167 @@
+"""
+Commands on remote hosts over SSH, with no dependency on the rest of the service.
+
+Each host gets one persistent OpenSSH master connection (ControlMaster), and
+every command after the first rides it as a new channel, so there is no
+handshake per command. Commands run as asyncio subprocesses, many hosts at
+once, each under its own timeout, and their output can be streamed line by
+line as it arrives.
+
+    result = await ssh.run("149.36.0.36", "nvidia-smi")
+    results = await ssh.run_many(hosts, "df -h /", timeout=20)
+    async for stream, line in ssh.stream(host, "journalctl -fu moshi-server", timeout=60):
+        ...
+
+Hosts are "[user@]address[:port]"; the user defaults to REMOTE_SSH_USER.
+Used by remote.py (the admin endpoints) and gpu/provision/ssh_test.py, which
+must run without the service's secrets.
+"""
+import asyncio
+import logging
+import os
+import time
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+SSH_USER = os.environ.get("REMOTE_SSH_USER", "ubuntu")
+SSH_KEY = os.environ.get("REMOTE_SSH_KEY")  # private key file; unset uses ssh's defaults
+CONTROL_DIR = os.environ.get("REMOTE_CONTROL_DIR", "/tmp/ml-service-ssh")
+# How long an idle master connection stays up after its last command
+CONTROL_PERSIST_SECONDS = int(os.environ.get("REMOTE_CONTROL_PERSIST_SECONDS", 600))
+CONNECT_TIMEOUT_SECONDS = 10
+DEFAULT_TIMEOUT_SECONDS = 30
+MAX_PARALLEL_HOSTS = int(os.environ.get("REMOTE_MAX_PARALLEL_HOSTS", 16))
+MAX_OUTPUT_BYTES = 1 << 20  # per stream, per command; the rest is dropped
+
+class RemoteResult:
+    def __init__(self, host: str, command: str):
+        self.host = host
+        self.command = command
+        self.exit_status = None
+        self.stdout = ""
+        self.stderr = ""
+        self.duration = 0.0
+        self.timed_out = False
+
+    @property
+    def ok(self) -> bool:
+        return self.exit_status == 0
+
+    def to_dict(self) -> dict:
+        return {"host": self.host, "command": self.command, "ok": self.ok, "exit_status": self.exit_status,
+                "timed_out": self.timed_out, "duration": round(self.duration, 3),
+                "stdout": self.stdout, "stderr": self.stderr}
+
+def ssh_command(host: str, *extra: str) -> list:
+    """The ssh argv for `host`, sharing that host's master connection."""
+    target, _, port = host.partition(":")
+    if "@" not in target:
+        target = f"{SSH_USER}@{target}"
+    args = [
+        "ssh",
+        # VMs come and go on recycled IPs, so host keys are not pinned (as in ssh_test.py).
+        "-o", "StrictHostKeyChecking=no",
+        "-o", "UserKnownHostsFile=/dev/null",
+        "-o", "LogLevel=ERROR",
+        "-o", "BatchMode=yes",
+        "-o", f"ConnectTimeout={CONNECT_TIMEOUT_SECONDS}",
+        "-o", "ServerAliveInterval=15",
+        "-o", "ControlMaster=auto",
+        "-o", f"ControlPath={CONTROL_DIR}/%C",
+        "-o", f"ControlPersist={CONTROL_PERSIST_SECONDS}",
+    ]
+    if SSH_KEY:
+        args += ["-i", SSH_KEY]
+    if port:
+        args += ["-p", port]
+    return args + list(extra) + [target]
+
+# --- Execution ---
+async def _pump(reader: asyncio.StreamReader, name: str, chunks: list, on_line):
+    size = 0
+    while True:
+        try:
+            line = await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            line = e.partial  # output ending without a newline; empty at EOF
+        except asyncio.LimitOverrunError as e:
+            line = await reader.read(e.consumed)  # a line past the buffer limit comes through in pieces
+        if not line:
+            break
+        text = line.decode(errors="replace")
+        if size < MAX_OUTPUT_BYTES:
+            chunks.append(text)
+            size += len(line)
+        if on_line is not None:
+            await on_line(name, text)
+
+async def run(host: str, command: str, timeout: float = DEFAULT_TIMEOUT_SECONDS, on_line=None) -> RemoteResult:
+    """
+    Runs `command` on `host`. `on_line(stream, line)`, if given, is awaited for
+    every line of stdout/stderr as it arrives. Never raises for remote failures:
+    check result.ok, result.timed_out, and exit_status 255 for ssh's own errors.
+    """
+    os.makedirs(CONTROL_DIR, mode=0o700, exist_ok=True)
+    result = RemoteResult(host, command)
+    started = time.monotonic()
+    stdout, stderr = [], []
+    with tracing.span("remote.run", kind=tracing.KIND_CLIENT, host=host) as s:
+        process = await asyncio.create_subprocess_exec(
+            *ssh_command(host), command, stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        try:
+            async with asyncio.timeout(timeout):
+                await asyncio.gather(_pump(process.stdout, "stdout", stdout, on_line),
+                                     _pump(process.stderr, "stderr", stderr, on_line))
+                result.exit_status = await process.wait()
+        except TimeoutError:
+            result.timed_out = True
+            process.kill()
+            await process.wait()
+        finally:
+            if process.returncode is None:  # cancelled
+                process.kill()
+        result.stdout, result.stderr = "".join(stdout), "".join(stderr)
+        result.duration = time.monotonic() - started
+        s.set_attribute("exit_status", result.exit_status if result.exit_status is not None else -1)
+        if not result.ok:
+            s.set_error("timed out" if result.timed_out else f"exit status {result.exit_status}")
+    logger.debug(f"remote {host} ({result.duration:.2f}s, exit {result.exit_status}): {command}")
+    return result
+
+async def run_many(hosts: list, command: str, timeout: float = DEFAULT_TIMEOUT_SECONDS,
+                   on_line=None, max_parallel: int = MAX_PARALLEL_HOSTS) -> dict:
+    """Runs `command` on every host concurrently; {host: RemoteResult}. `on_line(host, stream, line)`."""
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def one(host):
+        async with semaphore:
+            host_on_line = None if on_line is None else lambda name, line: on_line(host, name, line)
+            return await run(host, command, timeout, host_on_line)
+
+    return dict(zip(hosts, await asyncio.gather(*(one(h) for h in hosts))))
+
+async def stream(host: str, command: str, timeout: float = DEFAULT_TIMEOUT_SECONDS):
+    """Yields (stream, line) as `command` produces output, then ("exit", RemoteResult)."""
+    queue = asyncio.Queue()
+
+    async def on_line(name, line):
+        await queue.put((name, line))
+
+    task = asyncio.create_task(run(host, command, timeout, on_line))
+    task.add_done_callback(lambda t: queue.put_nowait(("exit", None)))
+    try:
+        while (item := await queue.get())[0] != "exit":
+            yield item
+        yield "exit", task.result()
+    finally:
+        task.cancel()
+
+async def disconnect(host: str):
+    """Closes the master connection to `host`, if one is open."""
+    process = await asyncio.create_subprocess_exec(
+        *ssh_command(host, "-O", "exit"), stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+    await process.wait()
@@ -0,0 +1,173 @@
+import asyncio
+import unittest
+from unittest import mock
+import admission
+import lifecycle
+
+class FakeBackends:
+    def __init__(self, ips: list, status: dict | None = None):
+        self.ips = ips
+        self.status = status or {"status": "now_spinning_up", "message": "Starting a VM."}
+        self.ready_calls = 0
+        self.status_calls = 0
+
+    async def find_ready_backends(self) -> list:
+        self.ready_calls += 1
+        await asyncio.sleep(0)
+        return list(self.ips)
+
+    async def get_backend_status(self) -> dict:
+        self.status_calls += 1
+        return self.status
+
+class FakeSession:
+    def __init__(self, ip: str):
+        self.ip = ip
+
+class AdmissionTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        for name, value in {"POLL_SECONDS": 0.01, "PUSH_SECONDS": 0.01, "MAX_QUEUE": 3,
+                            "MAX_WAIT_SECONDS": 5}.items():
+            patch = mock.patch.object(admission, name, value)
+            patch.start()
+            self.addCleanup(patch.stop)
+        # ETAs read boot history; no history means the default, without touching the lifecycle database
+        patch = mock.patch.object(lifecycle.store, "expected_boot_seconds",
+                                  side_effect=lambda provider, gpu_type, default, variant=None: default)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def controller(self, ips: list, per_backend: int = 2) -> tuple:
+        backends = FakeBackends(ips)
+        return admission.AdmissionController(backends.find_ready_backends, backends.get_backend_status,
+                                             per_backend), backends
+
+    def queue(self, control, name: str, order: list, pushes: list | None = None) -> asyncio.Task:
+        async def push(message):
+            if pushes is not None:
+                pushes.append((name, message))
+        async def run():
+            ticket = await control.wait(push)
+            order.append(name)
+            return ticket
+        return asyncio.create_task(run())
+
+    async def test_spreads_sessions_and_caps_each_backend(self):
+        control, _ = self.controller(["a", "b"])
+        tickets = [await control.try_admit() for _ in range(4)]
+        self.assertEqual(sorted(t.ip for t in tickets), ["a", "a", "b", "b"])
+        self.assertIsNone(await control.try_admit())
+        self.assertEqual(control.to_dict()["backends"], {"a": 2, "b": 2})
+
+    async def test_avoid_prefers_other_backends(self):
+        control, _ = self.controller(["a", "b"])
+        self.assertEqual((await control.try_admit(avoid={"a"})).ip, "b")
+        self.assertEqual((await control.try_admit(avoid={"a"})).ip, "b")
+        # b is full, so the avoided backend is still better than nothing
+        self.assertEqual((await control.try_admit(avoid={"a"})).ip, "a")
+
+    async def test_waiters_are_admitted_in_arrival_order(self):
+        control, _ = self.controller(["a"], per_backend=1)
+        held = await control.try_admit()
+        order = []
+        tasks = [self.queue(control, name, order) for name in ("first", "second", "third")]
+        await asyncio.sleep(0.05)
+        self.assertEqual(order, [])
+        self.assertEqual([control.waiters.index(w) for w in control.waiters], [0, 1, 2])
+        # no overtaking the queue, even for a caller that could use any backend
+        self.assertIsNone(await control.try_admit())
+
+        control.release(held)
+        first = await tasks[0]
+        control.release(first)
+        second = await tasks[1]
+        control.release(second)
+        await tasks[2]
+        self.assertEqual(order, ["first", "second", "third"])
+        self.assertEqual(len(control.tickets), 1)
+
+    async def test_queue_positions_are_pushed(self):
+        control, _ = self.controller(["a"], per_backend=1)
+        held = await control.try_admit()
+        pushes = []
+        tasks = [self.queue(control, name, [], pushes) for name in ("first", "second")]
+        await asyncio.sleep(0.05)
+        positions = {name: message["position"] for name, message in pushes}
+        self.assertEqual(positions, {"first": 1, "second": 2})
+        self.assertEqual(pushes[0][1]["status"], "backends_busy")
+        control.release(held)
+        control.release(await tasks[0])
+        await tasks[1]
+
+    async def test_queue_full(self):
+        control, _ = self.controller(["a"], per_backend=1)
+        await control.try_admit()
+        tasks = [self.queue(control, str(i), []) for i in range(admission.MAX_QUEUE)]
+        await asyncio.sleep(0.02)
+        with self.assertRaises(admission.QueueFull):
+            await control.wait(lambda message: asyncio.sleep(0))
+        for task in tasks:
+            task.cancel()
+
+    async def test_timeout_and_cancel_leave_the_queue(self):
+        control, _ = self.controller(["a"], per_backend=1)
+        held = await control.try_admit()
+        order = []
+        with mock.patch.object(admission, "MAX_WAIT_SECONDS", 0.05):
+            self.assertIsNone(await self.queue(control, "impatient", order))
+        leaver = self.queue(control, "leaver", order)
+        stayer = self.queue(control, "stayer", order)
+        await asyncio.sleep(0.02)
+        leaver.cancel()
+        await asyncio.sleep(0)
+        self.assertEqual(len(control.waiters), 1)
+        control.release(held)
+        ticket = await stayer
+        self.assertEqual(order, ["impatient", "stayer"])
+        self.assertEqual(control.tickets, {ticket})
+
+    async def test_ticket_follows_its_session(self):
+        control, _ = self.controller(["a", "b"], per_backend=1)
+        ticket = await control.try_admit(avoid={"b"})
+        ticket.session = FakeSession("a")
+        ticket.session.ip = "b"  # failed over
+        self.assertEqual(control.load("a"), 0)
+        self.assertEqual((await control.try_admit()).ip, "a")
+        self.assertIsNone(await control.try_admit())
+
+    async def test_release_is_idempotent(self):
+        control, _ = self.controller(["a"], per_backend=1)
+        ticket = await control.try_admit()
+        control.release(ticket)
+        control.release(ticket)
+        self.assertEqual(control.tickets, set())
+
+    async def test_concurrent_callers_share_one_status_pass(self):
+        control, backends = self.controller(["a"], per_backend=10)
+        await asyncio.gather(*(control.try_admit() for _ in range(5)))
+        self.assertEqual(backends.ready_calls, 1)
+        self.assertEqual(backends.status_calls, 0)
+
+    async def test_refresh_without_spin_up_never_asks_for_a_vm(self):
+        control, backends = self.controller([])
+        self.assertIsNone(await control.try_admit(spin_up=False))
+        self.assertEqual(backends.status_calls, 0)
+        self.assertEqual(control.status["status"], "no_backend_ready")
+
+    async def test_booting_backend_reports_status_and_eta(self):
+        control, backends = self.controller([])
+        self.assertIsNone(await control.try_admit())
+        self.assertEqual(backends.status_calls, 1)
+        pushes = []
+        waiting = self.queue(control, "early", [], pushes)
+        await asyncio.sleep(0.02)
+        message = pushes[0][1]
+        self.assertEqual(message["status"], "now_spinning_up")
+        self.assertLessEqual(message["eta_seconds"], admission.DEFAULT_BOOT_SECONDS)
+        self.assertGreater(message["eta_seconds"], admission.DEFAULT_BOOT_SECONDS - 5)
+        # the poller admits the waiter once the VM comes up
+        backends.ips = ["a"]
+        self.assertEqual((await asyncio.wait_for(waiting, 1)).ip, "a")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+import broadcast
+
+def word(text: str) -> str:
+    return json.dumps({"type": "Word", "text": text})
+
+class FakeViewer:
+    """A subscriber's websocket: records what it's sent, optionally never finishing a send."""
+    def __init__(self, stuck: bool = False):
+        self.stuck = stuck
+        self.sent = []
+        self.incoming = asyncio.Queue()
+        self.closed = False
+
+    async def send_text(self, text: str):
+        if self.stuck:
+            await asyncio.Event().wait()
+        self.sent.append(json.loads(text))
+
+    async def receive(self) -> dict:
+        return await self.incoming.get()
+
+    async def close(self):
+        self.closed = True
+
+    def leave(self):
+        self.incoming.put_nowait({"type": "websocket.disconnect"})
+
+class SubscriberTest(unittest.IsolatedAsyncioTestCase):
+    async def test_overflow_drops_oldest_and_reports_the_gap(self):
+        subscriber = broadcast.Subscriber(buffer=3)
+        for i in range(5):
+            subscriber.offer(word(f"w{i}"))
+        subscriber.end()
+        viewer = FakeViewer()
+        await subscriber.send_loop(viewer)
+        self.assertEqual(viewer.sent, [{"type": "Lagged", "skipped": 2}, {"type": "Word", "text": "w2"},
+                                       {"type": "Word", "text": "w3"}, {"type": "Word", "text": "w4"},
+                                       {"type": "Ended"}])
+
+    async def test_stuck_viewer_times_out(self):
+        subscriber = broadcast.Subscriber()
+        subscriber.offer(word("hello"))
+        with mock.patch.object(broadcast, "SEND_TIMEOUT_SECONDS", 0.01):
+            with self.assertRaises(TimeoutError):
+                await subscriber.send_loop(FakeViewer(stuck=True))
+
+class ChannelTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.channel = broadcast.open_channel()
+        self.addCleanup(broadcast.close_channel, self.channel)
+
+    async def test_backlog_keeps_recent_words_only(self):
+        with mock.patch.object(broadcast, "BACKLOG", 2):
+            channel = broadcast.Channel()
+        channel.publish("Word", word("a"))
+        channel.publish("Step", json.dumps({"type": "Step"}))
+        channel.publish("Word", word("b"))
+        channel.publish("Word", word("c"))
+        subscriber = channel.subscribe()
+        self.assertEqual([json.loads(t)["text"] for t in subscriber.queue], ["b", "c"])
+        channel.unsubscribe(subscriber)
+
+    async def test_slow_viewer_never_holds_up_the_producer(self):
+        fast, stuck = FakeViewer(), FakeViewer(stuck=True)
+        with mock.patch.object(broadcast, "SEND_TIMEOUT_SECONDS", 0.05):
+            serving = [asyncio.create_task(broadcast.serve(v, self.channel.id)) for v in (fast, stuck)]
+            await asyncio.sleep(0.01)
+            for i in range(1000):
+                self.channel.publish("Word", word(f"w{i}"))
+            await asyncio.sleep(0.01)
+            broadcast.close_channel(self.channel)
+            await asyncio.wait_for(asyncio.gather(*serving), 1)
+        words = [m["text"] for m in fast.sent if m["type"] == "Word"]
+        lagged = sum(m["skipped"] for m in fast.sent if m["type"] == "Lagged")
+        self.assertEqual(words[-1], "w999")
+        self.assertEqual(len(words) + lagged, 1000)
+        self.assertEqual(fast.sent[0], {"type": "Subscribed", "channel": self.channel.id, "backlog": 0})
+        self.assertEqual(fast.sent[-1], {"type": "Ended"})
+        self.assertTrue(fast.closed and stuck.closed)
+        self.assertEqual(self.channel.subscribers, set())
+
+    async def test_viewer_leaving_unsubscribes(self):
+        viewer = FakeViewer()
+        serving = asyncio.create_task(broadcast.serve(viewer, self.channel.id))
+        await asyncio.sleep(0.01)
+        self.assertEqual(len(self.channel.subscribers), 1)
+        viewer.leave()
+        await asyncio.wait_for(serving, 1)
+        self.assertEqual(self.channel.subscribers, set())
+        self.assertFalse(viewer.closed)
+
+    async def test_unknown_channel_and_subscriber_cap(self):
+        viewer = FakeViewer()
+        await broadcast.serve(viewer, "nope")
+        self.assertEqual(viewer.sent[0]["status"], "unknown_channel")
+        self.assertTrue(viewer.closed)
+
+        with mock.patch.object(broadcast, "MAX_SUBSCRIBERS", 1):
+            first = FakeViewer()
+            serving = asyncio.create_task(broadcast.serve(first, self.channel.id))
+            await asyncio.sleep(0.01)
+            second = FakeViewer()
+            await broadcast.serve(second, self.channel.id)
+            self.assertEqual(second.sent[0]["status"], "too_many_subscribers")
+            first.leave()
+            await serving
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import asyncio
+import unittest
+import embed_scheduler
+from embed_scheduler import EmbedScheduler
+
+OCCUPANCY = {"interactive": 8, "batch": 4, "background": 2}
+
+def held_scheduler() -> EmbedScheduler:
+    """A scheduler whose batches are pulled by the test instead of a worker thread."""
+    scheduler = EmbedScheduler(max_batch=8, occupancy=OCCUPANCY)
+    scheduler.thread = "held"
+    return scheduler
+
+def labels(batch: list) -> list:
+    return [request.images[i] for request, i in batch]
+
+class BatchOrderTest(unittest.TestCase):
+    def test_classes_are_strict_and_capped(self):
+        scheduler = held_scheduler()
+        scheduler.submit([f"bg{i}" for i in range(5)], priority="background")
+        scheduler.submit([f"b{i}" for i in range(10)], priority="batch")
+        scheduler.submit(["i0", "i1"], priority="interactive")
+        # interactive first; batch and background together fill at most 4 slots
+        self.assertEqual(labels(scheduler.next_batch()), ["i0", "i1", "b0", "b1", "b2", "b3"])
+        self.assertEqual(labels(scheduler.next_batch()), ["b4", "b5", "b6", "b7"])
+        # background alone gets at most 2
+        self.assertEqual(labels(scheduler.next_batch()), ["b8", "b9", "bg0", "bg1"])
+        self.assertEqual(labels(scheduler.next_batch()), ["bg2", "bg3"])
+        self.assertEqual(scheduler.depth, {"interactive": 0, "batch": 0, "background": 1})
+
+    def test_background_is_charged_for_its_own_items_only(self):
+        scheduler = held_scheduler()
+        scheduler.submit([f"bg{i}" for i in range(5)], priority="background")
+        scheduler.submit(["b0"], priority="batch")
+        # 1 batch item leaves 3 slots under the batch cap; background fills its own 2
+        self.assertEqual(labels(scheduler.next_batch()), ["b0", "bg0", "bg1"])
+        scheduler.submit(["b1", "b2", "b3"], priority="batch")
+        # 3 batch items leave 1 slot under the batch cap
+        self.assertEqual(labels(scheduler.next_batch()), ["b1", "b2", "b3", "bg2"])
+
+    def test_lowest_class_progresses_with_zero_occupancy(self):
+        scheduler = EmbedScheduler(max_batch=8, occupancy={**OCCUPANCY, "background": 0})
+        scheduler.thread = "held"
+        scheduler.submit(["bg0", "bg1"], priority="background")
+        self.assertEqual(labels(scheduler.next_batch()), ["bg0"])
+
+    def test_tenants_take_turns_within_a_class(self):
+        scheduler = held_scheduler()
+        scheduler.submit([f"a{i}" for i in range(6)], priority="batch", tenant="a")
+        scheduler.submit(["b0", "b1"], priority="batch", tenant="b")
+        scheduler.submit(["c0"], priority="batch", tenant="c")
+        self.assertEqual(labels(scheduler.next_batch()), ["a0", "b0", "c0", "a1"])
+        self.assertEqual(labels(scheduler.next_batch()), ["b1", "a2", "a3", "a4"])
+        self.assertEqual(labels(scheduler.next_batch()), ["a5"])
+
+    def test_late_tenant_is_not_stuck_behind_a_backlog(self):
+        scheduler = held_scheduler()
+        scheduler.submit([f"a{i}" for i in range(100)], priority="batch", tenant="a")
+        scheduler.next_batch()
+        scheduler.submit(["b0"], priority="batch", tenant="b")
+        self.assertIn("b0", labels(scheduler.next_batch())[:2])
+
+    def test_batch_holds_one_model(self):
+        scheduler = held_scheduler()
+        scheduler.submit(["x0"], model_id="x")
+        scheduler.submit(["y0"], model_id="y")
+        scheduler.submit(["x1"], model_id="x", tenant="other")
+        self.assertEqual(labels(scheduler.next_batch()), ["x0", "x1"])
+        self.assertEqual(labels(scheduler.next_batch()), ["y0"])
+
+    def test_rejects_unknown_priority(self):
+        with self.assertRaises(ValueError):
+            held_scheduler().submit(["x"], priority="urgent")
+
+    def test_empty_request_resolves_immediately(self):
+        self.assertEqual(held_scheduler().submit([]).future.result(timeout=0), [])
+
+class WorkerTest(unittest.TestCase):
+    def setUp(self):
+        self.batches = []
+        def fake_embed(images, timings, model_id):
+            if "bad" in images:
+                raise RuntimeError("model failed")
+            self.batches.append(list(images))
+            timings["forward"] = 0.001
+            return [f"row-{image}" for image in images]
+        previous = embed_scheduler._embed
+        embed_scheduler.configure(fake_embed)
+        self.addCleanup(embed_scheduler.configure, previous)
+
+    def test_rows_come_back_in_request_order(self):
+        scheduler = EmbedScheduler(max_batch=3, occupancy=OCCUPANCY)
+        request = scheduler.submit([f"p{i}" for i in range(7)])
+        self.assertEqual(request.future.result(timeout=5), [f"row-p{i}" for i in range(7)])
+        self.assertTrue(all(len(batch) <= 3 for batch in self.batches))
+        self.assertIn("queue", request.timings)
+        self.assertGreater(request.timings["forward"], 0)
+
+    def test_failed_batch_fails_its_requests(self):
+        scheduler = EmbedScheduler(max_batch=8, occupancy=OCCUPANCY)
+        with self.assertLogs(embed_scheduler.logger, "ERROR"):
+            with self.assertRaises(RuntimeError):
+                scheduler.submit(["bad"]).future.result(timeout=5)
+        # the worker carries on with the next request
+        self.assertEqual(scheduler.submit(["ok"]).future.result(timeout=5), ["row-ok"])
+
+    def test_async_embed(self):
+        timings = {}
+        rows = asyncio.run(embed_scheduler.embed(["a", "b"], timings=timings))
+        self.assertEqual(rows, ["row-a", "row-b"])
+        self.assertIn("forward", timings)
+
+if __name__ == "__main__":
+    unittest.main()
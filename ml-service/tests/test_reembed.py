@@ -0,0 +1,146 @@
+import glob
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+import torch
+from PIL import Image
+
+# reembed's endpoints import hyperstack's admin check, which refuses to load without its credentials
+for var in ("HYPERSTACK_API_KEY", "HYPERSTACK_ADMIN_TOKEN", "HYPERSTACK_SPINUP_PERMISSION_TOKEN"):
+    os.environ.setdefault(var, "test")
+
+import reembed
+
+IMAGES = 23
+BROKEN = {"img-007.png", "img-015.png"}
+
+class FakeModel:
+    """Embeds a 1x1 image as [red, red + 0.5]; raises once `fail_after` batches have run."""
+    def __init__(self, fail_after: int | None = None):
+        self.fail_after = fail_after
+        self.batches = 0
+        self.images = 0
+
+    def __call__(self, images: list) -> torch.Tensor:
+        if self.fail_after is not None and self.batches >= self.fail_after:
+            raise RuntimeError("CUDA out of memory")
+        self.batches += 1
+        self.images += len(images)
+        red = torch.tensor([float(image.getpixel((0, 0))[0]) for image in images])
+        return torch.stack([red, red + 0.5], dim=1)
+
+class ReembedJobTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.source_dir = os.path.join(tmp.name, "pictures")
+        self.out_dir = os.path.join(tmp.name, "out")
+        os.makedirs(self.source_dir)
+        for i in range(IMAGES):
+            name = f"img-{i:03d}.png"
+            if name in BROKEN:
+                with open(os.path.join(self.source_dir, name), "wb") as f:
+                    f.write(b"not a png")
+            else:
+                Image.new("RGB", (1, 1), (i, 0, 0)).save(os.path.join(self.source_dir, name))
+        with open(os.path.join(self.source_dir, "notes.txt"), "w") as f:
+            f.write("not an image")
+        self.good_keys = [f"img-{i:03d}.png" for i in range(IMAGES) if f"img-{i:03d}.png" not in BROKEN]
+
+    def run_job(self, model: FakeModel, model_name: str = "fake") -> reembed.ReembedJob:
+        reembed.configure(model, model_name)
+        job = reembed.ReembedJob(reembed.DirectorySource(self.source_dir), self.out_dir, batch_size=2,
+                                 chunk_size=4, dtype="float32", workers=2, prefetch=3)
+        with self.assertLogs(reembed.logger):
+            job.run()
+        return job
+
+    def read_output(self) -> tuple:
+        keys, vectors = [], []
+        for path in sorted(glob.glob(os.path.join(self.out_dir, "chunk-*.npy"))):
+            with open(path[:-len(".npy")] + ".keys.txt") as f:
+                chunk_keys = f.read().splitlines()
+            chunk = np.load(path)
+            self.assertEqual(len(chunk), len(chunk_keys))
+            keys.extend(chunk_keys)
+            vectors.append(chunk)
+        return keys, np.concatenate(vectors)
+
+    def checkpoint(self) -> dict:
+        with open(os.path.join(self.out_dir, "checkpoint.json")) as f:
+            return json.load(f)
+
+    def assert_rows_match_keys(self, keys: list, vectors: np.ndarray):
+        for key, row in zip(keys, vectors):
+            red = int(key[4:7])
+            np.testing.assert_array_equal(row, [red, red + 0.5])
+
+    def test_full_run(self):
+        model = FakeModel()
+        job = self.run_job(model)
+        self.assertEqual(job.status, "done")
+        keys, vectors = self.read_output()
+        self.assertEqual(keys, self.good_keys)
+        self.assert_rows_match_keys(keys, vectors)
+        self.assertEqual(sorted(k for k, _ in job.failed), sorted(BROKEN))
+        checkpoint = self.checkpoint()
+        self.assertTrue(checkpoint["complete"])
+        self.assertEqual(checkpoint["last_key"], f"img-{IMAGES - 1:03d}.png")
+        self.assertEqual(checkpoint["images"], len(self.good_keys))
+        self.assertEqual(checkpoint["chunks"], -(-len(self.good_keys) // 4))
+        self.assertFalse(glob.glob(os.path.join(self.out_dir, "*.tmp")))
+
+    def test_resume_after_crash_embeds_each_image_once(self):
+        crashed = self.run_job(FakeModel(fail_after=5))
+        self.assertEqual(crashed.status, "failed")
+        checkpoint = self.checkpoint()
+        self.assertEqual(checkpoint["chunks"], 2)
+        self.assertNotIn("complete", checkpoint)
+
+        model = FakeModel()
+        resumed = self.run_job(model)
+        self.assertEqual(resumed.status, "done")
+        self.assertEqual(resumed.resumed_from, self.good_keys.index(checkpoint["last_key"]) + 1 +
+                         sum(1 for key in BROKEN if key < checkpoint["last_key"]))
+        self.assertEqual(model.images, len(self.good_keys) - checkpoint["images"])
+        keys, vectors = self.read_output()
+        self.assertEqual(keys, self.good_keys)
+        self.assert_rows_match_keys(keys, vectors)
+        self.assertEqual(sorted(k for k, _ in resumed.failed), sorted(BROKEN))
+
+    def test_resume_follows_keys_not_positions(self):
+        self.run_job(FakeModel(fail_after=5))
+        last_key = self.checkpoint()["last_key"]
+        # uploads between runs: one sorting before the resume point (shifting every later position), one after
+        early, late = "img-000a.png", "img-020a.png"
+        for name in (early, late):
+            Image.new("RGB", (1, 1), (int(name[4:7]), 0, 0)).save(os.path.join(self.source_dir, name))
+        self.assertLess(early, last_key)
+        self.assertGreater(late, last_key)
+
+        model = FakeModel()
+        resumed = self.run_job(model)
+        self.assertEqual(resumed.status, "done")
+        keys, vectors = self.read_output()
+        self.assertEqual(keys, sorted(self.good_keys + [late]))
+        self.assert_rows_match_keys(keys, vectors)
+        self.assertEqual(model.images, sum(1 for key in self.good_keys + [late] if key > last_key))
+
+    def test_rerun_of_finished_job_does_nothing(self):
+        self.run_job(FakeModel())
+        model = FakeModel()
+        job = self.run_job(model)
+        self.assertEqual(job.status, "done")
+        self.assertEqual(model.images, 0)
+        self.assertEqual(self.read_output()[0], self.good_keys)
+
+    def test_refuses_output_from_another_model(self):
+        self.run_job(FakeModel(fail_after=3))
+        job = self.run_job(FakeModel(), model_name="other")
+        self.assertEqual(job.status, "failed")
+        self.assertIn("fake", job.error)
+
+if __name__ == "__main__":
+    unittest.main()
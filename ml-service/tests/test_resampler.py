@@ -0,0 +1,76 @@
+import unittest
+import numpy as np
+import audio
+
+def tone(freq: float, rate: int, seconds: float = 1.0) -> np.ndarray:
+    return np.sin(2 * np.pi * freq * np.arange(int(rate * seconds)) / rate).astype(np.float32)
+
+def resample_in_chunks(in_rate: int, out_rate: int, signal: np.ndarray, seed: int = 0) -> np.ndarray:
+    resampler = audio.StreamResampler(in_rate, out_rate)
+    rng = np.random.default_rng(seed)
+    out, pos = [], 0
+    while pos < signal.size:
+        size = int(rng.integers(1, 2000))
+        out.append(resampler.process(signal[pos:pos + size]))
+        pos += size
+    return np.concatenate(out)
+
+# (in, out): integer down, small polyphase loop, and a ratio with too many phases for the loop
+RATES = [(48000, 24000), (16000, 24000), (44100, 24000), (8000, 24000)]
+
+class StreamResamplerTest(unittest.TestCase):
+    def test_same_rate_is_passthrough(self):
+        signal = tone(440, 24000)
+        self.assertIs(audio.StreamResampler(24000, 24000).process(signal), signal)
+
+    def test_chunking_does_not_change_output(self):
+        for in_rate, out_rate in RATES:
+            with self.subTest(in_rate=in_rate):
+                signal = tone(300, in_rate)
+                whole = audio.StreamResampler(in_rate, out_rate).process(signal)
+                chunked = resample_in_chunks(in_rate, out_rate, signal)
+                np.testing.assert_allclose(chunked, whole, atol=1e-5)
+                self.assertEqual(whole.dtype, np.float32)
+
+    def test_output_length_tracks_rate_ratio(self):
+        for in_rate, out_rate in RATES:
+            with self.subTest(in_rate=in_rate):
+                signal = tone(300, in_rate)
+                out = resample_in_chunks(in_rate, out_rate, signal)
+                expected = signal.size * out_rate / in_rate
+                # only the last half_taps input samples can still be held back
+                self.assertLessEqual(out.size, expected)
+                self.assertGreater(out.size, expected - 16 * out_rate / in_rate - 1)
+
+    def test_tone_survives_without_delay(self):
+        for in_rate, out_rate in RATES:
+            with self.subTest(in_rate=in_rate):
+                out = resample_in_chunks(in_rate, out_rate, tone(1000, in_rate))
+                ideal = tone(1000, out_rate)[:out.size]
+                middle = slice(100, out.size - 100)
+                self.assertLess(np.max(np.abs(out[middle] - ideal[middle])), 1e-3)
+
+    def test_downsampling_filters_above_output_nyquist(self):
+        out = resample_in_chunks(48000, 16000, tone(12000, 48000))
+        self.assertLess(np.sqrt(np.mean(out[100:-100] ** 2)), 0.01)
+
+class AudioNormalizerTest(unittest.TestCase):
+    def test_s16_stereo_split_across_payloads(self):
+        left = (tone(500, 24000) * 16000).astype("<i2")
+        interleaved = np.stack([left, left], axis=1).tobytes()
+        normalizer = audio.AudioNormalizer(24000, 24000, channels=2, sample_format="s16")
+        parts = [normalizer.from_bytes(interleaved[i:i + 1001]) for i in range(0, len(interleaved), 1001)]
+        out = np.concatenate(parts)
+        np.testing.assert_allclose(out, left / 32768, atol=1e-6)
+        self.assertEqual(normalizer.remainder, b"")
+
+    def test_rejects_unsupported_formats(self):
+        with self.assertRaises(ValueError):
+            audio.AudioNormalizer(4000, 24000)
+        with self.assertRaises(ValueError):
+            audio.AudioNormalizer(24000, 24000, channels=9)
+        with self.assertRaises(ValueError):
+            audio.AudioNormalizer(24000, 24000, sample_format="u8")
+
+if __name__ == "__main__":
+    unittest.main()
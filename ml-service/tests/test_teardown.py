@@ -0,0 +1,107 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+# hyperstack refuses to import without its credentials; none of these reach a real API here
+for var in ("HYPERSTACK_API_KEY", "HYPERSTACK_ADMIN_TOKEN", "HYPERSTACK_SPINUP_PERMISSION_TOKEN"):
+    os.environ.setdefault(var, "test")
+
+import hyperstack
+
+_sleep = asyncio.sleep
+
+async def no_wait(seconds):
+    await _sleep(0)
+
+class FakeAPI:
+    """delete_vm/get_all_vms stand-ins: `failures` deletes fail per VM, then listings follow `listings`."""
+    def __init__(self, failures: dict | None = None, listings: list | None = None):
+        self.failures = dict(failures or {})
+        self.listings = list(listings or [[]])
+        self.deletes = []
+
+    def delete_vm(self, vm_id, vm_name):
+        self.deletes.append(vm_id)
+        if self.failures.get(vm_id, 0) > 0:
+            self.failures[vm_id] -= 1
+            return False, "500 Internal Server Error"
+        return True, "accepted"
+
+    def get_all_vms(self):
+        return self.listings.pop(0) if len(self.listings) > 1 else self.listings[0]
+
+class TeardownJobTest(unittest.IsolatedAsyncioTestCase):
+    def run_job(self, instances: list, api: FakeAPI, **config) -> hyperstack.TeardownJob:
+        settings = {"TEARDOWN_VERIFY_SECONDS": 0, "TEARDOWN_RETRY_SECONDS": 0, "TEARDOWN_MAX_ATTEMPTS": 3, **config}
+        patches = [mock.patch.object(hyperstack, name, value) for name, value in settings.items()]
+        patches += [mock.patch.object(hyperstack, "delete_vm", api.delete_vm),
+                    mock.patch.object(hyperstack, "get_all_vms", api.get_all_vms),
+                    mock.patch.object(hyperstack.asyncio, "sleep", no_wait)]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        return hyperstack.TeardownJob(instances)
+
+    async def test_retries_failed_deletes_until_they_succeed(self):
+        api = FakeAPI(failures={1: 2})
+        job = self.run_job([{"id": 1, "name": "a"}, {"id": 2, "name": "b"}], api)
+        await job.run()
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.vms["1"]["attempts"], 3)
+        self.assertEqual(job.vms["2"]["attempts"], 1)
+        self.assertEqual({e["status"] for e in job.vms.values()}, {"deleted"})
+
+    async def test_gives_up_after_max_attempts(self):
+        api = FakeAPI(failures={1: 99}, listings=[[{"id": 1, "status": "ACTIVE"}]])
+        job = self.run_job([{"id": 1, "name": "a"}], api)
+        with self.assertLogs(hyperstack.logger, "ERROR"):
+            await job.run()
+        self.assertEqual(job.vms["1"]["status"], "failed")
+        self.assertEqual(api.deletes, [1, 1, 1])
+        self.assertEqual(job.status, "incomplete")
+
+    async def test_resends_delete_that_did_not_take(self):
+        api = FakeAPI(listings=[[{"id": 1, "status": "ACTIVE"}], []])
+        job = self.run_job([{"id": 1, "name": "a"}], api, TEARDOWN_VERIFY_SECONDS=60)
+        await job.run()
+        self.assertEqual(api.deletes, [1, 1])
+        self.assertEqual(job.vms["1"]["status"], "deleted")
+        self.assertEqual(job.status, "done")
+
+    async def test_leaves_deleting_vms_alone(self):
+        api = FakeAPI(listings=[[{"id": 1, "status": "DELETING"}]])
+        job = self.run_job([{"id": 1, "name": "a"}], api)
+        with self.assertLogs(hyperstack.logger, "ERROR"):
+            await job.run()
+        self.assertEqual(api.deletes, [1])
+        self.assertEqual(job.vms["1"]["status"], "still_listed")
+        self.assertEqual(job.vms["1"]["listed_status"], "DELETING")
+        self.assertEqual(job.status, "incomplete")
+
+    async def test_skips_vms_without_id(self):
+        api = FakeAPI()
+        job = self.run_job([{"name": "orphan"}, {"id": 7, "name": "b"}], api)
+        await job.run()
+        self.assertEqual(api.deletes, [7])
+        self.assertEqual(job.to_dict()["counts"], {"skipped": 1, "deleted": 1})
+        self.assertEqual(job.status, "done")
+
+    async def test_bounded_parallelism(self):
+        running = peak = 0
+        def slow_delete(vm_id, vm_name):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            hyperstack.time.sleep(0.01)
+            running -= 1
+            return True, "accepted"
+        api = FakeAPI()
+        api.delete_vm = slow_delete
+        job = self.run_job([{"id": i, "name": str(i)} for i in range(10)], api, TEARDOWN_CONCURRENCY=3)
+        await job.run()
+        self.assertLessEqual(peak, 3)
+        self.assertEqual(job.status, "done")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import numpy as np
+import audio
+
+RATE = 24000
+FRAME = 1920  # 80 ms
+
+def speech():
+    return (0.5 * np.sin(np.arange(FRAME) * 0.1)).astype(np.float32)
+
+def silence():
+    return np.zeros(FRAME, dtype=np.float32)
+
+def feed(vad, frames, start=0):
+    """Runs frames through the gate; returns (frame index, client_start, pcm) for everything forwarded."""
+    out = []
+    for i, frame in enumerate(frames):
+        for client_start, pcm in vad.process(frame, start + i * FRAME):
+            out.append((client_start // FRAME, client_start, pcm))
+    return out
+
+class EnergyVADTest(unittest.TestCase):
+    def setUp(self):
+        self.hangover_frames = -(-int(audio.VAD_HANGOVER_MS * RATE / 1000) // FRAME)
+        self.preroll_frames = -(-int(audio.VAD_PREROLL_MS * RATE / 1000) // FRAME)
+
+    def test_off_forwards_everything(self):
+        vad = audio.EnergyVAD(RATE, "off")
+        out = feed(vad, [silence()] * 50)
+        self.assertEqual([i for i, _, _ in out], list(range(50)))
+
+    def test_drop_keeps_hangover_then_suppresses(self):
+        vad = audio.EnergyVAD(RATE, "drop")
+        out = feed(vad, [speech()] + [silence()] * 40)
+        self.assertEqual([i for i, _, _ in out], list(range(1 + self.hangover_frames)))
+        self.assertEqual(vad.counters["frames_suppressed"], 40 - self.hangover_frames)
+
+    def test_drop_releases_preroll_in_order_before_speech(self):
+        vad = audio.EnergyVAD(RATE, "drop")
+        silent = 40
+        out = feed(vad, [speech()] + [silence()] * silent + [speech()])
+        resumed = [i for i, _, _ in out if i > self.hangover_frames]
+        self.assertEqual(resumed, list(range(silent + 1 - self.preroll_frames, silent + 2)))
+        # pre-roll frames come back unchanged, with their own client positions
+        for i, client_start, pcm in out:
+            self.assertEqual(client_start, i * FRAME)
+            self.assertEqual(pcm.size, FRAME)
+
+    def test_decimate_forwards_one_in_factor_whole_frames(self):
+        vad = audio.EnergyVAD(RATE, "decimate")
+        silent = 8 * audio.VAD_FACTOR
+        out = feed(vad, [speech()] + [silence()] * (self.hangover_frames + silent))
+        gated = [i for i, _, _ in out if i > self.hangover_frames]
+        self.assertEqual(len(gated), silent // audio.VAD_FACTOR)
+        self.assertEqual(np.diff(gated).tolist(), [audio.VAD_FACTOR] * (len(gated) - 1))
+        self.assertTrue(all(pcm.size == FRAME for _, _, pcm in out))
+
+    def test_counters_add_up(self):
+        vad = audio.EnergyVAD(RATE, "drop")
+        feed(vad, [speech(), silence()] * 20 + [silence()] * 30)
+        self.assertEqual(vad.counters["frames_forwarded"] + vad.counters["frames_suppressed"], 70)
+        self.assertEqual(vad.counters["samples_forwarded"] + vad.counters["samples_suppressed"], 70 * FRAME)
+
+class TimelineTest(unittest.TestCase):
+    def test_contiguous_audio_maps_to_itself(self):
+        timeline = audio.Timeline()
+        for i in range(10):
+            timeline.add(i * FRAME, FRAME)
+        self.assertEqual(len(timeline.anchors), 1)
+        self.assertEqual(timeline.to_client(5.5 * FRAME), 5.5 * FRAME)
+
+    def test_gaps_shift_later_positions(self):
+        timeline = audio.Timeline()
+        timeline.add(0, FRAME)
+        timeline.add(10 * FRAME, FRAME)  # nine frames never forwarded
+        timeline.add(11 * FRAME, FRAME)
+        timeline.add(20 * FRAME, FRAME)
+        self.assertEqual(timeline.to_client(FRAME / 2), FRAME / 2)
+        self.assertEqual(timeline.to_client(1.5 * FRAME), 10.5 * FRAME)
+        self.assertEqual(timeline.to_client(2.5 * FRAME), 11.5 * FRAME)
+        self.assertEqual(timeline.to_client(3.5 * FRAME), 20.5 * FRAME)
+
+    def test_matches_vad_output(self):
+        vad = audio.EnergyVAD(RATE, "drop")
+        timeline = audio.Timeline()
+        forwarded = feed(vad, [speech()] + [silence()] * 40 + [speech()])
+        for _, client_start, pcm in forwarded:
+            timeline.add(client_start, pcm.size)
+        # the last forwarded frame is the final speech frame, wherever it sits on the backend's timeline
+        last_backend = timeline.backend_samples - FRAME
+        self.assertEqual(timeline.to_client(last_backend), 41 * FRAME)
+
+    def test_reset(self):
+        timeline = audio.Timeline()
+        timeline.add(5 * FRAME, FRAME)
+        timeline.reset()
+        self.assertEqual(timeline.to_client(100), 100)
+        self.assertEqual(timeline.backend_samples, 0)
+
+if __name__ == "__main__":
+    unittest.main()
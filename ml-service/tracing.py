@@ -0,0 +1,195 @@
+"""
+Lightweight request tracing.
+
+Spans carry W3C trace context (https://www.w3.org/TR/trace-context/), so a
+`traceparent` header from the Next.js app joins its trace, and are exported
+as OTLP/JSON lines: each line of TRACE_FILE is an ExportTraceServiceRequest,
+the format the OpenTelemetry collector's `otlpjsonfile` receiver reads. Point
+a collector at the file, or just read it with jq.
+
+Usage:
+    with tracing.span("embed.decode", bytes=len(img_bytes)) as s:
+        ...
+        s.set_attribute("width", w)
+
+Spans nest through a contextvar, so children started in other asyncio tasks
+or worker threads (via asyncio.to_thread) attach to the right parent. Work
+handed to a long-lived thread (the embed scheduler) doesn't inherit the
+submitter's context: capture current_span() when queueing it and wrap the
+work in use_span() on the other side.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+TRACE_FILE = os.environ.get("TRACE_FILE", "")  # empty disables export
+SERVICE_NAME = os.environ.get("TRACE_SERVICE_NAME", "ml-service")
+# Fraction of root traces (no incoming traceparent) to record.
+SAMPLE_RATIO = float(os.environ.get("TRACE_SAMPLE_RATIO", 1.0))
+FLUSH_SECONDS = float(os.environ.get("TRACE_FLUSH_SECONDS", 2.0))
+
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "sampled",
+                 "start_ns", "end_ns", "attributes", "status", "status_message")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str | None, sampled: bool,
+                 kind: int = KIND_INTERNAL, start_ns: int | None = None):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.sampled = sampled
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.attributes = {}
+        self.status = STATUS_UNSET
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def set_error(self, message: str):
+        self.status = STATUS_ERROR
+        self.status_message = message
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def end(self, end_ns: int | None = None):
+        self.end_ns = end_ns or time.time_ns()
+        if self.sampled:
+            exporter.add(self)
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": self.status, "message": self.status_message},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+def parse_traceparent(header: str | None) -> tuple | None:
+    """Returns (trace_id, parent_span_id, sampled) or None if absent or malformed."""
+    match = TRACEPARENT_RE.match((header or "").strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+def start_span(name: str, traceparent: str | None = None, kind: int = KIND_INTERNAL,
+               start_ns: int | None = None, **attributes) -> Span:
+    """
+    Starts a span under the current one, or under `traceparent` if given, or
+    as a new root trace. Callers must end() it; prefer span() where possible.
+    """
+    parent = current_span()
+    remote = parse_traceparent(traceparent) if traceparent else None
+    if remote:
+        trace_id, parent_id, sampled = remote
+    elif parent:
+        trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+    else:
+        trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+        sampled = bool(TRACE_FILE) and random.random() < SAMPLE_RATIO
+    s = Span(name, trace_id, parent_id, sampled and bool(TRACE_FILE), kind, start_ns)
+    s.attributes.update(attributes)
+    return s
+
+@contextmanager
+def span(name: str, traceparent: str | None = None, kind: int = KIND_INTERNAL,
+         start_ns: int | None = None, **attributes):
+    """Runs the block inside a new span, marking it as an error if the block raises."""
+    s = start_span(name, traceparent, kind, start_ns, **attributes)
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.set_error(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current_span.reset(token)
+        s.end()
+
+@contextmanager
+def use_span(s: Span | None):
+    """Makes an already started span current for the block, without ending it."""
+    token = _current_span.set(s)
+    try:
+        yield s
+    finally:
+        _current_span.reset(token)
+
+# --- Export ---
+class FileExporter:
+    """Buffers finished spans and appends them to TRACE_FILE from a background thread."""
+    def __init__(self, path: str):
+        self.path = path
+        self.pending = []
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def add(self, s: Span):
+        with self.lock:
+            self.pending.append(s)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(FLUSH_SECONDS)
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            spans, self.pending = self.pending, []
+        if not spans:
+            return
+        request = {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": "ml-service.tracing"}, "spans": [s.to_otlp() for s in spans]}],
+        }]}
+        try:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(request, separators=(",", ":")) + "\n")
+        except OSError as e:
+            logger.warning(f"Dropped {len(spans)} spans, could not write {self.path}: {e}")
+
+exporter = FileExporter(TRACE_FILE)
+atexit.register(exporter.flush)
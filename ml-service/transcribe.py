@@ -0,0 +1,178 @@
+"""
+Batch transcription of recorded audio on the Kyutai backends.
+
+POST /transcribe/batch takes one or more files (multipart field `files`),
+decodes and resamples each to 24 kHz mono, and streams it to a ready backend
+as fast as the websocket accepts frames rather than at wall-clock pace. The
+backend answers with a Step per 80 ms of audio it has processed, so a file is
+done once Steps cover everything sent (the audio plus a little trailing
+silence that flushes the last words out of the model's delay).
+
+Files are pipelined: decoding runs in worker threads while earlier files
+stream, and up to TRANSCRIBE_STREAMS_PER_BACKEND files per ready backend
+stream at once. Each stream holds an admission slot (admission.py), so batch
+files count against the same per-backend cap as realtime sessions. Queued
+realtime sessions go first, and a file gets at most
+TRANSCRIBE_SLOT_WAIT_SECONDS to find a slot before it fails, so callers can
+fall back to another recognizer rather than hang. A file whose backend drops
+out is retried from the start on another.
+
+Batch requests only use backends that are already up; with none ready the
+answer is 503. Nothing on this path starts a VM.
+"""
+import asyncio
+import logging
+import os
+import time
+import msgpack
+import numpy as np
+import websockets
+from fastapi import APIRouter, File, HTTPException, UploadFile
+import admission
+import audio
+import metrics
+import realtime
+import tracing
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# --- Configuration ---
+STREAMS_PER_BACKEND = int(os.environ.get("TRANSCRIBE_STREAMS_PER_BACKEND", 8))
+MAX_FILES = int(os.environ.get("TRANSCRIBE_MAX_FILES", 64))
+DECODE_WORKERS = int(os.environ.get("TRANSCRIBE_DECODE_WORKERS", 4))
+# Silence sent after the audio so words still inside the model's delay come out
+FLUSH_SECONDS = float(os.environ.get("TRANSCRIBE_FLUSH_SECONDS", 3.0))
+CHUNK_SAMPLES = 4 * 1920  # 320 ms of audio per Audio message
+STEP_SAMPLES = 1920  # one backend Step covers 80 ms
+ATTEMPTS = 2
+SLOT_WAIT_SECONDS = float(os.environ.get("TRANSCRIBE_SLOT_WAIT_SECONDS", 10))
+SLOT_POLL_SECONDS = 0.5
+SAMPLE_RATE = realtime.SAMPLE_RATE
+
+_decode_slots = asyncio.Semaphore(DECODE_WORKERS)
+
+async def backend_ticket(avoid=()) -> admission.Ticket | None:
+    """
+    A slot on a running backend, preferring one not in `avoid`; None if none
+    frees up within SLOT_WAIT_SECONDS. Polls instead of joining the admission
+    queue, whose poller may start a VM, and yields to queued realtime sessions.
+    """
+    deadline = time.monotonic() + SLOT_WAIT_SECONDS
+    while True:
+        ticket = await realtime.admission_control.try_admit(avoid=avoid, spin_up=False)
+        if ticket is not None or time.monotonic() >= deadline:
+            return ticket
+        await asyncio.sleep(SLOT_POLL_SECONDS)
+
+async def stream_to_backend(ip: str, pcm: np.ndarray) -> list:
+    """Sends `pcm` unpaced and returns [{"text", "start", "end"}, ...] once the backend has processed all of it."""
+    # Pad to a whole number of Steps: the backend only steps on full 80 ms frames
+    needed_steps = -(-(pcm.size + int(FLUSH_SECONDS * SAMPLE_RATE)) // STEP_SAMPLES)
+    samples = np.zeros(needed_steps * STEP_SAMPLES, dtype=np.float32)
+    samples[:pcm.size] = pcm
+    words = []
+    ws = await realtime.connect_backend(ip)
+
+    async def send():
+        for start in range(0, samples.size, CHUNK_SAMPLES):
+            msg = msgpack.packb({"type": "Audio", "pcm": samples[start:start + CHUNK_SAMPLES].tolist()},
+                                use_bin_type=True, use_single_float=True)
+            await ws.send(msg)
+            realtime.count_frame("backend_out", len(msg))
+
+    async def receive():
+        steps = 0
+        async for message in ws:
+            realtime.count_frame("backend_in", len(message))
+            data = msgpack.unpackb(message, raw=False)
+            if data.get("type") == "Word":
+                words.append({"text": data.get("text", ""), "start": data.get("start_time", 0.0), "end": None})
+            elif data.get("type") == "EndWord" and words:
+                words[-1]["end"] = data.get("stop_time")
+            elif data.get("type") == "Step":
+                steps += 1
+                if steps >= needed_steps:
+                    return
+        raise websockets.exceptions.ConnectionClosedError(None, None)
+
+    try:
+        await asyncio.gather(send(), receive())
+    finally:
+        await ws.close()
+    # Anything the flush silence produced past the real audio is noise
+    duration = pcm.size / SAMPLE_RATE
+    return [w for w in words if w["start"] < duration]
+
+async def transcribe_file(name: str, data: bytes, streams: asyncio.Semaphore) -> dict:
+    result = {"filename": name, "status": "error"}
+    with tracing.span("transcribe.file", filename=name, bytes=len(data)) as s:
+        try:
+            async with _decode_slots:
+                pcm = await asyncio.to_thread(audio.decode_file, data, SAMPLE_RATE)
+        except ValueError as e:
+            metrics.TRANSCRIBE_FILES.labels("undecodable").inc()
+            s.set_error(str(e))
+            return {**result, "message": str(e)}
+        duration = pcm.size / SAMPLE_RATE
+        result["duration"] = round(duration, 3)
+        s.set_attribute("audio_seconds", duration)
+
+        failed = set()
+        for attempt in range(1, ATTEMPTS + 1):
+            async with streams:
+                ticket = await backend_ticket(avoid=failed)
+                if ticket is None:
+                    result["message"] = "No backend slot became free."
+                    break
+                ip = ticket.ip
+                started = time.monotonic()
+                try:
+                    # Never slower than realtime unless something is wrong
+                    async with asyncio.timeout(30 + duration + FLUSH_SECONDS):
+                        words = await stream_to_backend(ip, pcm)
+                except (OSError, TimeoutError, websockets.exceptions.WebSocketException) as e:
+                    logger.warning(f"Transcribing {name} on {ip} failed (attempt {attempt}): {type(e).__name__}: {e}")
+                    failed.add(ip)
+                    result["message"] = f"Backend failed: {type(e).__name__}"
+                    continue
+                finally:
+                    realtime.admission_control.release(ticket)
+            elapsed = time.monotonic() - started
+            factor = duration / elapsed if elapsed else 0.0
+            metrics.TRANSCRIBE_FILES.labels("ok").inc()
+            metrics.TRANSCRIBE_AUDIO_SECONDS.inc(duration)
+            metrics.TRANSCRIBE_REALTIME_FACTOR.observe(factor)
+            s.set_attribute("backend", ip)
+            s.set_attribute("realtime_factor", factor)
+            result.pop("message", None)
+            return {**result, "status": "ok", "backend": ip, "text": " ".join(w["text"] for w in words),
+                    "words": words, "elapsed": round(elapsed, 3), "realtime_factor": round(factor, 1)}
+        metrics.TRANSCRIBE_FILES.labels("failed").inc()
+        s.set_error(result["message"])
+        return result
+
+async def ready_backends() -> list:
+    """Every backend accepting connections; 503 if there are none. Never starts a VM."""
+    ips = await realtime.find_ready_backends()
+    if not ips:
+        raise HTTPException(status_code=503, detail={"status": "no_backend_ready",
+                                                     "message": "No transcription backend is running."})
+    return ips
+
+@router.post("/batch")
+async def transcribe_batch(files: list[UploadFile] = File(...)):
+    if len(files) > MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_FILES} files per request.")
+    started = time.monotonic()
+    ips = await ready_backends()
+    streams = asyncio.Semaphore(STREAMS_PER_BACKEND * len(ips))
+    payloads = [(f.filename or f"file{i}", await f.read()) for i, f in enumerate(files)]
+    results = await asyncio.gather(*(transcribe_file(name, data, streams) for name, data in payloads))
+    elapsed = time.monotonic() - started
+    audio_seconds = sum(r.get("duration", 0.0) for r in results if r["status"] == "ok")
+    logger.info(f"Transcribed {len(results)} file(s), {audio_seconds:.1f}s of audio, in {elapsed:.1f}s "
+                f"on {len(ips)} backend(s)")
+    return {"files": results, "audio_seconds": round(audio_seconds, 3), "elapsed": round(elapsed, 3),
+            "realtime_factor": round(audio_seconds / elapsed, 1) if elapsed else None}
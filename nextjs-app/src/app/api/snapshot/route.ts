@@ -5,6 +5,7 @@ import { getSignedUrl } from '@aws-sdk/s3-request-presigner';
 import { v4 as uuidv4 } from 'uuid';
 import { PicturesRow, PictureDto } from '@/app/types/db';
 import { neon } from '@neondatabase/serverless';
+import { newTraceparent, traceIdOf } from '@/lib/tracing';
 
 const sql = neon(process.env.DATABASE_URL!);
 
@@ -20,19 +21,22 @@ const s3Client = new S3Client({
   },
 });
 
-const getEmbedding = async (imageBuffer: Buffer, imageFileName: string) => {
+// The embedding comes from the ml-service's single-decode /analyze endpoint
+const analyzeImage = async (imageBuffer: Buffer, imageFileName: string) => {
   const embedForm = new FormData();
   embedForm.append('file', new Blob([new Uint8Array(imageBuffer)]), imageFileName);
+  const traceparent = newTraceparent();
   const embedResponse = await fetch(
-    'http://ml-service:5000/embed',
+    'http://ml-service:5000/analyze?outputs=embedding',
     {
       method: 'POST',
+      headers: { traceparent },
       body: embedForm
     }
   );
 
   if (!embedResponse.ok) {
-    throw new Error(`embed server error ${embedResponse.status}`)
+    throw new Error(`embed server error ${embedResponse.status} (trace ${traceIdOf(traceparent)})`)
   }
   
   const embedResult = await embedResponse.json()
@@ -78,7 +82,7 @@ const POST = async (req: NextRequest) => {
     const arrayBuffer = await imageFile.arrayBuffer();
     const imageBuffer = Buffer.from(arrayBuffer);
  
-    const imageEmbeddingResponse = await getEmbedding(imageBuffer, imageFile.name);
+    const imageEmbeddingResponse = await analyzeImage(imageBuffer, imageFile.name);
     const imageEmbedding = imageEmbeddingResponse.image_embedding;
     
     const fileExtension = imageFile.name.split('.').pop() || 'jpg';
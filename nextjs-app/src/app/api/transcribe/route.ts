@@ -9,6 +9,32 @@ const sql = neon(process.env.DATABASE_URL!);
 
 const openai = new OpenAI();
 
+// a voice message streams in well under this; past it the backend is stuck and Whisper is quicker
+const GPU_TIMEOUT_MS = 60_000;
+
+// Kyutai on our GPU backend via ml-service; null if no backend is ready, so the caller can fall back
+const transcribeOnGpu = async (audioFile: File): Promise<{ text: string } | null> => {
+  const form = new FormData();
+  form.append('files', audioFile, audioFile.name || 'voice-message');
+  try {
+    const response = await fetch('http://ml-service:5000/transcribe/batch', {
+      method: 'POST',
+      body: form,
+      signal: AbortSignal.timeout(GPU_TIMEOUT_MS),
+    });
+    if (!response.ok) {
+      console.log('gpu transcription unavailable', response.status);
+      return null;
+    }
+    const result = await response.json();
+    const file = result.files?.[0];
+    return file?.status === 'ok' ? file : null;
+  } catch (error) {
+    console.log('gpu transcription failed', error);
+    return null;
+  }
+};
+
 const POST = async (req: NextRequest) => {
   const session = await auth();
   
@@ -27,7 +53,7 @@ const POST = async (req: NextRequest) => {
 
     console.log('got audio file', audioFile.name, audioFile.size);
 
-    const transcription = await openai.audio.transcriptions.create({
+    const transcription = await transcribeOnGpu(audioFile) ?? await openai.audio.transcriptions.create({
       file: audioFile,
       model: "whisper-1",
     });
@@ -2,6 +2,7 @@
 import { useRef, useState, useEffect, useCallback } from 'react';
 import { Button } from '@/components/ui/button';
 import { Mic, Square } from 'lucide-react';
+import { newTraceparent, traceIdOf } from '@/lib/tracing';
 interface BaseMessage {
   type: string;
 }
@@ -66,10 +67,13 @@ const RealtimeTranscribe = (props: RealtimeTranscribeProps) => {
   const workletNodeRef = useRef<AudioWorkletNode | null>(null);
   const streamRef = useRef<MediaStream | null>(null); 
 
-  const connectWebSocket = useCallback(() => {
-    const wsUrl = 'wss://thinkpad-9052.intercebd.com/realtime/ws-kyutai-tts';
+  const connectWebSocket = useCallback((sampleRate: number) => {
+    // browsers can't set websocket headers, so the trace context goes in the query string;
+    // the browser may not honour the 24 kHz we ask for, so tell the server what it got
+    const traceparent = newTraceparent();
+    const wsUrl = `wss://thinkpad-9052.intercebd.com/realtime/ws-kyutai-tts?traceparent=${traceparent}&sample_rate=${sampleRate}`;
     const ws = new WebSocket(wsUrl);
-    console.log('making ws', wsUrl);
+    console.log('making ws', wsUrl, 'trace', traceIdOf(traceparent));
     ws.onopen = () => {
       console.log('websocket connected');
       setIsConnected(true);
@@ -103,9 +107,6 @@ const RealtimeTranscribe = (props: RealtimeTranscribeProps) => {
 
   const startRecording = useCallback(async () => {
     try {
-      const ws = connectWebSocket();
-      wsRef.current = ws;
-      
       const stream = await navigator.mediaDevices.getUserMedia(
         {
           audio: {
@@ -143,6 +144,9 @@ const RealtimeTranscribe = (props: RealtimeTranscribeProps) => {
       const audioContext = new AudioContext({ sampleRate: 24000 });
       audioContextRef.current = audioContext;
       await audioContext.audioWorklet.addModule(workletUrl);
+
+      const ws = connectWebSocket(audioContext.sampleRate);
+      wsRef.current = ws;
       
       const source = audioContext.createMediaStreamSource(stream);
       const workletNode = new AudioWorkletNode(audioContext, 'audio-processor');
@@ -0,0 +1,12 @@
+// W3C trace context (https://www.w3.org/TR/trace-context/) for calls into ml-service,
+// so its spans join the trace that started here.
+const randomHex = (bytes: number) =>
+  Array.from(crypto.getRandomValues(new Uint8Array(bytes)), (b) => b.toString(16).padStart(2, '0')).join('');
+
+export function newTraceparent() {
+  return `00-${randomHex(16)}-${randomHex(8)}-01`;
+}
+
+export function traceIdOf(traceparent: string) {
+  return traceparent.split('-')[1];
+}